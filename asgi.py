@@ -0,0 +1,21 @@
+"""
+ASGI config for django-xapi-moodle project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Served this way, the Moodle event and Moodle-proxy endpoints use their async
+implementations (``lrs.async_views``), e.g.::
+
+    uvicorn asgi:application --workers 2
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+os.environ.setdefault('LRS_ASYNC_VIEWS', '1')
+
+application = get_asgi_application()
@@ -1,17 +1,31 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Statement, Actor, Verb, Activity, MoodleIntegration
+from .models import (
+    Statement, Actor, Verb, Activity, MoodleIntegration, MoodleLogCursor, Job, LearnerProgress, ReportArtifact,
+    LRSCredential, ForwardingTarget
+)
+from .admin_utils import (
+    ActorInputFilter, EstimatedCountPaginator, RollupDateFilter, ShardAdminMixin, ShardListFilter, VerbListFilter
+)
+from .services import search
+from .services.compact_storage import expand_to_full
+from .services.retention import delete_cascading, delete_statements
 
 @admin.register(Statement)
-class StatementAdmin(admin.ModelAdmin):
+class StatementAdmin(ShardAdminMixin, admin.ModelAdmin):
     list_display = ('statement_id', 'actor_name', 'verb_display', 'activity_name', 'timestamp', 'is_valid')
-    list_filter = ('timestamp', 'verb__verb_id', 'is_valid', 'actor__name')
-    search_fields = ('actor__name', 'verb__verb_id', 'activity__activity_id', 'object__icontains')
+    # Filters are bounded (no SELECT DISTINCT over the statement table) and the
+    # date drill-down reads the daily rollup instead of date_hierarchy
+    list_filter = (ShardListFilter, RollupDateFilter, VerbListFilter, 'is_valid', ActorInputFilter)
+    # Searches go through the full-text index (see get_search_results)
+    search_fields = ('actor__name', 'verb__verb_id', 'activity__activity_id')
     readonly_fields = ('statement_id', 'stored', 'timestamp')
-    date_hierarchy = 'timestamp'
+    autocomplete_fields = ('actor', 'verb', 'activity')
     ordering = ('-timestamp',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Basic Information', {
@@ -43,11 +57,29 @@ class StatementAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('actor', 'verb', 'activity')
+    
+    def get_object(self, request, object_id, from_field=None):
+        # Edit compact statements as full JSON (saving stores the row in full)
+        obj = super().get_object(request, object_id, from_field)
+        return expand_to_full(obj) if obj is not None else None
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.search_statements(search_term, queryset), False
+    
+    # Statement deletes do not send signals (see lrs.signals): delete in
+    # chunks that also update the rollups, change feed and API version
+    def delete_model(self, request, obj):
+        delete_statements(Statement.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        delete_statements(queryset)
 
 @admin.register(Actor)
-class ActorAdmin(admin.ModelAdmin):
+class ActorAdmin(ShardAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'actor_type', 'mbox', 'moodle_user_id', 'created_at')
-    list_filter = ('actor_type', 'created_at')
+    list_filter = (ShardListFilter, 'actor_type', 'created_at')
     search_fields = ('name', 'mbox', 'account_name')
     readonly_fields = ('created_at',)
     
@@ -65,10 +97,18 @@ class ActorAdmin(admin.ModelAdmin):
             'fields': ('created_at',)
         }),
     )
+    
+    # Statements are deleted in chunks first, not in one cascade
+    def delete_model(self, request, obj):
+        delete_cascading(type(obj).objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        delete_cascading(queryset)
 
 @admin.register(Verb)
-class VerbAdmin(admin.ModelAdmin):
+class VerbAdmin(ShardAdminMixin, admin.ModelAdmin):
     list_display = ('verb_id_short', 'verb_display', 'created_at')
+    list_filter = (ShardListFilter,)
     search_fields = ('verb_id', 'display')
     readonly_fields = ('created_at',)
     
@@ -83,10 +123,11 @@ class VerbAdmin(admin.ModelAdmin):
     verb_display.short_description = 'Display Name'
 
 @admin.register(Activity)
-class ActivityAdmin(admin.ModelAdmin):
+class ActivityAdmin(ShardAdminMixin, admin.ModelAdmin):
     list_display = ('activity_name', 'object_type', 'moodle_activity_id', 'moodle_course_id', 'created_at')
-    list_filter = ('object_type', 'created_at')
-    search_fields = ('activity_id', 'definition__icontains')
+    list_filter = (ShardListFilter, 'object_type', 'created_at')
+    # Searches go through the full-text index (see get_search_results)
+    search_fields = ('activity_id',)
     readonly_fields = ('created_at',)
     
     fieldsets = (
@@ -109,10 +150,22 @@ class ActivityAdmin(admin.ModelAdmin):
             return obj.definition['name'].get('en-US', obj.activity_id)
         return obj.activity_id
     activity_name.short_description = 'Activity Name'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.search_activities(search_term, queryset), False
+    
+    # Statements are deleted in chunks first, not in one cascade
+    def delete_model(self, request, obj):
+        delete_cascading(type(obj).objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        delete_cascading(queryset)
 
 @admin.register(MoodleIntegration)
 class MoodleIntegrationAdmin(admin.ModelAdmin):
-    list_display = ('moodle_site_name', 'moodle_url', 'is_active', 'last_sync', 'created_at')
+    list_display = ('moodle_site_name', 'moodle_url', 'shard', 'is_active', 'last_sync', 'created_at')
     list_filter = ('is_active', 'created_at', 'last_sync')
     search_fields = ('moodle_site_name', 'moodle_url')
     readonly_fields = ('created_at', 'last_sync')
@@ -125,7 +178,13 @@ class MoodleIntegrationAdmin(admin.ModelAdmin):
             'fields': ('moodle_token', 'web_service_user')
         }),
         ('Status', {
-            'fields': ('is_active', 'last_sync')
+            'fields': ('is_active', 'shard', 'last_sync')
+        }),
+        ('Forwarding', {
+            'fields': ('lrs_endpoint',)
+        }),
+        ('Retention', {
+            'fields': ('retention_days', 'retention_action')
         }),
         ('Metadata', {
             'fields': ('created_at',)
@@ -142,3 +201,75 @@ class MoodleIntegrationAdmin(admin.ModelAdmin):
 admin.site.site_header = 'xAPI Learning Record Store'
 admin.site.site_title = 'xAPI LRS Admin'
 admin.site.index_title = 'Welcome to xAPI LRS'
+
+@admin.register(MoodleLogCursor)
+class MoodleLogCursorAdmin(admin.ModelAdmin):
+    list_display = ('integration', 'course_id', 'last_log_id', 'statements_ingested', 'updated_at')
+    list_filter = ('integration',)
+    readonly_fields = ('statements_ingested', 'last_error', 'updated_at')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'items_done', 'items_total', 'message', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'params', 'status', 'items_total', 'items_done', 'message', 'result', 'error',
+                       'worker', 'created_at', 'started_at', 'finished_at', 'heartbeat_at')
+
+@admin.register(LearnerProgress)
+class LearnerProgressAdmin(ShardAdminMixin, admin.ModelAdmin):
+    list_display = ('actor', 'activity', 'course', 'attempts', 'best_score', 'last_score', 'completed', 'success', 'last_seen')
+    list_filter = (ShardListFilter, 'completed', 'success')
+    search_fields = ('actor__name', 'activity__activity_id', 'course__activity_id')
+    list_select_related = ('actor', 'activity', 'course')
+    raw_id_fields = ('actor', 'activity', 'course')
+    # Maintained from statements; rebuild with manage.py rebuild_learner_progress
+    readonly_fields = ('statements', 'attempts', 'best_score', 'last_score', 'last_scored_at', 'completed',
+                       'completed_at', 'success', 'first_seen', 'last_seen', 'updated_at')
+
+@admin.register(ReportArtifact)
+class ReportArtifactAdmin(admin.ModelAdmin):
+    list_display = ('report_id', 'kind', 'size', 'created_at', 'expires_at')
+    list_filter = ('kind',)
+    readonly_fields = ('report_id', 'kind', 'params', 'size', 'created_at', 'expires_at')
+    # Reports can be large; download them with /api/download-xapi-report/?report=<id>
+    exclude = ('data',)
+
+@admin.register(LRSCredential)
+class LRSCredentialAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'integration', 'token_prefix', 'is_active', 'created_at', 'expires_at', 'last_used_at')
+    list_filter = ('is_active', 'integration')
+    readonly_fields = ('token_prefix', 'created_at', 'last_used_at')
+    exclude = ('token_hash',)
+    actions = ['revoke']
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            from .services.credentials import issue_token
+            token = issue_token(obj)
+            super().save_model(request, obj, form, change)
+            messages.warning(request, f"Token for {obj}: Bearer {token} (copy it now, it cannot be shown again)")
+            return
+        super().save_model(request, obj, form, change)
+    
+    @admin.action(description='Revoke selected credentials')
+    def revoke(self, request, queryset):
+        # Saved one by one so the post_save receiver clears the token cache
+        for credential in queryset.filter(is_active=True):
+            credential.is_active = False
+            credential.save(update_fields=['is_active'])
+
+@admin.register(ForwardingTarget)
+class ForwardingTargetAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'is_active', 'statements_forwarded', 'last_forwarded_at', 'failures', 'next_attempt_at')
+    list_filter = ('is_active',)
+    # Created by manage.py forward_statements from the integrations' LRS endpoints
+    readonly_fields = ('endpoint', 'cursor', 'statements_forwarded', 'last_forwarded_at', 'failures', 'next_attempt_at',
+                       'last_error', 'updated_at')
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected endpoints at the next run')
+    def retry_now(self, request, queryset):
+        queryset.update(next_attempt_at=None)
@@ -0,0 +1,233 @@
+# lrs/admin_utils.py
+"""
+Helpers that keep admin changelists fast on very large tables:
+estimated counts, bounded filters and a rollup-backed date drill-down,
+plus shard selection for the sharded statement data.
+"""
+import datetime
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import Actor, StatementDailyCount, Verb
+from .sharding import shard_aliases, sharding_enabled, use_shard
+
+# Below this many rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+# Filtered changelists count at most this many rows
+FILTERED_COUNT_CAP = 10000
+
+
+def estimate_row_count(model, using='default'):
+    """Estimate the number of rows in model's table from database statistics.
+
+    Returns None when no estimate is available.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            if row and row[0] and row[0] > 0:
+                return int(row[0])
+        elif connection.vendor == 'sqlite':
+            # Populated by ANALYZE; the first number of any stat row is the table size
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                if row and row[0]:
+                    return int(row[0].split()[0])
+        # Fall back to the primary key high-water mark (an index lookup)
+        pk_column = connection.ops.quote_name(model._meta.pk.column)
+        cursor.execute(f'SELECT MAX({pk_column}) FROM {connection.ops.quote_name(table)}')
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids full COUNT(*) scans.
+
+    Unfiltered querysets use the planner's row estimate once the table is
+    large; filtered querysets are counted up to FILTERED_COUNT_CAP rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                return estimate
+            return queryset.count()
+
+        # LIMITed subquery: the database stops scanning at the cap
+        return queryset.order_by().values('pk')[:FILTERED_COUNT_CAP].count()
+
+
+class InputFilter(admin.SimpleListFilter):
+    """List filter rendered as a text box instead of a list of choices"""
+    template = 'admin/lrs/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Needed for the filter to be displayed; the choices are never listed
+        return ((),)
+
+    def choices(self, changelist):
+        # Only the "All" choice is rendered; it carries the other query params
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+
+class ActorInputFilter(InputFilter):
+    """Filter statements by actor name, mbox or account name prefix"""
+    title = 'actor'
+    parameter_name = 'actor_q'
+    max_actors = 500
+
+    def queryset(self, request, queryset):
+        term = (self.value() or '').strip()
+        if not term:
+            return queryset
+        # Resolve against the small Actor table, then use the indexed FK
+        actor_ids = list(
+            Actor.objects.filter(
+                Q(name__istartswith=term)
+                | Q(mbox__iexact=term.replace('mailto:', ''))
+                | Q(account_name=term)
+            ).values_list('pk', flat=True)[:self.max_actors]
+        )
+        return queryset.filter(actor_id__in=actor_ids)
+
+
+class VerbListFilter(admin.SimpleListFilter):
+    """Verb filter whose choices come from the Verb table, not the statements"""
+    title = 'verb'
+    parameter_name = 'verb'
+    max_choices = 50
+
+    def lookups(self, request, model_admin):
+        verbs = Verb.objects.order_by('verb_id')[:self.max_choices]
+        return [
+            (str(verb.pk), (verb.display or {}).get('en-US') or verb.verb_id.split('/')[-1])
+            for verb in verbs
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(verb_id=self.value())
+        return queryset
+
+
+class RollupDateFilter(admin.SimpleListFilter):
+    """Month/day drill-down built from StatementDailyCount instead of the
+    statement table, filtering on the indexed ``timestamp`` column."""
+    title = 'date'
+    parameter_name = 'day'
+
+    def _parse(self):
+        value = self.value() or ''
+        try:
+            if len(value) == 7:
+                return datetime.datetime.strptime(value, '%Y-%m').date(), 'month'
+            if len(value) == 10:
+                return datetime.datetime.strptime(value, '%Y-%m-%d').date(), 'day'
+        except ValueError:
+            pass
+        return None, None
+
+    def lookups(self, request, model_admin):
+        selected, period = self._parse()
+        if selected:
+            month_start = selected.replace(day=1)
+            month_end = (month_start + datetime.timedelta(days=32)).replace(day=1)
+            days = StatementDailyCount.objects.filter(
+                day__gte=month_start, day__lt=month_end
+            ).order_by('day')
+            choices = [(month_start.strftime('%Y-%m'), f"{month_start:%B %Y} (all)")]
+            choices += [(row.day.isoformat(), f"{row.day:%d %b} ({row.count:,})") for row in days]
+            return choices
+
+        months = (
+            StatementDailyCount.objects.annotate(month=TruncMonth('day'))
+            .values('month').annotate(total=Sum('count')).order_by('-month')[:24]
+        )
+        return [(row['month'].strftime('%Y-%m'), f"{row['month']:%B %Y} ({row['total']:,})") for row in months]
+
+    def queryset(self, request, queryset):
+        selected, period = self._parse()
+        if not selected:
+            return queryset
+        if period == 'month':
+            start = selected.replace(day=1)
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            start = selected
+            end = selected + datetime.timedelta(days=1)
+        tz = timezone.get_current_timezone()
+        return queryset.filter(
+            timestamp__gte=datetime.datetime.combine(start, datetime.time.min, tzinfo=tz),
+            timestamp__lt=datetime.datetime.combine(end, datetime.time.min, tzinfo=tz),
+        )
+
+
+def admin_shard(request):
+    """Shard chosen with ShardListFilter (carried to the change form in _changelist_filters)"""
+    shard = request.GET.get(ShardListFilter.parameter_name)
+    if not shard and request.GET.get('_changelist_filters'):
+        shard = QueryDict(request.GET['_changelist_filters']).get(ShardListFilter.parameter_name)
+    return shard if shard in shard_aliases() else None
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Shard whose rows are listed (shown only with sharding enabled); the
+    routing itself is done by ShardAdminMixin"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        if not sharding_enabled():
+            return ()
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def queryset(self, request, queryset):
+        return queryset
+
+
+class ShardAdminMixin:
+    """Run the admin views of a sharded model on the shard picked with ShardListFilter"""
+
+    def _on_shard(self, request, view, *args, **kwargs):
+        with use_shard(admin_shard(request)):
+            response = view(request, *args, **kwargs)
+            # Render here: the changelist queryset is evaluated by the template
+            if not getattr(response, 'is_rendered', True):
+                response.render()
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        return self._on_shard(request, super().changelist_view, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        return self._on_shard(request, super().changeform_view, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self._on_shard(request, super().delete_view, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self._on_shard(request, super().history_view, object_id, extra_context)
@@ -0,0 +1,11 @@
+# lrs/apps.py
+from django.apps import AppConfig
+
+
+class LrsConfig(AppConfig):
+    name = 'lrs'
+    verbose_name = 'xAPI Learning Record Store'
+
+    def ready(self):
+        # Connect signal receivers (search index maintenance etc.)
+        from . import checks, signals  # noqa: F401
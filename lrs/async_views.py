@@ -0,0 +1,186 @@
+# lrs/async_views.py
+"""
+Async versions of the Moodle event endpoint and the Moodle-proxy views.
+
+Used instead of the ``views`` versions when served through ``asgi.py``
+(``settings.LRS_ASYNC_VIEWS``): outbound Moodle calls go through a pooled
+async HTTP client and statement ingest awaits the group-commit writer, so
+waiting on a slow Moodle site does not hold a worker thread.  Request and
+response bodies are the same as the sync views.  (The sync endpoints queue
+background jobs and need no async version.)
+"""
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import add_never_cache_headers
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .serializers import StatementCreateSerializer
+from .services.credentials import authenticate_token, bearer_token, get_auth_settings
+from .services.ingest import aingest_statements
+from .services.moodle_api_async import AsyncMoodleAPIService
+from .services.moodle_events import build_statement_from_event
+from .services.rate_limit import admit, retry_after_header
+
+
+def _request_data(request):
+    """JSON or form body as a dict (the DRF parsers are not async)"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST.dict()
+
+
+def async_post_view(view):
+    """CSRF-exempt, POST-only, never-cached async view (the Django 4.2 view
+    decorators wrap async views as sync ones)"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        response = await view(request, *args, **kwargs)
+        add_never_cache_headers(response)
+        return response
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MoodleXAPIView(View):
+    """Handle Moodle-specific xAPI integration"""
+    http_method_names = ['post', 'options']
+
+    async def post(self, request):
+        """Receive events from Moodle"""
+        # Same rules as the DRF authentication and IngestPermission of the sync view
+        token = bearer_token(request)
+        client = await sync_to_async(authenticate_token)(token) if token else None
+        if (token and client is None) or (client is None and get_auth_settings()['REQUIRE_TOKEN']):
+            response = JsonResponse({'detail': 'Invalid or missing LRS token'}, status=401)
+            response['WWW-Authenticate'] = 'Bearer realm="lrs"'
+            return response
+        data = _request_data(request)
+        rejection = await sync_to_async(admit)(request, data)
+        if rejection is not None:
+            response = JsonResponse({'detail': 'Request was throttled.'}, status=429)
+            response['Retry-After'] = retry_after_header(rejection)
+            return response
+        event_type = data.get('event_type')
+
+        # Create xAPI statement from Moodle data
+        statement = build_statement_from_event(data)
+
+        serializer = StatementCreateSerializer(data=statement)
+        if serializer.is_valid():
+            statement_obj = (await aingest_statements([serializer.validated_data]))[0]
+            response_data = {'id': statement_obj.id, 'status': 'created'}
+        else:
+            response_data = serializer.errors
+
+        return JsonResponse({
+            'status': 'success',
+            'moodle_event': event_type,
+            'xapi_statement': statement,
+            'lrs_response': response_data
+        })
+
+
+@async_post_view
+async def test_moodle_connection_api(request):
+    """API endpoint to test Moodle connection"""
+    data = _request_data(request)
+    moodle_url = data.get('moodle_url')
+    token = data.get('token')
+    try:
+        if not moodle_url:
+            return JsonResponse({
+                'connected': False,
+                'message': 'Moodle URL is required'
+            }, status=400)
+
+        api = AsyncMoodleAPIService(moodle_url, token)
+
+        if await api.test_connection():
+            try:
+                site_info = await api.get_site_info()
+                return JsonResponse({
+                    'connected': True,
+                    'message': 'Successfully connected to Moodle',
+                    'site_info': site_info
+                })
+            except Exception as e:
+                return JsonResponse({
+                    'connected': True,
+                    'message': 'Connected to Moodle but failed to get site info',
+                    'error': str(e)
+                })
+        return JsonResponse({
+            'connected': False,
+            'message': 'Failed to connect to Moodle. Please check URL and token.',
+            'debug_info': {
+                'moodle_url': moodle_url,
+                'token_provided': bool(token),
+                'webservice_url': f"{moodle_url.rstrip('/')}/webservice/rest/server.php"
+            }
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'connected': False,
+            'message': f'Connection test failed: {str(e)}',
+            'debug_info': {
+                'moodle_url': moodle_url,
+                'token_provided': bool(token)
+            }
+        }, status=500)
+
+
+@async_post_view
+async def get_moodle_data_api(request):
+    """API endpoint to get Moodle data (services, users, courses)"""
+    data = _request_data(request)
+    moodle_url = data.get('moodle_url')
+    token = data.get('token')
+    if not moodle_url:
+        return JsonResponse({'error': 'Moodle URL is required'}, status=400)
+
+    api = AsyncMoodleAPIService(moodle_url, token)
+
+    # The three calls are independent, so issue them concurrently
+    services, users, courses = await asyncio.gather(
+        api.get_web_services(), api.get_users(), api.get_courses(), return_exceptions=True
+    )
+    errors = []
+    for label, result in (('web services', services), ('users', users), ('courses', courses)):
+        if isinstance(result, Exception):
+            errors.append(f"Failed to get {label}: {str(result)}")
+    services = [] if isinstance(services, Exception) else services
+    users = [] if isinstance(users, Exception) else users
+    courses = [] if isinstance(courses, Exception) else courses
+
+    # Return partial data with errors if some calls failed
+    response_data = {
+        'services': services,
+        'users': users,
+        'courses': courses,
+        'stats': {
+            'users_count': len(users),
+            'courses_count': len(courses),
+            'services_count': len(services)
+        }
+    }
+
+    if errors:
+        response_data['errors'] = errors
+        response_data['message'] = 'Some data could not be retrieved'
+
+    return JsonResponse(response_data)
+
@@ -0,0 +1,35 @@
+# lrs/authentication.py
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import BasePermission
+
+from .services.credentials import LRSClient, authenticate_token, bearer_token, get_auth_settings
+
+
+class LRSTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <token>`` with an LRS credential.
+
+    Requests without a bearer token fall through to the other
+    authentication classes; an unknown, revoked or expired token is a 401.
+    """
+
+    def authenticate(self, request):
+        token = bearer_token(request)
+        if token is None:
+            return None
+        client = authenticate_token(token)
+        if client is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired LRS token')
+        return client, client.credential_id
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="lrs"'
+
+
+class IngestPermission(BasePermission):
+    """Statement ingest: open, or only for LRS credentials with LRS_AUTH['REQUIRE_TOKEN']"""
+
+    def has_permission(self, request, view):
+        if not get_auth_settings()['REQUIRE_TOKEN']:
+            return True
+        return isinstance(request.user, LRSClient)
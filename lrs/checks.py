@@ -0,0 +1,24 @@
+# lrs/checks.py
+"""System checks (``manage.py check``, also run by runserver and migrate)"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """The cache rate-limit backend needs a cache shared by the worker processes"""
+    from .services.rate_limit import SHARED_CACHE_BACKENDS, get_rate_limit_settings
+
+    options = get_rate_limit_settings()
+    if not options['ENABLED'] or options['BACKEND'] != 'cache':
+        return []
+    backend = settings.CACHES.get(options['CACHE_ALIAS'], {}).get('BACKEND')
+    if backend in SHARED_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f"LRS_RATE_LIMIT uses the cache {options['CACHE_ALIAS']!r} ({backend}), which is not shared "
+        "by worker processes: each process keeps its own rate limit.",
+        hint="Point CACHE_ALIAS at a Redis or Memcached cache, or set LRS_RATE_LIMIT['BACKEND'] "
+             "to 'database' (a write per ingest request) or 'memory' (per process, on purpose).",
+        id='lrs.W001',
+    )]
@@ -0,0 +1,36 @@
+# lrs/management/commands/apply_retention.py
+from django.core.management.base import BaseCommand, CommandError
+from lrs.models import MoodleIntegration
+from lrs.services.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = ('Delete (or archive, then delete) the statements older than the retention period of each '
+            'integration, in small chunks with a pause between them')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--integration-id', type=int, help='Moodle Integration ID (default: all with a retention period)')
+        parser.add_argument('--batch-size', type=int, help='Statements per chunk (default: LRS_RETENTION BATCH_SIZE)')
+        parser.add_argument('--sleep', type=float, help='Seconds to pause between chunks (default: LRS_RETENTION SLEEP_SECONDS)')
+        parser.add_argument('--dry-run', action='store_true', help='Count the expired statements without deleting them')
+    
+    def handle(self, *args, **options):
+        integrations = MoodleIntegration.objects.filter(retention_days__isnull=False)
+        if options['integration_id']:
+            integrations = integrations.filter(id=options['integration_id'])
+        if not integrations.exists():
+            raise CommandError('No Moodle integration with a retention period found')
+        
+        for integration in integrations:
+            totals = apply_retention(
+                integration,
+                batch_size=options['batch_size'],
+                sleep=options['sleep'],
+                dry_run=options['dry_run'],
+                on_chunk=lambda count: self.stdout.write(f"  {count} statements"),
+            )
+            verb = 'Would expire' if options['dry_run'] else 'Expired'
+            self.stdout.write(self.style.SUCCESS(
+                f"{integration.moodle_site_name}: {verb} {totals['expired']} statements stored before "
+                f"{totals['cutoff']:%Y-%m-%d %H:%M}" + (f" (archived to {totals['archive']})" if totals['archive'] else '')
+            ))
@@ -0,0 +1,11 @@
+# lrs/management/commands/cleanup_reports.py
+from django.core.management.base import BaseCommand
+from lrs.services.reports import cleanup_reports
+
+
+class Command(BaseCommand):
+    help = 'Delete generated report artifacts that have expired'
+    
+    def handle(self, *args, **options):
+        deleted = cleanup_reports()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired reports"))
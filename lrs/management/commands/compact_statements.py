@@ -0,0 +1,35 @@
+# lrs/management/commands/compact_statements.py
+from django.core.management.base import BaseCommand
+from lrs.services.compact_storage import convert_statements, prune_blobs
+from lrs.sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Convert stored statements to compact storage (or back with --expand) and report the JSON size'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--expand', action='store_true', help='Store compact statements in full again')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the sizes the conversion would give')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Statements rewritten per UPDATE batch')
+        parser.add_argument('--prune', action='store_true', help='Delete blobs no statement refers to afterwards')
+    
+    def handle(self, *args, **options):
+        results = fan_out(
+            convert_statements,
+            compact=not options['expand'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+        ).values()
+        stats = {key: sum(result[key] for result in results) for key in next(iter(results))}
+        before = stats['row_bytes_before'] + stats['blob_bytes_before']
+        after = stats['row_bytes_after'] + stats['blob_bytes_after']
+        ratio = 100.0 * after / before if before else 100.0
+        
+        self.stdout.write(f"Statements: {stats['statements']} ({stats['converted']} rewritten)")
+        self.stdout.write(f"Row JSON:   {stats['row_bytes_before']:,} -> {stats['row_bytes_after']:,} bytes")
+        self.stdout.write(f"Blobs:      {stats['blob_bytes_before']:,} -> {stats['blob_bytes_after']:,} bytes ({stats['blobs']} blobs)")
+        self.stdout.write(f"Total:      {before:,} -> {after:,} bytes ({ratio:.1f}% of the original size)")
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no changes were kept'))
+        elif options['prune']:
+            self.stdout.write(f"Pruned {sum(fan_out(prune_blobs).values())} unused blobs")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,30 @@
+# lrs/management/commands/create_lrs_credential.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from lrs.models import MoodleIntegration
+from lrs.services.credentials import create_credential
+
+
+class Command(BaseCommand):
+    help = 'Create an LRS bearer token for a Moodle integration (the token is printed once)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('integration_id', type=int, help='Moodle Integration ID')
+        parser.add_argument('--name', default='', help='Label of the credential')
+        parser.add_argument('--expires-in-days', type=int, help='Expire the token after this many days')
+    
+    def handle(self, *args, **options):
+        integration = MoodleIntegration.objects.filter(pk=options['integration_id']).first()
+        if integration is None:
+            raise CommandError(f"Moodle integration {options['integration_id']} not found")
+        
+        credential, token = create_credential(integration, name=options['name'])
+        if options['expires_in_days']:
+            credential.expires_at = timezone.now() + timedelta(days=options['expires_in_days'])
+            credential.save(update_fields=['expires_at'])
+        
+        self.stdout.write(self.style.SUCCESS(f"Created credential {credential.pk} for {integration.moodle_site_name}"))
+        self.stdout.write(f"Set local_xapibridge | lrs_auth_token to: Bearer {token}")
+        self.stdout.write("The token is not stored and cannot be shown again.")
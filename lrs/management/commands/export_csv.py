@@ -0,0 +1,52 @@
+# lrs/management/commands/export_csv.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from lrs.management.progress import CommandReport, add_report_arguments
+from lrs.services.csv_export import EXPORTS, csv_lines
+from lrs.services.statement_query import StatementQueryError
+
+
+class Command(BaseCommand):
+    help = 'Write statements or learner progress as CSV (streamed, constant memory)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='What to export')
+        parser.add_argument('--output', '-o', help='File to write (default: standard output)')
+        parser.add_argument('--verb', help='Statements: verb IRI')
+        parser.add_argument('--activity', help='Activity IRI')
+        parser.add_argument('--agent', help='xAPI agent JSON')
+        parser.add_argument('--since', help='Statements: stored after (ISO 8601)')
+        parser.add_argument('--until', help='Statements: stored at or before (ISO 8601)')
+        parser.add_argument('--course', help='Progress: course activity IRI')
+        parser.add_argument('--completed', help='Progress: true or false')
+        parser.add_argument('--integration', help='Moodle integration id (its shard only)')
+        add_report_arguments(parser)
+    
+    def handle(self, *args, **options):
+        params = {
+            name: options[name]
+            for name in ('verb', 'activity', 'agent', 'since', 'until', 'course', 'completed', 'integration')
+            if options[name]
+        }
+        try:
+            lines = csv_lines(options['kind'], params)
+        except StatementQueryError as e:
+            raise CommandError(str(e))
+        
+        # Progress and the summary go to stderr when the CSV goes to stdout
+        report = CommandReport(self, options, stdout_is_data=not options['output'])
+        progress = report.progress(f"Exporting {options['kind']}", 'rows')
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            lines = iter(lines)
+            output.write(next(lines))  # header
+            for line in lines:
+                output.write(line)
+                progress.advance()
+        finally:
+            if options['output']:
+                output.close()
+        message = f"Wrote {progress.done} {options['kind']} rows to {options['output']}" if options['output'] else None
+        report.success(message, kind=options['kind'], output=options['output'], **progress.summary())
+        report.finish()
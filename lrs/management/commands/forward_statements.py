@@ -0,0 +1,59 @@
+# lrs/management/commands/forward_statements.py
+from django.core.management.base import BaseCommand, CommandError
+from lrs.management.progress import CommandReport, add_report_arguments
+from lrs.services import change_feed
+from lrs.services.forwarding import forward_all, forwarding_status
+
+
+class Command(BaseCommand):
+    help = ('Forward stored statements to the LRS endpoints of the Moodle integrations, '
+            'resuming from each endpoint\'s delivery cursor')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when every endpoint is up to date')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only this endpoint (repeatable)')
+        parser.add_argument('--max-batches', type=int, help='Batches per endpoint and run (default: until up to date)')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait for new statements between runs')
+        parser.add_argument('--force', action='store_true', help='Ignore the backoff of failing endpoints')
+        parser.add_argument('--status', action='store_true', help='Show the lag of each endpoint and exit')
+        add_report_arguments(parser)
+    
+    def handle(self, *args, **options):
+        report = CommandReport(self, options)
+        if options['status']:
+            for target in forwarding_status():
+                report.success(
+                    f"{target['endpoint']}: {target['pending_changes']} changes pending "
+                    f"(lag {target['lag_seconds']}s), {target['statements_forwarded']} forwarded"
+                    + (f", failing: {target['last_error']}" if target['failures'] else ''),
+                    **target,
+                )
+            report.finish()
+            return
+        
+        try:
+            while True:
+                heads = change_feed.decode_cursor('now')
+                results = forward_all(options['endpoints'], options['max_batches'], force=options['force'])
+                for result in results:
+                    if result['error']:
+                        report.error(f"Error forwarding to {result['endpoint']}: {result['error']} "
+                                     f"(will resume from the last delivered batch)", **result)
+                    elif result['forwarded'] or result['conflicts']:
+                        report.success(
+                            f"Forwarded {result['forwarded']} statements to {result['endpoint']}"
+                            + (f" ({result['conflicts']} skipped: the LRS holds different statements with their ids)"
+                               if result['conflicts'] else ''),
+                            **result,
+                        )
+                if options['once']:
+                    break
+                # Woken by statements stored in this process, else re-checked every feed poll
+                change_feed.wait_for_changes(heads, options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        
+        report.finish()
+        if report.failures and options['once']:
+            raise CommandError('Some endpoints failed')
@@ -0,0 +1,105 @@
+# lrs/management/commands/import_time.py
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARKER = 'lrs-import-time: setup done'
+
+# Run in a fresh interpreter: django.setup(), then the modules a worker
+# imports before serving its first request
+SCRIPT = '''
+import importlib, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+sys.stderr.write({marker!r} + '\\n')
+for module in {modules!r}:
+    importlib.import_module(module)
+print(json.dumps({{'setup': setup_done - started, 'import': time.perf_counter() - setup_done}}))
+'''
+
+
+def parse_importtime(stderr):
+    """{module: self time in microseconds} of the imports after django.setup()"""
+    times = {}
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(own)
+    return times
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold start: django.setup() and the URLconf imports (python -X importtime)'
+    # The checks would import the URLconf into this process; runs are measured in fresh ones
+    requires_system_checks = []
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--module', action='append', dest='modules',
+                            help='Module to import after setup (repeatable; default: ROOT_URLCONF)')
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to run (medians are reported)')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules and packages to list')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    
+    def run_once(self, modules):
+        script = SCRIPT.format(marker=MARKER, modules=modules)
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'Import failed')
+        return json.loads(process.stdout.strip().splitlines()[-1]), parse_importtime(process.stderr)
+    
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF]
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        
+        runs = [self.run_once(modules) for _ in range(options['repeat'])]
+        module_times = defaultdict(list)
+        for _, times in runs:
+            for name, own in times.items():
+                module_times[name].append(own)
+        modules_ms = {name: statistics.median(values) / 1000 for name, values in module_times.items()}
+        packages_ms = defaultdict(float)
+        for name, ms in modules_ms.items():
+            packages_ms[name.split('.')[0]] += ms
+        
+        def slowest(times):
+            return [[name, round(ms, 2)] for name, ms in sorted(times.items(), key=lambda item: -item[1])[:options['top']]]
+        
+        result = {
+            'modules_imported': modules,
+            'runs': len(runs),
+            'setup_ms': round(statistics.median(timing['setup'] for timing, _ in runs) * 1000, 1),
+            'import_ms': round(statistics.median(timing['import'] for timing, _ in runs) * 1000, 1),
+            'slowest_packages': slowest(packages_ms),
+            'slowest_modules': slowest(modules_ms),
+        }
+        result['total_ms'] = round(result['setup_ms'] + result['import_ms'], 1)
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        
+        self.stdout.write(f"Median of {result['runs']} runs importing {', '.join(modules)}:")
+        self.stdout.write(f"  django.setup()  {result['setup_ms']:8.1f} ms")
+        self.stdout.write(f"  imports         {result['import_ms']:8.1f} ms")
+        self.stdout.write(f"  total           {result['total_ms']:8.1f} ms")
+        self.stdout.write('Slowest packages (own import time, after setup):')
+        for name, ms in result['slowest_packages']:
+            self.stdout.write(f"  {ms:8.2f} ms  {name}")
+        self.stdout.write('Slowest modules:')
+        for name, ms in result['slowest_modules']:
+            self.stdout.write(f"  {ms:8.2f} ms  {name}")
@@ -0,0 +1,55 @@
+# lrs/management/commands/pull_moodle_logs.py
+from django.core.management.base import BaseCommand, CommandError
+from lrs.management.progress import CommandReport, add_report_arguments
+from lrs.models import MoodleIntegration
+from lrs.services.moodle_logs import pull_logs
+
+
+class Command(BaseCommand):
+    help = ('Ingest statements from the Moodle standard log, resuming from the stored cursor. '
+            'Run one process per --course to parallelize a backfill.')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--integration-id', type=int, help='Moodle Integration ID (default: all active)')
+        parser.add_argument('--course', type=int, action='append', dest='courses',
+                            help='Only this course, with its own cursor (repeatable)')
+        parser.add_argument('--page-size', type=int, help='Log rows per page (default: LRS_MOODLE_LOG_PULL PAGE_SIZE)')
+        parser.add_argument('--max-pages', type=int, help='Stop after this many pages')
+        add_report_arguments(parser)
+    
+    def handle(self, *args, **options):
+        integrations = MoodleIntegration.objects.filter(is_active=True)
+        if options['integration_id']:
+            integrations = integrations.filter(id=options['integration_id'])
+        if not integrations.exists():
+            raise CommandError('No active Moodle integration found')
+        
+        report = CommandReport(self, options)
+        for integration in integrations:
+            for course_id in options['courses'] or [0]:
+                label = f"{integration.moodle_site_name}" + (f" course {course_id}" if course_id else '')
+                report.info(f"Pulling log from {label}")
+                progress = report.progress(label, 'rows')
+                try:
+                    totals = pull_logs(
+                        integration,
+                        course_id=course_id,
+                        page_size=options['page_size'],
+                        max_pages=options['max_pages'],
+                        on_page=lambda rows, created: progress.advance(rows, statements=created),
+                    )
+                except Exception as e:
+                    report.error(
+                        f"Error pulling log from {label}: {str(e)} (will resume from the last committed page)",
+                        integration=integration.moodle_site_name, course_id=course_id, **progress.summary(),
+                    )
+                    continue
+                report.success(
+                    f"Ingested {totals['statements_created']} statements from {totals['rows_read']} log rows "
+                    f"(cursor at log id {totals['last_log_id']})",
+                    integration=integration.moodle_site_name, course_id=course_id, **progress.summary(), **totals,
+                )
+        
+        report.finish()
+        if report.failures:
+            raise CommandError('Some log pulls failed')
@@ -0,0 +1,51 @@
+# lrs/management/commands/rebalance_shards.py
+from django.core.management.base import BaseCommand, CommandError
+from lrs.models import MoodleIntegration
+from lrs.services.shard_rebalance import rebalance_integration, target_shard
+from lrs.sharding import shard_aliases, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = "Move each Moodle site's statements to the shard named by its integration"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--integration-id', type=int, help='Moodle Integration ID (default: all)')
+        parser.add_argument('--shard', help='Assign this shard to the integration before moving its data')
+        parser.add_argument('--batch-size', type=int, default=500, help='Statements copied per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the statements that would move')
+    
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError('Sharding is not enabled (LRS_SHARDING)')
+        
+        integrations = MoodleIntegration.objects.order_by('pk')
+        if options['integration_id']:
+            integrations = integrations.filter(pk=options['integration_id'])
+            if not integrations.exists():
+                raise CommandError(f"Moodle integration {options['integration_id']} does not exist")
+        
+        shard = options['shard']
+        if shard is not None:
+            if not options['integration_id']:
+                raise CommandError('--shard requires --integration-id')
+            if shard not in shard_aliases():
+                raise CommandError(f"Unknown shard {shard!r} (one of {', '.join(shard_aliases())})")
+            if not options['dry_run']:
+                integrations.update(shard=shard)
+        
+        for integration in integrations:
+            if shard is not None:
+                integration.shard = shard
+            target = target_shard(integration)
+            self.stdout.write(f"{integration.moodle_site_name} -> {target}")
+            moved = rebalance_integration(
+                integration, batch_size=options['batch_size'], dry_run=options['dry_run']
+            )
+            for source, count in moved.items():
+                if count:
+                    verb = 'would move' if options['dry_run'] else 'moved'
+                    self.stdout.write(f"  {source}: {verb} {count} statements")
+        
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no changes were made'))
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,15 @@
+# lrs/management/commands/rebuild_learner_progress.py
+from django.core.management.base import BaseCommand
+from lrs.services.progress import rebuild_progress
+from lrs.sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Recompute the learner progress table from the statement table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Statements folded per batch')
+    
+    def handle(self, *args, **options):
+        rows = sum(fan_out(rebuild_progress, batch_size=options['batch_size']).values())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt learner progress: {rows} actor/activity rows"))
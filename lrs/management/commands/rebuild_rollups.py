@@ -0,0 +1,12 @@
+# lrs/management/commands/rebuild_rollups.py
+from django.core.management.base import BaseCommand
+from lrs.services.rollups import rebuild_daily_counts
+from lrs.sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Recompute statement rollup tables (daily counts) from the statement table'
+    
+    def handle(self, *args, **options):
+        days = sum(fan_out(rebuild_daily_counts).values())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt daily statement counts for {days} days"))
@@ -0,0 +1,20 @@
+# lrs/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from lrs.services.search import rebuild_index
+from lrs.sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for statements and activities'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows indexed per batch')
+    
+    def handle(self, *args, **options):
+        results = fan_out(rebuild_index, batch_size=options['batch_size']).values()
+        counts = {key: sum(result[key] for result in results) for key in ('statements', 'activities')}
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {counts['statements']} statements and {counts['activities']} activities"
+            )
+        )
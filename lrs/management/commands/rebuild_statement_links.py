@@ -0,0 +1,15 @@
+# lrs/management/commands/rebuild_statement_links.py
+from django.core.management.base import BaseCommand
+from lrs.services.statement_links import rebuild_links
+from lrs.sharding import fan_out
+
+
+class Command(BaseCommand):
+    help = 'Re-extract statement -> activity links (object and contextActivities)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Statements processed per batch')
+    
+    def handle(self, *args, **options):
+        count = sum(fan_out(rebuild_links, batch_size=options['batch_size']).values())
+        self.stdout.write(self.style.SUCCESS(f"Linked activities for {count} statements"))
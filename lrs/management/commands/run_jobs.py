@@ -0,0 +1,41 @@
+# lrs/management/commands/run_jobs.py
+import time
+
+from django.core.management.base import BaseCommand
+from lrs.services import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (Moodle syncs, reports); several workers may run at once'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--kind', action='append', dest='kinds', help='Only run jobs of this kind (repeatable)')
+    
+    def handle(self, *args, **options):
+        worker = jobs.worker_name()
+        processed = 0
+        self.stdout.write(f"Worker {worker} waiting for jobs")
+        
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s)")
+                
+                job = jobs.run_next(worker, options['kinds'])
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                
+                processed += 1
+                style = self.style.SUCCESS if job.status == 'succeeded' else self.style.ERROR
+                self.stdout.write(style(f"{job}: {job.message or job.status}"))
+        except KeyboardInterrupt:
+            pass
+        
+        self.stdout.write(f"Worker {worker} processed {processed} job(s)")
@@ -0,0 +1,113 @@
+# lrs/management/commands/run_stub_lrs.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+# Not compared when a statement id is received again (as in xAPI statement comparison)
+IGNORED_PROPERTIES = ('stored', 'authority', 'version', 'timestamp')
+
+
+def _comparable(statement):
+    return {key: value for key, value in statement.items() if key not in IGNORED_PROPERTIES}
+
+
+class StubLRSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, as pooled clients expect
+    
+    def _reply(self, code, body=b''):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _read(self):
+        return json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'[]')
+    
+    def do_POST(self):
+        data = self._read()
+        statements = data if isinstance(data, list) else [data]
+        code, ids = self.server.receive(statements)
+        self._reply(code, json.dumps(ids).encode() if code == 200 else b'')
+    
+    def do_PUT(self):
+        statement = self._read()
+        statement_id = parse_qs(urlparse(self.path).query).get('statementId', [None])[0]
+        if not isinstance(statement, dict) or not statement_id:
+            return self._reply(400)
+        code, _ = self.server.receive([{**statement, 'id': statement_id}])
+        self._reply(204 if code == 200 else code)
+    
+    def do_GET(self):
+        self._reply(200, json.dumps(self.server.summary()).encode())
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class StubLRSServer(ThreadingHTTPServer):
+    """Accepts statements like an LRS: a batch holding an id already stored
+    with different content is rejected with 409; every ``fail_every``-th
+    request is answered with 503"""
+    
+    def __init__(self, address, fail_every=0, on_stored=None):
+        super().__init__(address, StubLRSHandler)
+        self.fail_every = fail_every
+        self.on_stored = on_stored
+        self.requests = 0
+        self.received = 0
+        self.statements = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/xapi/"
+    
+    def receive(self, statements):
+        """(status, ids) of a request storing statements"""
+        with self.lock:
+            self.requests += 1
+            if self.fail_every and self.requests % self.fail_every == 0:
+                return 503, []
+            ids = [statement.get('id') for statement in statements]
+            if any(
+                statement_id in self.statements and _comparable(self.statements[statement_id]) != _comparable(statement)
+                for statement_id, statement in zip(ids, statements)
+            ):
+                return 409, []
+            for statement_id, statement in zip(ids, statements):
+                self.statements.setdefault(statement_id, statement)
+            self.received += len(statements)
+        if self.on_stored:
+            self.on_stored(len(statements), len(self.statements))
+        return 200, ids
+    
+    def summary(self):
+        with self.lock:
+            return {'requests': self.requests, 'statements': self.received, 'distinct': len(self.statements)}
+
+
+class Command(BaseCommand):
+    help = ('Run a stub LRS that accepts POSTed statements and counts them, to try statement forwarding '
+            '(set an integration\'s LRS endpoint to http://127.0.0.1:<port>/xapi/)')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--fail-every', type=int, default=0,
+                            help='Answer every Nth request with 503 to exercise retries (0: never)')
+    
+    def handle(self, *args, **options):
+        def on_stored(count, distinct):
+            self.stdout.write(f"{count} statements ({distinct} distinct so far)")
+        
+        server = StubLRSServer(('127.0.0.1', options['port']), options['fail_every'], on_stored)
+        self.stdout.write(f"Stub LRS listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,16 +1,24 @@
 # lrs/management/commands/sync_moodle_users.py
-from django.core.management.base import BaseCommand
-from lrs.models import Actor, MoodleIntegration
-import requests
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
+from lrs.management.progress import CommandReport, add_report_arguments
+from lrs.models import MoodleIntegration
+from lrs.services.moodle_sync import import_users
+
+# Users imported per call (one shard switch and progress update each)
+CHUNK_SIZE = 200
+
 
 class Command(BaseCommand):
     help = 'Sync users from Moodle to xAPI actors'
     
     def add_arguments(self, parser):
         parser.add_argument('--integration-id', type=int, help='Moodle Integration ID')
+        add_report_arguments(parser)
     
     def handle(self, *args, **options):
+        from lrs.services.moodle_api import MoodleAPIService
+        
         integration_id = options.get('integration_id')
         
         if integration_id:
@@ -18,55 +26,35 @@ class Command(BaseCommand):
         else:
             integrations = MoodleIntegration.objects.filter(is_active=True)
         
+        report = CommandReport(self, options)
         for integration in integrations:
-            self.stdout.write(f"Syncing users from {integration.moodle_site_name}")
-            
-            # Moodle web service call to get users
-            moodle_params = {
-                'wstoken': integration.moodle_token,
-                'wsfunction': 'core_user_get_users',
-                'moodlewsrestformat': 'json',
-                'criteria[0][key]': 'all',
-                'criteria[0][value]': ''
-            }
+            name = integration.moodle_site_name
+            report.info(f"Syncing users from {name}")
             
             try:
-                response = requests.post(
-                    f"{integration.moodle_url}/webservice/rest/server.php",
-                    data=moodle_params
+                users = MoodleAPIService(integration.moodle_url, integration.moodle_token).get_users(
+                    [{'key': 'all', 'value': ''}]
                 )
+                progress = report.progress(name, 'users', total=len(users))
+                for start in range(0, len(users), CHUNK_SIZE):
+                    chunk = users[start:start + CHUNK_SIZE]
+                    # Create or update actors through the agent identity index
+                    created, updated = import_users(integration.moodle_url, chunk)
+                    progress.advance(len(chunk), created=created, updated=updated)
                 
-                if response.status_code == 200:
-                    users = response.json().get('users', [])
-                    
-                    for user in users:
-                        # Create or update Actor
-                        actor, created = Actor.objects.update_or_create(
-                            moodle_user_id=user['id'],
-                            defaults={
-                                'actor_id': f"mailto:{user['email']}",
-                                'name': f"{user['firstname']} {user['lastname']}",
-                                'actor_type': 'Agent',
-                                'object_type': 'Agent',
-                                'mbox': user['email'],
-                                'account_name': str(user['id']),
-                                'account_homepage': integration.moodle_url,
-                            }
-                        )
-                        
-                        if created:
-                            self.stdout.write(f"  Created actor: {actor.name}")
-                        else:
-                            self.stdout.write(f"  Updated actor: {actor.name}")
-                    
-                    integration.last_sync = timezone.now()
-                    integration.save()
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Successfully synced {len(users)} users from {integration.moodle_site_name}")
-                    )
-                else:
-                    self.stderr.write(f"Error: {response.status_code} - {response.text}")
-                    
+                integration.last_sync = timezone.now()
+                integration.save(update_fields=['last_sync'])
             except Exception as e:
-                self.stderr.write(f"Error syncing from {integration.moodle_site_name}: {str(e)}")
\ No newline at end of file
+                report.error(f"Error syncing from {name}: {str(e)}", integration=name)
+                continue
+            
+            summary = progress.summary()
+            report.success(
+                f"Successfully synced {len(users)} users from {name} "
+                f"({summary.get('created', 0)} created, {summary.get('updated', 0)} updated)",
+                integration=name, last_sync=integration.last_sync.isoformat(), **summary,
+            )
+        
+        report.finish()
+        if report.failures:
+            raise CommandError('Some user syncs failed')
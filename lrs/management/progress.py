@@ -0,0 +1,179 @@
+# lrs/management/progress.py
+"""
+Progress and summary output of long-running management commands.
+
+Instead of a line per item, a ``Progress`` redraws a single progress bar on
+a terminal (at most every ``BAR_INTERVAL`` seconds) and writes a throughput
+line every ``LINE_INTERVAL`` seconds otherwise (cron, log files).
+``CommandReport`` collects the summary of each part of the run: with
+``--json`` stdout gets one JSON document at the end and nothing else
+(progress goes to stderr); ``--verbosity 0`` leaves out the progress.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+# Seconds between redraws of a terminal progress bar
+BAR_INTERVAL = 0.2
+# Seconds between throughput lines when not writing to a terminal
+LINE_INTERVAL = 10.0
+BAR_WIDTH = 24
+
+
+def add_report_arguments(parser):
+    parser.add_argument('--json', action='store_true', help='Print a JSON summary instead of progress output')
+    parser.add_argument('--progress-interval', type=float,
+                        help=f'Seconds between progress lines when not on a terminal (default: {LINE_INTERVAL:g})')
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 else f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class Progress:
+    """Items done (and named counters) of one part of a command run"""
+
+    def __init__(self, report: 'CommandReport', label: str, unit: str, total: Optional[int] = None):
+        self.report = report
+        self.label = label
+        self.unit = unit
+        self.total = total
+        self.done = 0
+        self.counters: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self._last_write = self.started
+        self._drawn = False
+        report.active = self
+
+    def set_total(self, total: int):
+        self.total = total
+        self.update(force=True)
+
+    def advance(self, count: int = 1, **counters: int):
+        self.done += count
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.update()
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def status(self) -> str:
+        rate = self.rate()
+        parts = [f"{self.done}/{self.total} {self.unit}" if self.total is not None else f"{self.done} {self.unit}"]
+        if self.total:
+            parts[0] += f" ({100 * self.done // self.total}%)"
+        parts.append(f"{rate:,.0f}/s")
+        if self.total and rate and self.done < self.total:
+            parts.append(f"eta {_duration((self.total - self.done) / rate)}")
+        parts.extend(f"{value} {name}" for name, value in self.counters.items())
+        return ', '.join(parts)
+
+    def update(self, force: bool = False):
+        if not self.report.show_progress:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write < (BAR_INTERVAL if self.report.terminal else self.report.line_interval):
+            return
+        self._last_write = now
+        if self.report.terminal:
+            bar = ''
+            if self.total:
+                filled = min(BAR_WIDTH, BAR_WIDTH * self.done // self.total)
+                bar = f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] "
+            self.report.write(f"\r\033[K  {self.label} {bar}{self.status()}", ending='')
+            self._drawn = True
+        else:
+            self.report.write(f"  {self.label}: {self.status()}")
+
+    def close(self):
+        """End the progress bar line (if one was drawn)"""
+        if self._drawn:
+            # The final counts, then end the line
+            self.update(force=True)
+            self.report.write('')
+            self._drawn = False
+        if self.report.active is self:
+            self.report.active = None
+
+    def summary(self) -> Dict[str, Any]:
+        self.close()
+        summary = {self.unit: self.done, **self.counters, 'seconds': round(time.monotonic() - self.started, 3),
+                   'per_second': round(self.rate(), 1)}
+        if self.total is not None:
+            summary['total'] = self.total
+        return summary
+
+
+class CommandReport:
+    """Output of one run of ``command``: progress, messages and the summaries
+    of its parts (``options`` are the command's, with add_report_arguments).
+
+    ``stdout_is_data`` sends everything to stderr, for commands writing
+    their data to stdout.
+    """
+
+    def __init__(self, command, options: Dict[str, Any], stdout_is_data: bool = False):
+        self.command = command
+        self.json = options.get('json', False)
+        self.verbosity = options.get('verbosity', 1)
+        interval = options.get('progress_interval')
+        self.line_interval = LINE_INTERVAL if interval is None else interval
+        # Progress goes to stderr when stdout carries data or the JSON document
+        self.stdout_is_data = stdout_is_data
+        self.stream = command.stderr if stdout_is_data or self.json else command.stdout
+        self.show_progress = self.verbosity > 0
+        self.terminal = self.stream.isatty()
+        # Summaries are only kept for the JSON document (forward_statements may run for days)
+        self.results: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.failures = 0
+        self.active: Optional[Progress] = None
+        self.started = time.monotonic()
+
+    def write(self, message: str, ending: Optional[str] = None, style_func=None):
+        # The stderr wrapper would otherwise style every line as an error
+        self.stream.write(message, style_func=style_func or (lambda text: text), ending=ending)
+
+    def progress(self, label: str, unit: str, total: Optional[int] = None) -> Progress:
+        return Progress(self, label, unit, total)
+
+    def _end_progress(self):
+        # Messages start on a new line, after the progress bar
+        if self.active is not None:
+            self.active.close()
+
+    def info(self, message: str):
+        self._end_progress()
+        if self.verbosity > 0 and not self.json:
+            self.write(message)
+
+    def success(self, message: Optional[str], **summary):
+        """Record the summary of a part of the run (and report it, unless ``message`` is None)"""
+        self._end_progress()
+        if self.json:
+            self.results.append(summary)
+        elif message is not None:
+            self.write(message, style_func=self.command.style.SUCCESS)
+
+    def error(self, message: str, **summary):
+        self._end_progress()
+        self.failures += 1
+        if self.json:
+            self.errors.append({'message': message, **summary})
+        else:
+            self.command.stderr.write(message)
+
+    def finish(self) -> Dict[str, Any]:
+        document = {
+            'command': self.command.__module__.rsplit('.', 1)[-1],
+            'results': self.results,
+            'errors': self.errors,
+            'seconds': round(time.monotonic() - self.started, 3),
+        }
+        if self.json:
+            output = self.command.stderr if self.stdout_is_data else self.command.stdout
+            output.write(json.dumps(document, default=str), style_func=lambda text: text)
+        return document
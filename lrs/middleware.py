@@ -0,0 +1,47 @@
+# lrs/middleware.py
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.decorators import sync_and_async_middleware
+
+from . import routers
+
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def _should_stick(request, response, state) -> bool:
+    # Unsafe requests count even when the write happened on the group-commit
+    # writer thread, where the router cannot see the request
+    return state.get('written') or (request.method in UNSAFE_METHODS and response.status_code < 400)
+
+
+@sync_and_async_middleware
+def read_replica_middleware(get_response):
+    """Read-your-writes for the replica router (``lrs.routers``).
+
+    Requests of a client that wrote within ``STICKY_SECONDS`` read from the
+    primary; a request that writes renews the window.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not routers.get_routing_settings()['REPLICAS']:
+                return await get_response(request)
+            token = routers.begin_request(pinned=await sync_to_async(routers.is_sticky)(request))
+            try:
+                response = await get_response(request)
+            finally:
+                state = routers.end_request(token)
+            if _should_stick(request, response, state):
+                await sync_to_async(routers.make_sticky)(request, response)
+            return response
+    else:
+        def middleware(request):
+            if not routers.get_routing_settings()['REPLICAS']:
+                return get_response(request)
+            token = routers.begin_request(pinned=routers.is_sticky(request))
+            try:
+                response = get_response(request)
+            finally:
+                state = routers.end_request(token)
+            if _should_stick(request, response, state):
+                routers.make_sticky(request, response)
+            return response
+    return middleware
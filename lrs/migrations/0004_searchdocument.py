@@ -0,0 +1,109 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SQLITE_FTS_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS lrs_searchdocument_fts USING fts5("
+    "body, content='lrs_searchdocument', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS lrs_searchdocument_ai AFTER INSERT ON lrs_searchdocument BEGIN "
+    "INSERT INTO lrs_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS lrs_searchdocument_ad AFTER DELETE ON lrs_searchdocument BEGIN "
+    "INSERT INTO lrs_searchdocument_fts(lrs_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS lrs_searchdocument_au AFTER UPDATE ON lrs_searchdocument BEGIN "
+    "INSERT INTO lrs_searchdocument_fts(lrs_searchdocument_fts, rowid, body) "
+    "VALUES ('delete', old.id, old.body); "
+    "INSERT INTO lrs_searchdocument_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS lrs_searchdocument_au",
+    "DROP TRIGGER IF EXISTS lrs_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS lrs_searchdocument_ai",
+    "DROP TABLE IF EXISTS lrs_searchdocument_fts",
+]
+
+POSTGRES_FTS_SQL = [
+    "CREATE INDEX IF NOT EXISTS lrs_searchdocument_body_fts "
+    "ON lrs_searchdocument USING GIN (to_tsvector('simple', body))",
+]
+
+POSTGRES_DROP_SQL = ["DROP INDEX IF EXISTS lrs_searchdocument_body_fts"]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            _run(schema_editor, SQLITE_FTS_SQL)
+        except Exception:
+            # SQLite built without FTS5: search falls back to icontains
+            pass
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FTS_SQL)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_DROP_SQL)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0003_moodleintegration_auto_sync_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("body", models.TextField(blank=True, default="")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "activity",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="lrs.activity",
+                    ),
+                ),
+                (
+                    "statement",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="lrs.statement",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            create_fulltext_index,
+            drop_fulltext_index,
+            hints={"model_name": "searchdocument"},
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:17
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_counts(apps, schema_editor):
+    Statement = apps.get_model("lrs", "Statement")
+    StatementDailyCount = apps.get_model("lrs", "StatementDailyCount")
+    rows = (
+        Statement.objects.order_by()
+        .annotate(day=TruncDate("timestamp"))
+        .values("day")
+        .annotate(total=Count("id"))
+    )
+    StatementDailyCount.objects.bulk_create(
+        [
+            StatementDailyCount(day=row["day"], count=row["total"])
+            for row in rows
+            if row["day"]
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0004_searchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatementDailyCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True)),
+                ("count", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["-day"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="statement",
+            index=models.Index(fields=["timestamp"], name="lrs_stmt_timestamp_idx"),
+        ),
+        migrations.RunPython(populate_daily_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:18
+
+import uuid
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_registration(apps, schema_editor):
+    Statement = apps.get_model("lrs", "Statement")
+    queryset = Statement.objects.filter(context__has_key="registration").only(
+        "id", "context"
+    )
+    for statement in queryset.iterator():
+        try:
+            registration = uuid.UUID(str(statement.context["registration"]))
+        except (TypeError, ValueError):
+            continue
+        Statement.objects.filter(pk=statement.pk).update(registration=registration)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0005_statement_rollups_and_timestamp_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatementActivityLink",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[
+                            ("object", "Object"),
+                            ("parent", "Parent"),
+                            ("grouping", "Grouping"),
+                            ("category", "Category"),
+                            ("other", "Other"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="registration",
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="statement",
+            index=models.Index(fields=["stored", "id"], name="lrs_stmt_stored_idx"),
+        ),
+        migrations.AddField(
+            model_name="statementactivitylink",
+            name="activity",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="statement_links",
+                to="lrs.activity",
+            ),
+        ),
+        migrations.AddField(
+            model_name="statementactivitylink",
+            name="statement",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="activity_links",
+                to="lrs.statement",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="statementactivitylink",
+            index=models.Index(
+                fields=["activity", "role"], name="lrs_link_activity_role_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="statementactivitylink",
+            constraint=models.UniqueConstraint(
+                fields=("statement", "activity", "role"),
+                name="lrs_unique_statement_activity_role",
+            ),
+        ),
+        migrations.RunPython(backfill_registration, migrations.RunPython.noop),
+    ]
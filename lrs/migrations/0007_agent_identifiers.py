@@ -0,0 +1,131 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:21
+
+import hashlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copies of the lrs.services.agents helpers as of this migration (later
+# changes to them must not change what it does)
+
+
+def normalize_mbox(mbox):
+    if not mbox:
+        return None
+    address = mbox.strip()
+    if address.lower().startswith("mailto:"):
+        address = address[len("mailto:") :]
+    local, _, domain = address.partition("@")
+    if not domain:
+        return f"mailto:{address}"
+    return f"mailto:{local}@{domain.lower()}"
+
+
+def mbox_sha1sum(mbox):
+    return hashlib.sha1(normalize_mbox(mbox).encode("utf-8")).hexdigest()
+
+
+def account_key(home_page, name):
+    return f"{(home_page or '').strip().rstrip('/')}|{str(name).strip()}"
+
+
+def agent_identifiers(agent):
+    identifiers = []
+    if agent.get("mbox"):
+        mbox = normalize_mbox(agent["mbox"])
+        identifiers.append(("mbox", mbox))
+        identifiers.append(("mbox_sha1sum", mbox_sha1sum(mbox)))
+    elif agent.get("mbox_sha1sum"):
+        identifiers.append(("mbox_sha1sum", agent["mbox_sha1sum"].strip().lower()))
+    if agent.get("openid"):
+        identifiers.append(("openid", agent["openid"].strip()))
+    account = agent.get("account")
+    if isinstance(account, dict) and account.get("name") not in (None, ""):
+        identifiers.append(("account", account_key(account.get("homePage"), account["name"])))
+    return identifiers
+
+
+def backfill_identifiers(apps, schema_editor):
+    Actor = apps.get_model("lrs", "Actor")
+    AgentIdentifier = apps.get_model("lrs", "AgentIdentifier")
+    for actor in Actor.objects.order_by("pk").iterator():
+        agent = {"openid": actor.openid}
+        mbox = actor.mbox
+        if not mbox and "@" in actor.actor_id and " " not in actor.actor_id:
+            mbox = actor.actor_id
+        if mbox:
+            agent["mbox"] = mbox
+        elif actor.mbox_sha1sum:
+            agent["mbox_sha1sum"] = actor.mbox_sha1sum
+        if actor.account_name:
+            agent["account"] = {
+                "homePage": actor.account_homepage,
+                "name": actor.account_name,
+            }
+
+        if mbox:
+            normalized = normalize_mbox(mbox)
+            Actor.objects.filter(pk=actor.pk).update(
+                mbox=normalized[len("mailto:") :], mbox_sha1sum=mbox_sha1sum(normalized)
+            )
+        # Oldest actor wins when duplicates share an identifier
+        AgentIdentifier.objects.bulk_create(
+            [
+                AgentIdentifier(ifi_type=ifi_type, value=value, actor_id=actor.pk)
+                for ifi_type, value in agent_identifiers(agent)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0006_statement_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AgentIdentifier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ifi_type",
+                    models.CharField(
+                        choices=[
+                            ("mbox", "mbox"),
+                            ("mbox_sha1sum", "mbox_sha1sum"),
+                            ("openid", "openid"),
+                            ("account", "account"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("value", models.CharField(max_length=700)),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="identifiers",
+                        to="lrs.actor",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="agentidentifier",
+            constraint=models.UniqueConstraint(
+                fields=("ifi_type", "value"), name="lrs_unique_agent_identifier"
+            ),
+        ),
+        migrations.RunPython(backfill_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0008_jobs"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="statement",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name="MoodleLogCursor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("course_id", models.IntegerField(default=0)),
+                ("last_log_id", models.BigIntegerField(default=0)),
+                ("statements_ingested", models.PositiveBigIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "integration",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="log_cursors",
+                        to="lrs.moodleintegration",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="moodlelogcursor",
+            constraint=models.UniqueConstraint(
+                fields=("integration", "course_id"), name="lrs_unique_log_cursor"
+            ),
+        ),
+    ]
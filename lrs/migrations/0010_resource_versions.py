@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:33
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.utils.timezone
+
+
+def seed_versions(apps, schema_editor):
+    # Last change of existing data, so Last-Modified is meaningful right away
+    sources = {
+        "statements": ("Statement", "stored"),
+        "actors": ("Actor", "created_at"),
+        "verbs": ("Verb", "created_at"),
+        "activities": ("Activity", "created_at"),
+    }
+    ResourceVersion = apps.get_model("lrs", "ResourceVersion")
+    for resource, (model_name, field) in sources.items():
+        model = apps.get_model("lrs", model_name)
+        changed_at = model.objects.aggregate(latest=Max(field))["latest"]
+        ResourceVersion.objects.create(
+            resource=resource,
+            version=1,
+            changed_at=changed_at or django.utils.timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0009_moodle_log_cursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResourceVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("resource", models.CharField(max_length=50, unique=True)),
+                ("version", models.PositiveBigIntegerField(default=0)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
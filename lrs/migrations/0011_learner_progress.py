@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0010_resource_versions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LearnerProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("statements", models.PositiveIntegerField(default=0)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("best_score", models.FloatField(blank=True, null=True)),
+                ("last_score", models.FloatField(blank=True, null=True)),
+                ("last_scored_at", models.DateTimeField(blank=True, null=True)),
+                ("completed", models.BooleanField(default=False)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                ("success", models.BooleanField(blank=True, null=True)),
+                ("first_seen", models.DateTimeField()),
+                ("last_seen", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "activity",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="learner_progress",
+                        to="lrs.activity",
+                    ),
+                ),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress",
+                        to="lrs.actor",
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="course_progress",
+                        to="lrs.activity",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["course", "actor"], name="lrs_progress_course_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="learnerprogress",
+            constraint=models.UniqueConstraint(
+                fields=("actor", "activity"), name="lrs_unique_learner_progress"
+            ),
+        ),
+    ]
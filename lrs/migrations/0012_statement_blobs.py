@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0011_learner_progress"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatementBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                ("data", models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="object_compact",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="authority_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="lrs.statementblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="context_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="lrs.statementblob",
+            ),
+        ),
+    ]
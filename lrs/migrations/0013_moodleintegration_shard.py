@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0012_statement_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moodleintegration",
+            name="shard",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Database alias holding this site's statements when sharding is enabled (blank: default shard)",
+                max_length=100,
+            ),
+        ),
+    ]
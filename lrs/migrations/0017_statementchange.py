@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_changes(apps, schema_editor):
+    """Feed the statements stored so far, oldest first"""
+    db = schema_editor.connection.alias
+    Statement = apps.get_model("lrs", "Statement")
+    StatementChange = apps.get_model("lrs", "StatementChange")
+    ChangeSequence = apps.get_model("lrs", "ChangeSequence")
+    seq = 0
+    batch = []
+    rows = (
+        Statement.objects.using(db)
+        .order_by("stored", "pk")
+        .values_list("pk", "statement_id", "stored")
+    )
+    for pk, statement_id, stored in rows.iterator(chunk_size=2000):
+        seq += 1
+        batch.append(
+            StatementChange(
+                seq=seq, statement_id=pk, statement_uuid=statement_id, created_at=stored
+            )
+        )
+        if len(batch) >= 2000:
+            StatementChange.objects.using(db).bulk_create(batch)
+            batch = []
+    StatementChange.objects.using(db).bulk_create(batch)
+    ChangeSequence.objects.using(db).create(last=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0016_lrscredential"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StatementChange",
+            fields=[
+                ("seq", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("statement_uuid", models.UUIDField()),
+                ("action", models.CharField(default="stored", max_length=10)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "statement",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="lrs.statement",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["seq"],
+            },
+        ),
+        migrations.RunPython(
+            backfill_changes,
+            migrations.RunPython.noop,
+            hints={"model_name": "statementchange"},
+        ),
+    ]
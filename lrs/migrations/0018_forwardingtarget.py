@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0017_statementchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForwardingTarget",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("endpoint", models.URLField(unique=True)),
+                (
+                    "authorization",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text='Authorization header sent to the LRS (e.g. "Basic ...")',
+                        max_length=255,
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=True)),
+                (
+                    "cursor",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Change feed cursor of the last batch delivered",
+                        max_length=500,
+                    ),
+                ),
+                ("statements_forwarded", models.PositiveBigIntegerField(default=0)),
+                ("last_forwarded_at", models.DateTimeField(blank=True, null=True)),
+                ("failures", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0018_forwardingtarget"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="moodleintegration",
+            name="retention_action",
+            field=models.CharField(
+                choices=[("delete", "Delete"), ("archive", "Archive, then delete")],
+                default="delete",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="moodleintegration",
+            name="retention_days",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Expire statements stored more than this many days ago (blank: keep)",
+                null=True,
+            ),
+        ),
+    ]
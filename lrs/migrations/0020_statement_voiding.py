@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:21
+
+import uuid
+
+from django.db import migrations, models
+
+VOIDED_VERB = "http://adlnet.gov/expapi/verbs/voided"
+
+
+def void_stored_statements(apps, schema_editor):
+    """Apply the voiding statements stored so far (rebuild the rollups and
+    learner progress afterwards if any statement was voided)"""
+    db = schema_editor.connection.alias
+    Statement = apps.get_model("lrs", "Statement")
+    targets = set()
+    voiding = Statement.objects.using(db).filter(verb__verb_id=VOIDED_VERB)
+    for pk, obj in voiding.values_list("pk", "object").iterator(chunk_size=2000):
+        obj = obj or {}
+        if obj.get("objectType") != "StatementRef":
+            continue
+        try:
+            target = uuid.UUID(str(obj.get("id")))
+        except ValueError:
+            continue
+        Statement.objects.using(db).filter(pk=pk).update(voids=target)
+        targets.add(target)
+    targets = list(targets)
+    for start in range(0, len(targets), 500):
+        Statement.objects.using(db).filter(
+            statement_id__in=targets[start : start + 500], voids__isnull=True
+        ).update(is_valid=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0019_retention"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="statement",
+            name="voids",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="statement",
+            index=models.Index(
+                condition=models.Q(("is_valid", True)),
+                fields=["stored", "id"],
+                name="lrs_stmt_valid_stored_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="statement",
+            index=models.Index(
+                condition=models.Q(("is_valid", True)),
+                fields=["timestamp"],
+                name="lrs_stmt_valid_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="statement",
+            index=models.Index(
+                condition=models.Q(("voids__isnull", False)),
+                fields=["voids"],
+                name="lrs_stmt_voids_idx",
+            ),
+        ),
+        migrations.RunPython(
+            void_stored_statements,
+            migrations.RunPython.noop,
+            hints={"model_name": "statement"},
+        ),
+    ]
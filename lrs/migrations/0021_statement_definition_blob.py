@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:43
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _digest(data):
+    # As lrs.services.compact_storage.blob_digest at the time of this migration
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def store_compact_definitions(apps, schema_editor):
+    """Compact statements took object.definition from their activity: store
+    the definition they show now in a blob of their own"""
+    db = schema_editor.connection.alias
+    Statement = apps.get_model("lrs", "Statement")
+    StatementBlob = apps.get_model("lrs", "StatementBlob")
+    Activity = apps.get_model("lrs", "Activity")
+    compact = Statement.objects.using(db).filter(object_compact=True, definition_blob__isnull=True)
+    activity_ids = (
+        compact.exclude(activity__isnull=True).order_by().values_list("activity_id", flat=True).distinct()
+    )
+    for activity_id, definition in Activity.objects.using(db).filter(pk__in=list(activity_ids)).values_list(
+        "pk", "definition"
+    ):
+        if not definition:
+            continue
+        blob, _ = StatementBlob.objects.using(db).get_or_create(
+            digest=_digest(definition), defaults={"data": definition}
+        )
+        compact.filter(activity_id=activity_id).update(definition_blob=blob)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0020_statement_voiding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="statement",
+            name="definition_blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="lrs.statementblob",
+            ),
+        ),
+        migrations.RunPython(
+            store_compact_definitions,
+            migrations.RunPython.noop,
+            hints={"model_name": "statement"},
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:02
+
+from django.db import migrations
+
+SYNC_KINDS = ["sync_moodle_users", "sync_moodle_courses", "sync_moodle_activities"]
+
+
+def remove_job_tokens(apps, schema_editor):
+    """Moodle sync jobs stored the Moodle URL and token in their params: point
+    them at the integration instead (queued jobs without one fail)"""
+    Job = apps.get_model("lrs", "Job")
+    MoodleIntegration = apps.get_model("lrs", "MoodleIntegration")
+    for job in Job.objects.filter(kind__in=SYNC_KINDS).iterator():
+        params = job.params or {}
+        if "integration_id" in params:
+            continue
+        integration = (
+            MoodleIntegration.objects.filter(moodle_url=params.get("moodle_url")).order_by("pk").first()
+        )
+        if integration is not None:
+            job.params = {"integration_id": integration.pk}
+        else:
+            job.params = {"moodle_url": params.get("moodle_url")}
+            if job.status in ("queued", "running"):
+                job.status = "failed"
+                job.message = job.error = "Moodle integration not found"
+        job.save(update_fields=["params", "status", "message", "error"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("lrs", "0021_statement_definition_blob"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_job_tokens, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 # lrs/models.py
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.utils import timezone
 import json
 import uuid
 from django.core.serializers.json import DjangoJSONEncoder
@@ -27,6 +29,32 @@ class Actor(models.Model):
     def __str__(self):
         return f"{self.name} ({self.actor_type})"
 
+class AgentIdentifier(models.Model):
+    """Normalized inverse functional identifier (IFI) of an actor.
+
+    One row per mbox, mbox_sha1sum, openid and account (``homePage|name``),
+    so any agent form resolves to its actor with a single indexed lookup.
+    See ``lrs.services.agents`` for the normalization rules.
+    """
+    IFI_TYPES = (
+        ('mbox', 'mbox'),
+        ('mbox_sha1sum', 'mbox_sha1sum'),
+        ('openid', 'openid'),
+        ('account', 'account'),
+    )
+    
+    ifi_type = models.CharField(max_length=20, choices=IFI_TYPES)
+    value = models.CharField(max_length=700)
+    actor = models.ForeignKey(Actor, on_delete=models.CASCADE, related_name='identifiers')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ifi_type', 'value'], name='lrs_unique_agent_identifier'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ifi_type}: {self.value}"
+
 class Verb(models.Model):
     """xAPI Verb model"""
     verb_id = models.URLField()
@@ -48,6 +76,18 @@ class Activity(models.Model):
     def __str__(self):
         return self.activity_id
 
+class StatementBlob(models.Model):
+    """Content-addressed JSON shared by statements (compact storage).
+
+    Repeated ``context`` and ``authority`` structures are stored once, keyed
+    by the SHA-256 of their canonical JSON; see ``lrs.services.compact_storage``.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    data = models.JSONField()
+    
+    def __str__(self):
+        return self.digest[:12]
+
 class Statement(models.Model):
     """xAPI Statement model"""
     statement_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
@@ -57,15 +97,30 @@ class Statement(models.Model):
     object = models.JSONField(default=dict)  # Can be Activity, Agent, etc.
     result = models.JSONField(default=dict, null=True, blank=True)
     context = models.JSONField(default=dict, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # when the experience happened (given by the statement)
     stored = models.DateTimeField(auto_now_add=True)
     authority = models.JSONField(default=dict, null=True, blank=True)
     version = models.CharField(max_length=20, default='1.0.0')
     moodle_data = models.JSONField(default=dict, null=True, blank=True)  # Store original Moodle data
-    is_valid = models.BooleanField(default=True)
+    is_valid = models.BooleanField(default=True)  # False once voided (see lrs.services.voiding)
+    voids = models.UUIDField(null=True, blank=True)  # statement_id voided by this voiding statement
+    registration = models.UUIDField(null=True, blank=True, db_index=True)  # context.registration
+    # Compact storage: object.definition, context and authority come from blobs
+    object_compact = models.BooleanField(default=False)
+    definition_blob = models.ForeignKey(StatementBlob, on_delete=models.PROTECT, related_name='+', null=True, blank=True)
+    context_blob = models.ForeignKey(StatementBlob, on_delete=models.PROTECT, related_name='+', null=True, blank=True)
+    authority_blob = models.ForeignKey(StatementBlob, on_delete=models.PROTECT, related_name='+', null=True, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='lrs_stmt_timestamp_idx'),
+            models.Index(fields=['stored', 'id'], name='lrs_stmt_stored_idx'),
+            # Read paths only see valid (not voided) statements
+            models.Index(fields=['stored', 'id'], name='lrs_stmt_valid_stored_idx', condition=Q(is_valid=True)),
+            models.Index(fields=['timestamp'], name='lrs_stmt_valid_ts_idx', condition=Q(is_valid=True)),
+            models.Index(fields=['voids'], name='lrs_stmt_voids_idx', condition=Q(voids__isnull=False)),
+        ]
     
     def __str__(self):
         return f"{self.actor.name} - {self.verb.verb_id} - {self.timestamp}"
@@ -81,6 +136,283 @@ class MoodleIntegration(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_sync = models.DateTimeField(null=True, blank=True)
+    shard = models.CharField(max_length=100, blank=True, default='', help_text="Database alias holding this site's statements when sharding is enabled (blank: default shard)")
+    # Applied by manage.py apply_retention (see lrs.services.retention)
+    retention_days = models.PositiveIntegerField(null=True, blank=True, help_text="Expire statements stored more than this many days ago (blank: keep)")
+    retention_action = models.CharField(max_length=10, choices=[('delete', 'Delete'), ('archive', 'Archive, then delete')], default='delete')
+    
+    def __str__(self):
+        return self.moodle_site_name
+
+class MoodleLogCursor(models.Model):
+    """High-water mark of the Moodle log pull connector.
+
+    One row per integration and course (``course_id`` 0 = whole site), so
+    backfills can run per course in parallel; see ``lrs.services.moodle_logs``.
+    """
+    integration = models.ForeignKey(MoodleIntegration, on_delete=models.CASCADE, related_name='log_cursors')
+    course_id = models.IntegerField(default=0)
+    last_log_id = models.BigIntegerField(default=0)
+    statements_ingested = models.PositiveBigIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['integration', 'course_id'], name='lrs_unique_log_cursor'),
+        ]
+    
+    def __str__(self):
+        return f"{self.integration} course {self.course_id or 'all'} @ {self.last_log_id}"
+
+class StatementActivityLink(models.Model):
+    """Activity referenced by a statement, as object or in context.contextActivities.
+
+    Extracted on ingest so ``related_activities`` queries are index lookups
+    rather than scans over the ``context`` JSON.
+    """
+    ROLES = (
+        ('object', 'Object'),
+        ('parent', 'Parent'),
+        ('grouping', 'Grouping'),
+        ('category', 'Category'),
+        ('other', 'Other'),
+    )
+    
+    statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='activity_links')
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='statement_links')
+    role = models.CharField(max_length=20, choices=ROLES)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['statement', 'activity', 'role'], name='lrs_unique_statement_activity_role'),
+        ]
+        indexes = [
+            models.Index(fields=['activity', 'role'], name='lrs_link_activity_role_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.statement_id} -> {self.activity_id} ({self.role})"
+
+
+class StatementDailyCount(models.Model):
+    """Number of statements per day (by statement timestamp), maintained on ingest"""
+    day = models.DateField(unique=True)
+    count = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"{self.day}: {self.count}"
+
+
+class LearnerProgress(models.Model):
+    """Progress of an actor on an activity, folded from its statements on ingest.
+
+    ``course`` is the course the activity belongs to (from the statement's
+    contextActivities, or the activity itself for course statements), so a
+    course gradebook is a single indexed read.  See ``lrs.services.progress``.
+    """
+    actor = models.ForeignKey(Actor, on_delete=models.CASCADE, related_name='progress')
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='learner_progress')
+    course = models.ForeignKey(Activity, on_delete=models.SET_NULL, related_name='course_progress', null=True, blank=True)
+    statements = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    best_score = models.FloatField(null=True, blank=True)  # scaled, 0..1
+    last_score = models.FloatField(null=True, blank=True)
+    last_scored_at = models.DateTimeField(null=True, blank=True)
+    completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    success = models.BooleanField(null=True, blank=True)  # None until judged; True once passed
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['actor', 'activity'], name='lrs_unique_learner_progress'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'actor'], name='lrs_progress_course_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} on {self.activity_id}: {self.attempts} attempts"
+
+
+class SearchDocument(models.Model):
+    """Flattened full-text document for a statement or an activity.
+
+    The ``body`` column is indexed by SQLite FTS5 or a PostgreSQL tsvector
+    GIN index (see migration 0004); use ``lrs.services.search`` to query it.
+    """
+    statement = models.OneToOneField(Statement, on_delete=models.CASCADE, related_name='search_document', null=True, blank=True)
+    activity = models.OneToOneField(Activity, on_delete=models.CASCADE, related_name='search_document', null=True, blank=True)
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        target = f"statement {self.statement_id}" if self.statement_id else f"activity {self.activity_id}"
+        return f"Search document for {target}"
+
+
+class ResourceVersion(models.Model):
+    """Change counter per API resource (statements, actors, verbs, activities).
+
+    Bumped in the transaction of every write, so ETags and the response cache
+    cost one indexed read; see ``lrs.services.http_cache``.
+    """
+    resource = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
+
+
+class Job(models.Model):
+    """Background job (Moodle sync, report generation) run by ``manage.py run_jobs``.
+
+    Enqueued by the API views, claimed by a worker with a conditional
+    UPDATE, and polled by the UI through ``/api/jobs/<id>/``.  See
+    ``lrs.services.jobs``.
+    """
+    STATUSES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    items_total = models.PositiveIntegerField(null=True, blank=True)
+    items_done = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Touched on every progress update; stale running jobs are requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='lrs_job_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ReportArtifact(models.Model):
+    """A generated report, downloaded by ``report_id`` until ``expires_at``.
+
+    Written once by the report job and served by ``download_xapi_report``;
+    expired rows are deleted by ``manage.py cleanup_reports`` (and when new
+    reports are stored).  See ``lrs.services.reports``.
+    """
+    report_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    size = models.PositiveIntegerField(default=0, help_text='Bytes of report JSON')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.kind} report {self.report_id}"
+
+
+class RateLimitBucket(models.Model):
+    """Token bucket of an ingest client (bearer token, Moodle site or IP),
+    shared by all worker processes.  See ``lrs.services.rate_limit``."""
+    key = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField()
+    updated = models.FloatField(help_text='Unix time of the last refill')
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f}"
+
+
+class LRSCredential(models.Model):
+    """Bearer token of an LRS client (a Moodle site sending statements).
+
+    Only the SHA-256 of the token is stored; the token itself is shown once
+    when the credential is created.  See ``lrs.services.credentials``.
+    """
+    integration = models.ForeignKey(MoodleIntegration, on_delete=models.CASCADE, related_name='credentials')
+    name = models.CharField(max_length=100, blank=True, default='')
+    token_prefix = models.CharField(max_length=12, help_text='First characters of the token, to recognise it')
+    token_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.name or self.integration} ({self.token_prefix}…)"
+
+
+class StatementChange(models.Model):
+    """Append-only change feed of the statement table, in ingest order.
+
+    ``seq`` is allocated from ``ChangeSequence`` inside the ingest
+    transaction, so rows become visible in ``seq`` order and a consumer
+    reading ``seq > cursor`` gets every change exactly once.  The statement
+    reference has no constraint: feed rows outlive deleted statements.
+    See ``lrs.services.change_feed``.
+    """
+    seq = models.BigIntegerField(primary_key=True)
+    statement = models.ForeignKey(
+        Statement, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    statement_uuid = models.UUIDField()
+    action = models.CharField(max_length=10, default='stored')
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['seq']
+    
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.statement_uuid}"
+
+
+class ChangeSequence(models.Model):
+    """Last ``StatementChange.seq`` handed out (a single row per database)"""
+    last = models.BigIntegerField(default=0)
+
+
+class ForwardingTarget(models.Model):
+    """Secondary LRS receiving the statements of the integrations whose
+    ``lrs_endpoint`` it is, with its delivery cursor into the change feed.
+
+    The cursor only advances after the LRS accepted a batch, so forwarding
+    resumes where it stopped.  See ``lrs.services.forwarding``.
+    """
+    endpoint = models.URLField(unique=True)
+    authorization = models.CharField(max_length=255, blank=True, default='',
+                                     help_text='Authorization header sent to the LRS (e.g. "Basic ...")')
+    is_active = models.BooleanField(default=True)
+    cursor = models.CharField(max_length=500, blank=True, default='', help_text='Change feed cursor of the last batch delivered')
+    statements_forwarded = models.PositiveBigIntegerField(default=0)
+    last_forwarded_at = models.DateTimeField(null=True, blank=True)
+    # Consecutive failed runs; the next one waits until next_attempt_at
+    failures = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.moodle_site_name
\ No newline at end of file
+        return self.endpoint
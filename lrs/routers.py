@@ -0,0 +1,135 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default`` (the primary).  Reads of the statement data
+(``READ_MODELS``) go to one of ``LRS_DATABASE_ROUTING['REPLICAS']``, except:
+
+* inside a transaction on the primary (ingest and its signal receivers must
+  see their own uncommitted rows);
+* for the rest of a request once it has written anything;
+* for ``STICKY_SECONDS`` after a client's last write, so a client reading
+  back what it just posted never hits a lagging replica.  The middleware
+  tracks this with a cookie and, for clients that do not keep cookies
+  (most xAPI clients), a short-lived cache entry keyed by credentials/IP.
+
+Jobs, integrations, cursors and other bookkeeping tables always use the
+primary.  Without replicas configured every query uses ``default``.
+"""
+import contextvars
+import hashlib
+import random
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+DEFAULTS = {
+    'PRIMARY': 'default',
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    'COOKIE_NAME': 'lrs_read_primary',
+    'CACHE_ALIAS': 'default',
+}
+
+# Models (lowercase names in the lrs app) whose reads may be served by a replica
+READ_MODELS = {
+    'statement', 'actor', 'agentidentifier', 'verb', 'activity', 'statementactivitylink',
+    'statementdailycount', 'searchdocument', 'learnerprogress', 'statementblob', 'resourceversion',
+}
+
+# Routing state of the current request (set by ReadReplicaMiddleware)
+_request_state: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    'lrs_routing_state', default=None
+)
+
+
+def get_routing_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_DATABASE_ROUTING', {}))
+    return options
+
+
+def begin_request(pinned: bool = False):
+    """Start tracking a request; ``pinned`` sends all its reads to the primary"""
+    return _request_state.set({'pinned': pinned, 'written': False})
+
+
+def end_request(token) -> Dict[str, Any]:
+    state = _request_state.get()
+    _request_state.reset(token)
+    return state or {}
+
+
+def mark_written():
+    """Record a write by the current request (its later reads use the primary)"""
+    state = _request_state.get()
+    if state is not None:
+        state['written'] = True
+
+
+def _primary_required(primary: str) -> bool:
+    state = _request_state.get()
+    if state is not None and (state['pinned'] or state['written']):
+        return True
+    return connections[primary].in_atomic_block
+
+
+class PrimaryReplicaRouter:
+    """Database router for ``DATABASE_ROUTERS`` (see module docstring)"""
+
+    def db_for_read(self, model, **hints):
+        options = get_routing_settings()
+        if (not options['REPLICAS'] or model._meta.app_label != 'lrs'
+                or model._meta.model_name not in READ_MODELS or _primary_required(options['PRIMARY'])):
+            return options['PRIMARY']
+        state = _request_state.get()
+        if state is None:
+            return random.choice(options['REPLICAS'])
+        # One replica per request, so counts, pages and ETag versions agree
+        if state.get('replica') not in options['REPLICAS']:
+            state['replica'] = random.choice(options['REPLICAS'])
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'lrs':
+            mark_written()
+        return get_routing_settings()['PRIMARY']
+
+    def allow_relation(self, obj1, obj2, **hints):
+        options = get_routing_settings()
+        pool = {options['PRIMARY'], *options['REPLICAS']}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+# Read-your-writes stickiness across requests
+
+def client_key(request) -> str:
+    """Identifies the client for stickiness without cookies (credentials, else address)"""
+    identity = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+    return 'lrs:read-primary:' + hashlib.sha256(identity.encode()).hexdigest()
+
+
+def is_sticky(request) -> bool:
+    options = get_routing_settings()
+    cookie = request.COOKIES.get(options['COOKIE_NAME'])
+    if cookie:
+        try:
+            if float(cookie) > time.time():
+                return True
+        except ValueError:
+            pass
+    return bool(caches[options['CACHE_ALIAS']].get(client_key(request)))
+
+
+def make_sticky(request, response):
+    """Pin the client's reads to the primary for STICKY_SECONDS"""
+    options = get_routing_settings()
+    seconds = options['STICKY_SECONDS']
+    response.set_cookie(
+        options['COOKIE_NAME'], str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax'
+    )
+    caches[options['CACHE_ALIAS']].set(client_key(request), 1, seconds)
@@ -1,8 +1,11 @@
 # lrs/serializers.py
 from rest_framework import serializers
-from .models import Statement, Actor, Verb, Activity, MoodleIntegration
+from .models import Statement, Actor, Verb, Activity, MoodleIntegration, LearnerProgress, LRSCredential
+from .services.agents import agent_identifiers
+from .services.compact_storage import expand_statement
 from django.utils import timezone
 import json
+import uuid
 
 class ActorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -26,10 +29,75 @@ class StatementSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Statement
-        fields = '__all__'
+        exclude = ('object_compact', 'definition_blob', 'context_blob', 'authority_blob')
+    
+    def to_representation(self, instance):
+        return super().to_representation(expand_statement(instance))
+
+def actor_to_agent(actor, ids_only=False):
+    """xAPI Agent representation of an Actor row"""
+    agent = {'objectType': actor.object_type or 'Agent'}
+    if actor.mbox:
+        agent['mbox'] = actor.mbox if actor.mbox.startswith('mailto:') else f"mailto:{actor.mbox}"
+    elif actor.mbox_sha1sum:
+        agent['mbox_sha1sum'] = actor.mbox_sha1sum
+    elif actor.openid:
+        agent['openid'] = actor.openid
+    elif actor.account_name:
+        agent['account'] = {'homePage': actor.account_homepage, 'name': actor.account_name}
+    if actor.name and not ids_only:
+        agent['name'] = actor.name
+    return agent
+
+def _ids_only(value):
+    """Reduce an Activity/Agent/StatementRef object to its identifier"""
+    if not isinstance(value, dict):
+        return value
+    object_type = value.get('objectType', 'Activity')
+    if object_type in ('Agent', 'Group'):
+        return {key: value[key] for key in ('objectType', 'mbox', 'mbox_sha1sum', 'openid', 'account') if key in value}
+    if object_type == 'SubStatement':
+        return value
+    return {'objectType': object_type, 'id': value.get('id')}
+
+class XAPIStatementSerializer(serializers.BaseSerializer):
+    """Read-only xAPI representation of a Statement.
+
+    Pass ``context={'format': 'ids'}`` for the ids-only format of GET /statements.
+    """
+    
+    def to_representation(self, instance):
+        expand_statement(instance)
+        ids_only = self.context.get('format') == 'ids'
+        data = {
+            'id': str(instance.statement_id),
+            'actor': actor_to_agent(instance.actor, ids_only),
+            'verb': {'id': instance.verb.verb_id},
+            'object': _ids_only(instance.object) if ids_only else instance.object,
+            'timestamp': instance.timestamp.isoformat() if instance.timestamp else None,
+            'stored': instance.stored.isoformat() if instance.stored else None,
+            'version': instance.version,
+        }
+        if instance.verb.display and not ids_only:
+            data['verb']['display'] = instance.verb.display
+        if instance.result:
+            data['result'] = instance.result
+        if instance.context:
+            context = instance.context
+            if ids_only and isinstance(context.get('contextActivities'), dict):
+                context = dict(context)
+                context['contextActivities'] = {
+                    role: [_ids_only(item) for item in (items if isinstance(items, list) else [items])]
+                    for role, items in context['contextActivities'].items()
+                }
+            data['context'] = context
+        if instance.authority:
+            data['authority'] = _ids_only(instance.authority) if ids_only else instance.authority
+        return data
 
 class StatementCreateSerializer(serializers.Serializer):
     """Serializer for incoming xAPI statements"""
+    id = serializers.UUIDField(required=False)
     actor = serializers.JSONField(required=False)
     verb = serializers.JSONField(required=False)
     object = serializers.JSONField(required=False)
@@ -44,6 +112,10 @@ class StatementCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Actor must be a JSON object")
         if value is not None and 'objectType' not in value:
             value['objectType'] = 'Agent'
+        if value is not None and not agent_identifiers(value):
+            raise serializers.ValidationError(
+                "Actor must have an inverse functional identifier (mbox, mbox_sha1sum, openid or account)"
+            )
         return value
     
     def validate_verb(self, value):
@@ -58,63 +130,43 @@ class StatementCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Object must be a JSON object")
         return value
     
+    def validate_context(self, value):
+        """Validate context object (registration must be a UUID)"""
+        if value is not None and not isinstance(value, dict):
+            raise serializers.ValidationError("Context must be a JSON object")
+        if value and value.get('registration'):
+            try:
+                uuid.UUID(str(value['registration']))
+            except ValueError:
+                raise serializers.ValidationError("context.registration must be a UUID")
+        return value
+    
     def create(self, validated_data):
-        """Create Statement instance from validated data"""
-        from .models import Statement, Actor, Verb, Activity
-        
-        # Create or get actor - use account name as unique identifier
-        actor_data = validated_data.get('actor')
-        account_name = actor_data.get('account', {}).get('name', actor_data.get('mbox', f"mailto:user_{actor_data.get('account', {}).get('name', 'unknown')}@example.com"))
+        """Create Statement instance from validated data (via the ingest writer)"""
+        from .services.ingest import ingest_statements
         
-        actor, _ = Actor.objects.get_or_create(
-            actor_id=account_name,  # Use account name as unique ID
-            defaults={
-                'name': actor_data.get('name', 'Unknown'),
-                'actor_type': 'Agent',
-                'object_type': actor_data.get('objectType', 'Agent'),
-                'mbox': actor_data.get('mbox', None),
-                'account_name': actor_data.get('account', {}).get('name', None) if isinstance(actor_data.get('account'), dict) else None,
-                'account_homepage': actor_data.get('account', {}).get('homePage', None) if isinstance(actor_data.get('account'), dict) else None,
-            }
-        )
-        
-        # Create or get verb
-        verb_data = validated_data.get('verb')
-        verb, _ = Verb.objects.get_or_create(
-            verb_id=verb_data['id'],
-            defaults={'display': verb_data.get('display', {'en-US': verb_data['id'].split('/')[-1]})}
-        )
-        
-        # Create or get activity - use consistent activity_id
-        object_data = validated_data.get('object')
-        activity_id = object_data.get('id') if object_data else None
-        
-        activity = None
-        if object_data and object_data.get('objectType') == 'Activity':
-            activity, _ = Activity.objects.get_or_create(
-                activity_id=activity_id,  # Use the same activity_id consistently
-                defaults={
-                    'definition': object_data.get('definition', {}),
-                    'object_type': 'Activity'
-                }
-            )
-        
-        # Create statement using the new approach - create actor, verb, activity directly
-        statement = Statement.objects.create(
-            actor=actor,
-            verb=verb,
-            activity=activity,
-            object=object_data,
-            result=validated_data.get('result'),
-            context=validated_data.get('context'),
-            timestamp=validated_data.get('timestamp', timezone.now()),
-            authority=validated_data.get('authority'),
-            version='1.0.0'
-        )
-        
-        return statement
+        return ingest_statements([validated_data])[0]
 
 class MoodleIntegrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = MoodleIntegration
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class LRSCredentialSerializer(serializers.ModelSerializer):
+    """A credential without its token (which is only returned on creation)"""
+    class Meta:
+        model = LRSCredential
+        exclude = ('token_hash',)
+        read_only_fields = ('integration', 'token_prefix', 'created_at', 'last_used_at')
+
+class LearnerProgressSerializer(serializers.ModelSerializer):
+    actor = serializers.SerializerMethodField()
+    activity = serializers.CharField(source='activity.activity_id', read_only=True)
+    course = serializers.CharField(source='course.activity_id', read_only=True, default=None)
+    
+    class Meta:
+        model = LearnerProgress
+        exclude = ('id',)
+    
+    def get_actor(self, obj):
+        return actor_to_agent(obj.actor)
@@ -0,0 +1,259 @@
+"""
+Agent identity resolution.
+
+Every ingest path (xAPI POST, Moodle events, user sync) resolves agents
+through ``resolve_actor`` so that the same person always maps to the same
+``Actor`` row, whichever inverse functional identifier (IFI) a statement or
+query happens to use.  Identifiers are normalized and stored in the
+``AgentIdentifier`` table; ``mbox_sha1sum`` is precomputed for every mbox.
+"""
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+
+from ..models import Actor, AgentIdentifier
+from .http_cache import mark_changed
+
+logger = logging.getLogger(__name__)
+
+# Precedence used to pick Actor.actor_id for new actors
+IFI_PRECEDENCE = ('mbox', 'account', 'openid', 'mbox_sha1sum')
+
+
+def normalize_mbox(mbox: str) -> Optional[str]:
+    """``mailto:`` IRI with a lower-cased domain"""
+    if not mbox:
+        return None
+    address = mbox.strip()
+    if address.lower().startswith('mailto:'):
+        address = address[len('mailto:'):]
+    local, _, domain = address.partition('@')
+    if not domain:
+        return f"mailto:{address}"
+    return f"mailto:{local}@{domain.lower()}"
+
+
+def mbox_sha1sum(mbox: str) -> str:
+    """SHA1 hex digest of the normalized mailto IRI, as defined by xAPI"""
+    return hashlib.sha1(normalize_mbox(mbox).encode('utf-8')).hexdigest()
+
+
+def account_key(home_page: str, name: str) -> str:
+    return f"{(home_page or '').strip().rstrip('/')}|{str(name).strip()}"
+
+
+def agent_identifiers(agent: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """All normalized (ifi_type, value) pairs carried by an agent dict"""
+    identifiers = []
+    if not isinstance(agent, dict):
+        return identifiers
+    if agent.get('mbox'):
+        mbox = normalize_mbox(agent['mbox'])
+        identifiers.append(('mbox', mbox))
+        identifiers.append(('mbox_sha1sum', mbox_sha1sum(mbox)))
+    elif agent.get('mbox_sha1sum'):
+        identifiers.append(('mbox_sha1sum', agent['mbox_sha1sum'].strip().lower()))
+    if agent.get('openid'):
+        identifiers.append(('openid', agent['openid'].strip()))
+    account = agent.get('account')
+    if isinstance(account, dict) and account.get('name') not in (None, ''):
+        identifiers.append(('account', account_key(account.get('homePage'), account['name'])))
+    return identifiers
+
+
+def actor_identifiers(actor: Actor) -> List[Tuple[str, str]]:
+    """Identifiers derivable from the columns of an existing Actor row"""
+    agent = {'mbox': actor.mbox, 'mbox_sha1sum': actor.mbox_sha1sum, 'openid': actor.openid}
+    if actor.account_name:
+        agent['account'] = {'homePage': actor.account_homepage, 'name': actor.account_name}
+    return agent_identifiers(agent)
+
+
+def _identifier_filter(identifiers: List[Tuple[str, str]]) -> Q:
+    condition = Q()
+    for ifi_type, value in identifiers:
+        condition |= Q(ifi_type=ifi_type, value=value)
+    return condition
+
+
+def actor_ids_for_agent(agent: Dict[str, Any]):
+    """Subquery of actor ids matching any IFI of agent (for statement filters)"""
+    identifiers = agent_identifiers(agent)
+    if not identifiers:
+        return AgentIdentifier.objects.none().values('actor_id')
+    return AgentIdentifier.objects.filter(_identifier_filter(identifiers)).values('actor_id')
+
+
+def find_actor(agent: Dict[str, Any]) -> Optional[Actor]:
+    """Actor for agent, or None (one indexed lookup)"""
+    identifiers = agent_identifiers(agent)
+    if not identifiers:
+        return None
+    match = (
+        AgentIdentifier.objects.filter(_identifier_filter(identifiers))
+        .select_related('actor').order_by('actor_id').first()
+    )
+    return match.actor if match else None
+
+
+def _actor_fields(agent: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {}
+    if agent.get('name'):
+        fields['name'] = agent['name']
+    if agent.get('mbox'):
+        mbox = normalize_mbox(agent['mbox'])
+        fields['mbox'] = mbox[len('mailto:'):]
+        fields['mbox_sha1sum'] = mbox_sha1sum(mbox)
+    elif agent.get('mbox_sha1sum'):
+        fields['mbox_sha1sum'] = agent['mbox_sha1sum'].strip().lower()
+    if agent.get('openid'):
+        fields['openid'] = agent['openid']
+    account = agent.get('account')
+    if isinstance(account, dict) and account.get('name') not in (None, ''):
+        fields['account_name'] = str(account['name'])
+        fields['account_homepage'] = account.get('homePage')
+    return fields
+
+
+def register_identifiers(actor: Actor, identifiers: List[Tuple[str, str]]):
+    """Point identifiers at actor (identifiers already owned by another actor are kept)"""
+    AgentIdentifier.objects.bulk_create(
+        [AgentIdentifier(ifi_type=ifi_type, value=value, actor=actor) for ifi_type, value in identifiers],
+        ignore_conflicts=True,
+    )
+
+
+def resolve_actor(agent: Dict[str, Any], create: bool = True, update: bool = False,
+                  **extra_fields) -> Tuple[Optional[Actor], bool]:
+    """Find or create the Actor for an agent dict, like ``get_or_create``.
+
+    Returns ``(actor, created)``.  ``extra_fields`` (e.g. ``moodle_user_id``)
+    are set on new actors, and on existing ones when ``update`` is true.
+    Identifiers of the agent that are not yet indexed are attached to the
+    resolved actor.  When its identifiers belong to several actors the
+    oldest one is used and the conflict is logged (the actors are not
+    merged).
+    """
+    identifiers = agent_identifiers(agent)
+    if not identifiers:
+        raise ValueError("Agent has no inverse functional identifier")
+
+    fields = _actor_fields(agent)
+    fields.update({key: value for key, value in extra_fields.items() if value is not None})
+
+    matches = list(
+        AgentIdentifier.objects.filter(_identifier_filter(identifiers)).select_related('actor').order_by('actor_id')
+    )
+    actor = matches[0].actor if matches else None
+    if matches and matches[-1].actor_id != actor.pk:
+        logger.warning(
+            "Agent identifiers %s belong to several actors (%s); using actor %s",
+            identifiers, sorted({match.actor_id for match in matches}), actor.pk,
+        )
+    created = False
+    if actor is None:
+        if not create:
+            return None, False
+        ranked = sorted(identifiers, key=lambda item: IFI_PRECEDENCE.index(item[0]))
+        ifi_type, value = ranked[0]
+        defaults = {
+            'name': 'Unknown',
+            'actor_type': 'Group' if agent.get('objectType') == 'Group' else 'Agent',
+            'object_type': agent.get('objectType', 'Agent'),
+        }
+        defaults.update(fields)
+        try:
+            with transaction.atomic(using=router.db_for_write(Actor)):
+                actor, created = Actor.objects.get_or_create(actor_id=value, defaults=defaults)
+        except IntegrityError:
+            # Lost a race with a concurrent writer for the same identifier
+            actor = find_actor(agent) or Actor.objects.get(actor_id=value)
+    elif update:
+        changed = [key for key, value in fields.items() if getattr(actor, key) != value]
+        for key in changed:
+            setattr(actor, key, fields[key])
+        if changed:
+            actor.save(update_fields=changed)
+
+    known = {(match.ifi_type, match.value) for match in matches}
+    missing = [identifier for identifier in identifiers if identifier not in known]
+    if missing:
+        register_identifiers(actor, missing)
+    return actor, created
+
+
+def sync_actors(agents: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Tuple[int, int]:
+    """Create or update the actors of many ``(agent, extra_fields)`` pairs.
+
+    Same result as ``resolve_actor(agent, update=True, **extra_fields)`` for
+    each pair, but existing actors are looked up with one query and their
+    changes written with one ``bulk_update``; only new actors are created one
+    by one.  Returns ``(created, updated)``, updated counting the existing
+    actors that changed.
+    """
+    wanted = {identifier for agent, _ in agents for identifier in agent_identifiers(agent)}
+    owners: Dict[Tuple[str, str], Actor] = {}
+    if wanted:
+        actors: Dict[int, Actor] = {}
+        matches = AgentIdentifier.objects.filter(_identifier_filter(sorted(wanted))).select_related('actor')
+        for match in matches.order_by('actor_id'):
+            owners[(match.ifi_type, match.value)] = actors.setdefault(match.actor_id, match.actor)
+
+    created = 0
+    changed_actors: Dict[int, Actor] = {}
+    changed_fields = set()
+    new_identifiers = []
+    for agent, extra_fields in agents:
+        identifiers = agent_identifiers(agent)
+        if not identifiers:
+            raise ValueError("Agent has no inverse functional identifier")
+        found = sorted({owners[ifi].pk: owners[ifi] for ifi in identifiers if ifi in owners}.items())
+        if not found:
+            actor, was_created = resolve_actor(agent, **extra_fields)
+            created += was_created
+            # Later agents of the batch may share its identifiers
+            for identifier in identifiers:
+                owners.setdefault(identifier, actor)
+            continue
+        actor = found[0][1]
+        if len(found) > 1:
+            logger.warning(
+                "Agent identifiers %s belong to several actors (%s); using actor %s",
+                identifiers, [pk for pk, _ in found], actor.pk,
+            )
+
+        fields = _actor_fields(agent)
+        fields.update({key: value for key, value in extra_fields.items() if value is not None})
+        changed = [key for key, value in fields.items() if getattr(actor, key) != value]
+        for key in changed:
+            setattr(actor, key, fields[key])
+        if changed:
+            changed_actors[actor.pk] = actor
+            changed_fields.update(changed)
+        for identifier in identifiers:
+            if identifier not in owners:
+                owners[identifier] = actor
+                new_identifiers.append(AgentIdentifier(ifi_type=identifier[0], value=identifier[1], actor=actor))
+
+    if changed_actors:
+        Actor.objects.bulk_update(list(changed_actors.values()), sorted(changed_fields))
+        # bulk_update sends no post_save: bump the versions as a saved actor does
+        mark_changed('actors', 'statements')
+    if new_identifiers:
+        AgentIdentifier.objects.bulk_create(new_identifiers, ignore_conflicts=True)
+    return created, len(changed_actors)
+
+
+def moodle_user_agent(moodle_url: str, user: Dict[str, Any]) -> Dict[str, Any]:
+    """Agent for a Moodle user record, using the same account form as Moodle events"""
+    agent = {
+        'objectType': 'Agent',
+        'name': f"{user.get('firstname', '')} {user.get('lastname', '')}".strip() or user.get('fullname') or 'Unknown',
+        'account': {'homePage': moodle_url, 'name': f"user_{user['id']}"},
+    }
+    if user.get('email'):
+        agent['mbox'] = f"mailto:{user['email']}"
+    return agent
@@ -0,0 +1,238 @@
+"""
+Change feed of ingested statements for downstream consumers.
+
+Every ingest batch appends ``StatementChange`` rows (from the
+``statements_stored`` receiver, in the ingest transaction) numbered from
+the ``ChangeSequence`` row, whose update locks it until the transaction
+commits.  Feed rows therefore become visible in ``seq`` order, and a
+consumer asking for ``seq > cursor`` (a primary key range, no scan) gets
+each statement exactly once, whatever its ``timestamp``.  Besides
+``stored``, changes record statements ``voided``, ``deleted`` by retention
+and moved between shards (``moved_out`` of one, ``moved_in`` to another).
+
+Cursors are opaque strings holding the last ``seq`` seen on each shard.
+``read_changes`` returns a page; ``wait_for_changes`` long-polls;
+``change_events``/``achange_events`` produce a server-sent event stream
+whose event ids are cursors, so a reconnecting EventSource resumes with
+``Last-Event-ID``.
+"""
+import asyncio
+import base64
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+
+from ..models import ChangeSequence, Statement, StatementChange
+from ..sharding import fan_out, shard_aliases
+
+DEFAULTS = {
+    'DEFAULT_LIMIT': 100,
+    'MAX_LIMIT': 1000,
+    'MAX_WAIT': 30,  # seconds a long-poll may wait
+    'POLL_SECONDS': 1.0,  # checks for changes committed by other processes
+    'STREAM_SECONDS': 300,  # an SSE response ends after this; the client reconnects
+    'HEARTBEAT_SECONDS': 15,
+}
+
+
+def get_feed_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_CHANGE_FEED', {}))
+    return options
+
+
+class ChangeFeedError(ValueError):
+    """Raised for a malformed cursor or limit (reported as HTTP 400)"""
+
+
+# Writing
+
+def _allocate(count: int) -> int:
+    """Reserve ``count`` sequence numbers; returns the first.  The row stays
+    locked until the caller's transaction commits."""
+    sequences = ChangeSequence.objects.using(router.db_for_write(ChangeSequence))
+    while not sequences.filter(pk=1).update(last=F('last') + count):
+        sequences.get_or_create(pk=1)
+    return sequences.values_list('last', flat=True).get(pk=1) - count + 1
+
+
+_changed = threading.Condition()
+
+
+def _notify():
+    with _changed:
+        _changed.notify_all()
+
+
+def record_changes(statements: List[Statement], action: str = 'stored'):
+    """Append feed rows for statements (in the caller's transaction)"""
+    if not statements:
+        return
+    db = router.db_for_write(StatementChange)
+    with transaction.atomic(using=db):
+        first = _allocate(len(statements))
+        StatementChange.objects.using(db).bulk_create([
+            StatementChange(seq=first + offset, statement_id=statement.pk, statement_uuid=statement.statement_id,
+                            action=action)
+            for offset, statement in enumerate(statements)
+        ])
+    # Wake the long-polls and streams of this process once the rows are visible
+    transaction.on_commit(_notify, using=db)
+
+
+# Cursors
+
+def encode_cursor(positions: Dict[str, int]) -> str:
+    raw = ','.join(f'{alias}:{seq}' for alias, seq in sorted(positions.items()))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value: Optional[str]) -> Dict[str, int]:
+    """{shard: last seq seen}; no cursor starts at the beginning, ``now`` at the head"""
+    if not value:
+        return {alias: 0 for alias in shard_aliases()}
+    if value == 'now':
+        return {alias: seq for alias, seq in fan_out(_head).items()}
+    try:
+        raw = base64.urlsafe_b64decode(value.encode()).decode()
+        positions = {alias: int(seq) for alias, _, seq in (part.rpartition(':') for part in raw.split(','))}
+    except (ValueError, UnicodeDecodeError):
+        raise ChangeFeedError("Invalid cursor")
+    return {alias: positions.get(alias, 0) for alias in shard_aliases()}
+
+
+def _head() -> int:
+    return ChangeSequence.objects.values_list('last', flat=True).filter(pk=1).first() or 0
+
+
+# Reading
+
+def _shard_page(after: Dict[str, int], limit: int) -> List[StatementChange]:
+    from ..sharding import current_shard
+
+    alias = current_shard() or shard_aliases()[0]
+    return list(
+        StatementChange.objects.filter(seq__gt=after.get(alias, 0))
+        .select_related(
+            'statement', 'statement__actor', 'statement__verb', 'statement__activity',
+            'statement__definition_blob', 'statement__context_blob', 'statement__authority_blob',
+        )
+        .order_by('seq')[:limit]
+    )
+
+
+def parse_limit(value) -> int:
+    options = get_feed_settings()
+    try:
+        limit = int(value or options['DEFAULT_LIMIT'])
+    except (TypeError, ValueError):
+        limit = 0
+    if limit <= 0:
+        raise ChangeFeedError("limit must be a positive integer")
+    return min(limit, options['MAX_LIMIT'])
+
+
+def read_changes(positions: Dict[str, int], limit: int) -> Tuple[List[Tuple[str, StatementChange]], Dict[str, int]]:
+    """Up to ``limit`` changes after ``positions`` and the positions after them.
+
+    Shards are merged by ingest time; each shard's position only moves past
+    the rows returned, so nothing is skipped when the page is cut.
+    """
+    pages = fan_out(_shard_page, positions, limit)
+    changes = sorted(
+        ((alias, change) for alias, page in pages.items() for change in page),
+        key=lambda item: (item[1].created_at, item[0], item[1].seq),
+    )[:limit]
+    positions = dict(positions)
+    for alias, change in changes:
+        positions[alias] = max(positions.get(alias, 0), change.seq)
+    return changes, positions
+
+
+def _has_changes(positions: Dict[str, int]) -> bool:
+    heads = fan_out(_head)
+    return any(heads[alias] > positions.get(alias, 0) for alias in heads)
+
+
+def wait_for_changes(positions: Dict[str, int], timeout: float) -> bool:
+    """Block until there are changes after ``positions`` (or ``timeout``)"""
+    deadline = time.monotonic() + timeout
+    poll = get_feed_settings()['POLL_SECONDS']
+    while True:
+        if _has_changes(positions):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        # Woken at once by commits in this process, else re-checked every poll
+        with _changed:
+            _changed.wait(min(poll, remaining))
+
+
+def serialize_change(alias: str, change: StatementChange) -> Dict[str, Any]:
+    from ..serializers import XAPIStatementSerializer
+
+    return {
+        'seq': change.seq,
+        'action': change.action,
+        'id': str(change.statement_uuid),
+        'created_at': change.created_at.isoformat(),
+        # None once the statement has been deleted
+        'statement': XAPIStatementSerializer(change.statement).data if change.statement is not None else None,
+    }
+
+
+# Server-sent events
+
+def _events(changes, positions: Dict[str, int]) -> Tuple[str, Dict[str, int]]:
+    chunks = []
+    for alias, change in changes:
+        positions = dict(positions, **{alias: max(positions.get(alias, 0), change.seq)})
+        chunks.append(
+            f"id: {encode_cursor(positions)}\nevent: statement\n"
+            f"data: {json.dumps(serialize_change(alias, change), default=str)}\n\n"
+        )
+    return ''.join(chunks), positions
+
+
+def _next_events(positions: Dict[str, int], limit: int) -> Tuple[str, Dict[str, int]]:
+    changes, _ = read_changes(positions, limit)
+    return _events(changes, positions)
+
+
+def change_events(positions: Dict[str, int], limit: int = 100) -> Iterator[str]:
+    """SSE stream of the changes after ``positions`` (for WSGI workers)"""
+    options = get_feed_settings()
+    ends = time.monotonic() + options['STREAM_SECONDS']
+    yield f"retry: {int(options['POLL_SECONDS'] * 1000)}\n\n"
+    while time.monotonic() < ends:
+        text, positions = _next_events(positions, limit)
+        if text:
+            yield text
+            continue
+        if not wait_for_changes(positions, min(options['HEARTBEAT_SECONDS'], ends - time.monotonic())):
+            yield ': keepalive\n\n'
+
+
+async def achange_events(positions: Dict[str, int], limit: int = 100):
+    """``change_events`` for ASGI: waits without holding a thread"""
+    options = get_feed_settings()
+    ends = time.monotonic() + options['STREAM_SECONDS']
+    quiet_since = time.monotonic()
+    yield f"retry: {int(options['POLL_SECONDS'] * 1000)}\n\n"
+    while time.monotonic() < ends:
+        text, positions = await sync_to_async(_next_events)(positions, limit)
+        if text:
+            quiet_since = time.monotonic()
+            yield text
+            continue
+        if time.monotonic() - quiet_since >= options['HEARTBEAT_SECONDS']:
+            quiet_since = time.monotonic()
+            yield ': keepalive\n\n'
+        await asyncio.sleep(options['POLL_SECONDS'])
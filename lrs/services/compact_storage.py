@@ -0,0 +1,220 @@
+"""
+Compact storage of the statement JSON columns.
+
+With ``LRS_COMPACT_STATEMENTS`` enabled, ingest stores:
+
+* the ``definition`` of an Activity ``object`` (``object_compact``),
+  ``context`` (less ``registration``, which has its own column) and
+  ``authority`` as references to content-addressed ``StatementBlob`` rows,
+  so the activity definition, course context or system authority repeated
+  by thousands of statements is stored once.  Blobs are never changed, so
+  editing an ``Activity`` does not rewrite the statements stored before.
+
+Read paths call ``expand_statement`` (the xAPI serializers, link/progress/
+search extraction), which rebuilds the full JSON in place from the related
+rows; select ``definition_blob``, ``context_blob`` and ``authority_blob``
+with the statements to avoid a query per row.  Rows stored in full are returned unchanged, so the
+two forms can coexist and ``manage.py compact_statements`` converts
+existing rows in either direction.
+"""
+import hashlib
+import json
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from ..models import Statement, StatementBlob
+
+COMPACT_FIELDS = [
+    'object', 'object_compact', 'definition_blob', 'context', 'context_blob', 'authority', 'authority_blob',
+]
+
+
+def compaction_enabled() -> bool:
+    return getattr(settings, 'LRS_COMPACT_STATEMENTS', False)
+
+
+def _canonical_json(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+
+
+def blob_digest(data: Any) -> str:
+    return hashlib.sha256(_canonical_json(data).encode()).hexdigest()
+
+
+def resolve_blobs(values: Iterable[Any]) -> Dict[str, StatementBlob]:
+    """Map the digests of JSON values to StatementBlob rows, creating the missing ones"""
+    by_digest = {blob_digest(value): value for value in values}
+    if not by_digest:
+        return {}
+    blobs = {blob.digest: blob for blob in StatementBlob.objects.filter(digest__in=by_digest)}
+    missing = [StatementBlob(digest=digest, data=data) for digest, data in by_digest.items() if digest not in blobs]
+    if missing:
+        StatementBlob.objects.bulk_create(missing, ignore_conflicts=True)
+        blobs.update(
+            (blob.digest, blob)
+            for blob in StatementBlob.objects.filter(digest__in=[blob.digest for blob in missing])
+        )
+    return blobs
+
+
+def _blob_context(statement: Statement) -> Optional[Dict[str, Any]]:
+    """The part of context that goes into a blob (registration is a column)"""
+    context = statement.context
+    if not context or not isinstance(context, dict):
+        return None
+    registration = context.get('registration')
+    if registration and statement.registration and registration == str(uuid.UUID(str(statement.registration))):
+        context = {key: value for key, value in context.items() if key != 'registration'}
+    return context
+
+
+def _object_definition(statement: Statement) -> Optional[Dict[str, Any]]:
+    """The definition of an Activity object (None if there is none)"""
+    obj = statement.object
+    if not isinstance(obj, dict) or obj.get('objectType', 'Activity') != 'Activity':
+        return None
+    return obj.get('definition') or None
+
+
+def compact_statements(statements: List[Statement]) -> List[Statement]:
+    """Replace the JSON of full statements with their compact form (in place)"""
+    statements = [stmt for stmt in statements if not is_compact(stmt)]
+    definitions = [_object_definition(stmt) for stmt in statements]
+    contexts = [_blob_context(stmt) for stmt in statements]
+    blobs = resolve_blobs(
+        [definition for definition in definitions if definition]
+        + [context for context in contexts if context]
+        + [stmt.authority for stmt in statements if stmt.authority]
+    )
+    for stmt, definition, context in zip(statements, definitions, contexts):
+        if definition:
+            stmt.definition_blob = blobs[blob_digest(definition)]
+            stmt.object = {key: value for key, value in stmt.object.items() if key != 'definition'}
+            stmt.object_compact = True
+        if context:
+            stmt.context_blob = blobs[blob_digest(context)]
+            stmt.context = None
+        if stmt.authority:
+            stmt.authority_blob = blobs[blob_digest(stmt.authority)]
+            stmt.authority = None
+    return statements
+
+
+@contextmanager
+def compacted(statements: List[Statement]):
+    """Save ``statements`` compactly: inside the block they hold the compact
+    form; afterwards the full JSON is put back for the ``statements_stored``
+    receivers (the blob references stay set)."""
+    if not compaction_enabled():
+        yield
+        return
+    originals = [(stmt, stmt.object, stmt.context, stmt.authority) for stmt in statements]
+    compact_statements(statements)
+    try:
+        yield
+    finally:
+        for stmt, obj, context, authority in originals:
+            stmt.object, stmt.context, stmt.authority = obj, context, authority
+
+
+def is_compact(statement: Statement) -> bool:
+    return statement.object_compact or bool(
+        statement.definition_blob_id or statement.context_blob_id or statement.authority_blob_id
+    )
+
+
+def expand_statement(statement: Statement) -> Statement:
+    """Rebuild the full object/context/authority of a compact statement (in place)"""
+    if statement.definition_blob_id and 'definition' not in (statement.object or {}):
+        statement.object = {**statement.object, 'definition': statement.definition_blob.data}
+    if not statement.context and statement.context_blob_id:
+        context = dict(statement.context_blob.data)
+        if statement.registration and 'registration' not in context:
+            context['registration'] = str(statement.registration)
+        statement.context = context
+    if not statement.authority and statement.authority_blob_id:
+        statement.authority = statement.authority_blob.data
+    return statement
+
+
+def expand_to_full(statement: Statement) -> Statement:
+    """Expand a compact statement and clear its references (for storing it in full)"""
+    expand_statement(statement)
+    statement.object_compact = False
+    statement.definition_blob = None
+    statement.context_blob = None
+    statement.authority_blob = None
+    return statement
+
+
+def json_filter(path: str, value: Any) -> Q:
+    """Q matching ``context__...`` or ``authority__...`` JSON paths in either storage form"""
+    column, _, rest = path.partition('__')
+    blob_path = f"{column}_blob__data__{rest}" if rest else f"{column}_blob__data"
+    return Q(**{path: value}) | Q(**{blob_path: value})
+
+
+def stored_size(statement: Statement) -> int:
+    """Bytes of JSON held in the statement row for object/context/authority"""
+    return sum(
+        len(_canonical_json(value)) for value in (statement.object, statement.context, statement.authority)
+        if value
+    )
+
+
+def _blob_bytes() -> int:
+    return sum(len(_canonical_json(data)) for data in StatementBlob.objects.values_list('data', flat=True).iterator())
+
+
+def convert_statements(compact: bool = True, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, int]:
+    """Rewrite stored statements in compact (or full) form; returns size totals.
+
+    ``dry_run`` does the conversion in a transaction that is rolled back, so
+    the totals are a benchmark of the space the conversion would save.
+    """
+    stats = {'statements': 0, 'converted': 0, 'row_bytes_before': 0, 'row_bytes_after': 0}
+    queryset = Statement.objects.select_related('definition_blob', 'context_blob', 'authority_blob').order_by('pk')
+
+    def flush(batch):
+        converted = compact_statements(batch) if compact else [expand_to_full(stmt) for stmt in batch if is_compact(stmt)]
+        if converted:
+            Statement.objects.bulk_update(converted, COMPACT_FIELDS)
+        stats['converted'] += len(converted)
+        stats['row_bytes_after'] += sum(stored_size(stmt) for stmt in batch)
+
+    with transaction.atomic(using=router.db_for_write(Statement)):
+        stats['blob_bytes_before'] = _blob_bytes()
+        batch: List[Statement] = []
+        for statement in queryset.iterator(chunk_size=batch_size):
+            stats['statements'] += 1
+            stats['row_bytes_before'] += stored_size(statement)
+            batch.append(statement)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        stats['blobs'] = StatementBlob.objects.count()
+        stats['blob_bytes_after'] = _blob_bytes()
+        if dry_run:
+            transaction.set_rollback(True)
+    return stats
+
+
+def prune_blobs() -> int:
+    """Delete blobs no statement refers to any more"""
+    unused = StatementBlob.objects.exclude(
+        Exists(Statement.objects.filter(definition_blob=OuterRef('pk')))
+    ).exclude(
+        Exists(Statement.objects.filter(context_blob=OuterRef('pk')))
+    ).exclude(
+        Exists(Statement.objects.filter(authority_blob=OuterRef('pk')))
+    )
+    deleted, _ = unused.delete()
+    return deleted
@@ -0,0 +1,129 @@
+"""
+LRS credentials: bearer tokens of the Moodle sites sending statements.
+
+Tokens are 256-bit random strings, so storing their SHA-256 is enough
+(no slow password hash is needed to resist guessing) and a token is
+looked up by its hash.  Lookups are cached per process for
+``LRS_AUTH['CACHE_SECONDS']``, unknown tokens included, so authenticating
+a request costs one hash and a dict lookup; saving or deleting a
+credential clears the cache of the process that did it, and other
+processes see the change within the cache time.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import LRSCredential, MoodleIntegration
+
+DEFAULTS = {
+    'CACHE_SECONDS': 60,
+    'CACHE_MAX_ENTRIES': 10000,
+    'REQUIRE_TOKEN': False,  # reject unauthenticated ingest requests
+}
+
+TOKEN_PREFIX = 'lrs_'
+
+
+def get_auth_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_AUTH', {}))
+    return options
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class LRSClient(NamedTuple):
+    """The authenticated client of a request (``request.user``; the
+    credential id is ``request.auth``)"""
+    credential_id: int
+    integration_id: int
+    name: str
+    expires_at: Optional[float]  # unix time
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+
+    def __str__(self):
+        return self.name
+
+
+def issue_token(credential: LRSCredential) -> str:
+    """Give an unsaved credential a new token; returns the token (not stored)"""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    credential.token_prefix = token[:len(TOKEN_PREFIX) + 6]
+    credential.token_hash = hash_token(token)
+    return token
+
+
+def create_credential(integration: MoodleIntegration, name: str = '') -> Tuple[LRSCredential, str]:
+    """A new credential for the integration and its token (only ever returned here)"""
+    credential = LRSCredential(integration=integration, name=name)
+    token = issue_token(credential)
+    credential.save()
+    return credential, token
+
+
+# Cache: token hash -> (cached until, client or None)
+_cache: Dict[str, Tuple[float, Optional[LRSClient]]] = {}
+_cache_lock = threading.Lock()
+
+
+def clear_credential_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _load(token_hash: str) -> Optional[LRSClient]:
+    credential = (
+        LRSCredential.objects.filter(token_hash=token_hash, is_active=True, integration__is_active=True)
+        .select_related('integration').first()
+    )
+    if credential is None:
+        return None
+    now = timezone.now()
+    if credential.expires_at and credential.expires_at <= now:
+        return None
+    # Refreshed once per cache period, which is precise enough for "last used"
+    LRSCredential.objects.filter(pk=credential.pk).update(last_used_at=now)
+    return LRSClient(
+        credential_id=credential.pk,
+        integration_id=credential.integration_id,
+        name=credential.name or credential.integration.moodle_site_name,
+        expires_at=credential.expires_at.timestamp() if credential.expires_at else None,
+    )
+
+
+def authenticate_token(token: str) -> Optional[LRSClient]:
+    """The client holding ``token``, or None if it is unknown, revoked or expired"""
+    token_hash = hash_token(token)
+    now = time.monotonic()
+    cached = _cache.get(token_hash)
+    if cached is None or cached[0] <= now:
+        options = get_auth_settings()
+        cached = (now + options['CACHE_SECONDS'], _load(token_hash))
+        with _cache_lock:
+            if len(_cache) >= options['CACHE_MAX_ENTRIES']:
+                _cache.clear()
+            _cache[token_hash] = cached
+    client = cached[1]
+    if client is not None and client.expires_at is not None and client.expires_at <= time.time():
+        return None
+    return client
+
+
+def bearer_token(request) -> Optional[str]:
+    """The token of an ``Authorization: Bearer <token>`` header, if any"""
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
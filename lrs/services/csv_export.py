@@ -0,0 +1,162 @@
+"""
+Streaming CSV export of statements and learner progress.
+
+Rows are produced by generators over chunked queryset iterators and
+written one line at a time, so an export of millions of statements runs in
+constant memory whether it is streamed by the export endpoints or written
+to a file by ``manage.py export_csv``.  Actor, verb, activity and result
+are flattened into plain columns for spreadsheet users.  With sharding the
+shards are exported one after the other (or just the one selected by
+``integration``/``agent``).
+"""
+import csv
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..models import LearnerProgress, Statement
+from ..sharding import shard_aliases, shard_for_params, sharding_enabled
+from .compact_storage import expand_statement
+from .progress import filter_progress, scaled_score
+from .statement_query import StatementQuery
+
+CHUNK_SIZE = 2000
+
+# Spreadsheets evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _language_map(value: Any) -> str:
+    """en-US entry of a language map, else its first entry"""
+    if not isinstance(value, dict) or not value:
+        return ''
+    return value.get('en-US') or next(iter(value.values()))
+
+
+def _actor_ref(actor) -> str:
+    """The actor's identifier as one string (mbox, account name, openid or sha1)"""
+    if actor.mbox:
+        return actor.mbox.replace('mailto:', '')
+    return actor.account_name or actor.openid or actor.mbox_sha1sum or ''
+
+
+def _score(result: Optional[Dict[str, Any]], key: str) -> Any:
+    score = (result or {}).get('score')
+    return score.get(key) if isinstance(score, dict) else None
+
+
+STATEMENT_COLUMNS: List[Tuple[str, Callable[[Statement], Any]]] = [
+    ('statement_id', lambda stmt: str(stmt.statement_id)),
+    ('timestamp', lambda stmt: stmt.timestamp),
+    ('stored', lambda stmt: stmt.stored),
+    ('actor_name', lambda stmt: stmt.actor.name),
+    ('actor', lambda stmt: _actor_ref(stmt.actor)),
+    ('actor_homepage', lambda stmt: stmt.actor.account_homepage),
+    ('verb_id', lambda stmt: stmt.verb.verb_id),
+    ('verb', lambda stmt: _language_map(stmt.verb.display) or stmt.verb.verb_id.split('/')[-1]),
+    ('object_id', lambda stmt: (stmt.object or {}).get('id')),
+    ('activity_name', lambda stmt: _language_map((stmt.activity.definition or {}).get('name')) if stmt.activity else ''),
+    ('activity_type', lambda stmt: (stmt.activity.definition or {}).get('type') if stmt.activity else ''),
+    ('score_raw', lambda stmt: _score(stmt.result, 'raw')),
+    ('score_min', lambda stmt: _score(stmt.result, 'min')),
+    ('score_max', lambda stmt: _score(stmt.result, 'max')),
+    ('score_scaled', lambda stmt: scaled_score(stmt.result)),
+    ('success', lambda stmt: (stmt.result or {}).get('success')),
+    ('completion', lambda stmt: (stmt.result or {}).get('completion')),
+    ('duration', lambda stmt: (stmt.result or {}).get('duration')),
+    ('registration', lambda stmt: stmt.registration),
+    ('platform', lambda stmt: (stmt.context or {}).get('platform')),
+]
+
+PROGRESS_COLUMNS: List[Tuple[str, Callable[[LearnerProgress], Any]]] = [
+    ('actor_name', lambda row: row.actor.name),
+    ('actor', lambda row: _actor_ref(row.actor)),
+    ('course_id', lambda row: row.course.activity_id if row.course else ''),
+    ('course_name', lambda row: _language_map((row.course.definition or {}).get('name')) if row.course else ''),
+    ('activity_id', lambda row: row.activity.activity_id),
+    ('activity_name', lambda row: _language_map((row.activity.definition or {}).get('name'))),
+    ('statements', lambda row: row.statements),
+    ('attempts', lambda row: row.attempts),
+    ('best_score', lambda row: row.best_score),
+    ('last_score', lambda row: row.last_score),
+    ('completed', lambda row: row.completed),
+    ('completed_at', lambda row: row.completed_at),
+    ('success', lambda row: row.success),
+    ('first_seen', lambda row: row.first_seen),
+    ('last_seen', lambda row: row.last_seen),
+]
+
+
+def _shard_querysets(queryset, params) -> List:
+    """The queryset on each shard to export (itself when sharding is off)"""
+    if not sharding_enabled():
+        return [queryset]
+    shard = shard_for_params(params)
+    return [queryset.using(alias) for alias in ([shard] if shard else shard_aliases())]
+
+
+def _rows(querysets, columns, chunk_size: int, prepare=None) -> Iterator[List[Any]]:
+    for queryset in querysets:
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            if prepare is not None:
+                prepare(obj)
+            yield [_cell(getter(obj)) for _, getter in columns]
+
+
+def statement_rows(params, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Rows of the statements matching the xAPI query ``params`` (oldest first)"""
+    queryset = StatementQuery(params).filter(
+        Statement.objects.select_related(
+            'actor', 'verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob'
+        )
+    ).order_by('stored', 'id')
+    return _rows(_shard_querysets(queryset, params), STATEMENT_COLUMNS, chunk_size, prepare=expand_statement)
+
+
+def progress_rows(params, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Rows of the learner progress matching ?course=, ?activity=, ?agent=, ?completed="""
+    queryset = filter_progress(
+        LearnerProgress.objects.select_related('actor', 'activity', 'course')
+        .order_by('course_id', 'actor_id', 'activity_id'),
+        params,
+    )
+    return _rows(_shard_querysets(queryset, params), PROGRESS_COLUMNS, chunk_size)
+
+
+EXPORTS = {
+    'statements': (STATEMENT_COLUMNS, statement_rows),
+    'progress': (PROGRESS_COLUMNS, progress_rows),
+}
+
+
+class _Echo:
+    """File-like object whose write returns the line (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(kind: str, params) -> Iterator[str]:
+    """CSV text of an export, one line at a time (header first).
+
+    Malformed ``params`` raise StatementQueryError here, before any output.
+    """
+    columns, rows = EXPORTS[kind]
+    return _lines(columns, rows(params))
+
+
+def _lines(columns, rows: Iterator[List[Any]]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,272 @@
+"""
+Forwarding of stored statements to secondary LRSs.
+
+Every distinct ``MoodleIntegration.lrs_endpoint`` is a ``ForwardingTarget``
+receiving the statements of the integrations pointing at it (matched by
+site, as for sharding).  A target reads the statement change feed from its
+own cursor, POSTs the statements in batches of ``BATCH_SIZE`` to
+``<endpoint>/statements`` and advances the cursor only once the LRS has
+accepted the batch, so nothing is lost across restarts; a statement may be
+sent twice after a crash, which the receiving LRS ignores by statement id.
+A 409 rejects the whole batch, so its statements are then sent one by one
+(``PUT ?statementId=``) and only those that conflict are skipped.
+
+Requests go through one pooled ``requests.Session`` per process (keep-alive
+connections per host).  Failed requests (connection errors, 429, 5xx) are
+retried ``MAX_RETRIES`` times with exponential backoff; a target whose run
+still fails waits ``RETRY_BACKOFF * 2 ** failures`` seconds (at most
+``MAX_BACKOFF``) before the next run.  Run ``manage.py forward_statements``;
+``forwarding_status`` reports the lag of each target.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import ForwardingTarget, MoodleIntegration, StatementChange
+from ..sharding import fan_out, site_for_url, site_key, statement_site
+from . import change_feed
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 1.0,  # seconds, doubled after each failed attempt
+    'MAX_BACKOFF': 300,
+    'TIMEOUT': 10,
+    'POOL_SIZE': 10,  # keep-alive connections per host
+    'WORKERS': 4,  # targets forwarded in parallel
+    'START_AT': 'now',  # where new targets start: 'now' or 'start' (the whole feed)
+    'XAPI_VERSION': '1.0.3',
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def get_forwarding_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_FORWARDING', {}))
+    return options
+
+
+class ForwardingError(Exception):
+    """Raised when a target's LRS did not accept a batch"""
+
+
+def statements_url(endpoint: str) -> str:
+    endpoint = endpoint.rstrip('/')
+    return endpoint if endpoint.endswith('/statements') else endpoint + '/statements'
+
+
+# Targets
+
+def _endpoint_sites() -> Dict[str, Set[str]]:
+    """{endpoint: site keys of the active integrations forwarding to it}"""
+    sites: Dict[str, Set[str]] = {}
+    integrations = MoodleIntegration.objects.filter(is_active=True).exclude(Q(lrs_endpoint__isnull=True) | Q(lrs_endpoint=''))
+    for url, endpoint in integrations.values_list('moodle_url', 'lrs_endpoint'):
+        sites.setdefault(endpoint.strip(), set()).add(site_key(url))
+    return sites
+
+
+def sync_targets() -> List[ForwardingTarget]:
+    """Create the targets of new endpoints; returns the active targets with integrations"""
+    options = get_forwarding_settings()
+    endpoints = _endpoint_sites()
+    known = set(ForwardingTarget.objects.filter(endpoint__in=endpoints).values_list('endpoint', flat=True))
+    for endpoint in endpoints.keys() - known:
+        start = change_feed.decode_cursor('now' if options['START_AT'] == 'now' else None)
+        ForwardingTarget.objects.get_or_create(endpoint=endpoint, defaults={'cursor': change_feed.encode_cursor(start)})
+    return list(ForwardingTarget.objects.filter(endpoint__in=endpoints, is_active=True).order_by('pk'))
+
+
+# HTTP
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """The process's pooled session (thread-safe for these POSTs)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = get_forwarding_settings()['POOL_SIZE']
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _retry_delay(response: Optional[requests.Response], delay: float) -> float:
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    return max(delay, float(retry_after)) if retry_after.isdigit() else delay
+
+
+def _send(target: ForwardingTarget, method: str, data: Any, params: Optional[Dict[str, str]] = None) -> int:
+    """One request, retried with exponential backoff; returns the status
+    (2xx or 409), raises ForwardingError"""
+    options = get_forwarding_settings()
+    headers = {'X-Experience-API-Version': options['XAPI_VERSION']}
+    if target.authorization:
+        headers['Authorization'] = target.authorization
+    delay = options['RETRY_BACKOFF']
+    for attempt in range(options['MAX_RETRIES'] + 1):
+        response = None
+        try:
+            response = get_session().request(
+                method, statements_url(target.endpoint), json=data, params=params, headers=headers,
+                timeout=options['TIMEOUT'],
+            )
+        except requests.RequestException as e:
+            error = f"Request failed: {e}"
+        else:
+            if response.status_code < 300 or response.status_code == 409:
+                return response.status_code
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code not in RETRY_STATUSES:
+                raise ForwardingError(error)
+        if attempt == options['MAX_RETRIES']:
+            raise ForwardingError(error)
+        time.sleep(_retry_delay(response, delay))
+        delay *= 2
+
+
+def post_statements(target: ForwardingTarget, statements: List[Dict[str, Any]]) -> int:
+    """POST one batch; returns the number of statements skipped because the
+    LRS holds different statements with their ids.  Raises ForwardingError"""
+    if _send(target, 'POST', statements) != 409:
+        return 0
+    # A conflict rejects the whole batch: store the others one by one
+    conflicts = 0
+    for statement in statements:
+        if _send(target, 'PUT', statement, params={'statementId': statement['id']}) == 409:
+            conflicts += 1
+    return conflicts
+
+
+# Forwarding
+
+def _batch(changes, sites: Set[str]) -> List[Dict[str, Any]]:
+    from ..serializers import XAPIStatementSerializer
+
+    statements = []
+    for _, change in changes:
+        if change.action != 'stored' or change.statement is None:
+            continue
+        data = XAPIStatementSerializer(change.statement).data
+        if site_for_url(statement_site(data)) in sites:
+            statements.append(data)
+    return statements
+
+
+def forward_target(target: ForwardingTarget, sites: Set[str], max_batches: Optional[int] = None) -> Dict[str, Any]:
+    """Forward the target's pending statements; returns totals for the run.
+
+    Each delivered batch advances the stored cursor, so a failure only
+    repeats the batch that failed.
+    """
+    options = get_forwarding_settings()
+    positions = change_feed.decode_cursor(target.cursor)
+    batches = forwarded = conflicts = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            changes, next_positions = change_feed.read_changes(positions, options['BATCH_SIZE'])
+            if not changes:
+                break
+            statements = _batch(changes, sites)
+            skipped = post_statements(target, statements) if statements else 0
+            cursor = change_feed.encode_cursor(next_positions)
+            fields = {'cursor': cursor, 'failures': 0, 'next_attempt_at': None, 'last_error': '',
+                      'updated_at': timezone.now()}
+            if statements:
+                fields.update(statements_forwarded=F('statements_forwarded') + len(statements) - skipped,
+                              last_forwarded_at=timezone.now())
+            ForwardingTarget.objects.filter(pk=target.pk).update(**fields)
+            target.cursor = cursor
+            positions = next_positions
+            batches += 1
+            forwarded += len(statements) - skipped
+            conflicts += skipped
+            if len(changes) < options['BATCH_SIZE']:
+                break
+    except Exception as e:
+        failures = target.failures + 1
+        backoff = min(options['MAX_BACKOFF'], options['RETRY_BACKOFF'] * 2 ** failures)
+        ForwardingTarget.objects.filter(pk=target.pk).update(
+            failures=failures, next_attempt_at=timezone.now() + timedelta(seconds=backoff), last_error=str(e),
+            updated_at=timezone.now(),
+        )
+        return {'endpoint': target.endpoint, 'batches': batches, 'forwarded': forwarded, 'conflicts': conflicts,
+                'error': str(e)}
+    return {'endpoint': target.endpoint, 'batches': batches, 'forwarded': forwarded, 'conflicts': conflicts,
+            'error': None}
+
+
+def _forward_in_thread(target, sites, max_batches):
+    try:
+        return forward_target(target, sites, max_batches)
+    finally:
+        close_old_connections()
+
+
+def forward_all(endpoints: Optional[List[str]] = None, max_batches: Optional[int] = None,
+                force: bool = False) -> List[Dict[str, Any]]:
+    """One forwarding run over the targets (in parallel) that are not backing off"""
+    options = get_forwarding_settings()
+    sites = _endpoint_sites()
+    now = timezone.now()
+    targets = [
+        target for target in sync_targets()
+        if (not endpoints or target.endpoint in endpoints)
+        and (force or target.next_attempt_at is None or target.next_attempt_at <= now)
+    ]
+    if len(targets) <= 1:
+        return [forward_target(target, sites[target.endpoint], max_batches) for target in targets]
+    with ThreadPoolExecutor(max_workers=min(len(targets), options['WORKERS'])) as pool:
+        futures = [pool.submit(_forward_in_thread, target, sites[target.endpoint], max_batches) for target in targets]
+        return [future.result() for future in futures]
+
+
+# Lag
+
+def _oldest_after(positions: Dict[str, int]):
+    from ..sharding import current_shard, shard_aliases
+
+    alias = current_shard() or shard_aliases()[0]
+    return (
+        StatementChange.objects.filter(seq__gt=positions.get(alias, 0))
+        .order_by('seq').values_list('created_at', flat=True).first()
+    )
+
+
+def forwarding_status() -> List[Dict[str, Any]]:
+    """Per target: changes not yet read, age of the oldest one, totals and errors"""
+    heads = change_feed.decode_cursor('now')
+    now = timezone.now()
+    status = []
+    for target in ForwardingTarget.objects.order_by('pk'):
+        positions = change_feed.decode_cursor(target.cursor)
+        pending = sum(max(0, heads[alias] - positions.get(alias, 0)) for alias in heads)
+        oldest = [created for created in fan_out(_oldest_after, positions).values() if created] if pending else []
+        status.append({
+            'endpoint': target.endpoint,
+            'is_active': target.is_active,
+            'pending_changes': pending,
+            'lag_seconds': round((now - min(oldest)).total_seconds(), 1) if oldest else 0,
+            'statements_forwarded': target.statements_forwarded,
+            'last_forwarded_at': target.last_forwarded_at,
+            'failures': target.failures,
+            'next_attempt_at': target.next_attempt_at,
+            'last_error': target.last_error,
+        })
+    return status
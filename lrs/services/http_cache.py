@@ -0,0 +1,110 @@
+"""
+Conditional GET and response caching for the read APIs.
+
+Each API resource (statements, actors, verbs, activities) has a
+``ResourceVersion`` row that is bumped in the same transaction as every
+write to it (see ``lrs.signals``).  A GET is validated with a single read
+of that row: the ETag hashes the version with the request's path, query
+string and renderer, and Last-Modified is the time of the last change.
+Resources listed in ``LRS_RESPONSE_CACHE['RESOURCES']`` also keep the
+serialized response data in a size-bounded cache keyed by that ETag, so
+stale entries are never served and simply age out.
+"""
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from ..models import ResourceVersion
+
+RESOURCES = ('statements', 'actors', 'verbs', 'activities')
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'RESOURCES': [],
+    'TIMEOUT': 300,
+}
+
+
+def get_cache_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_RESPONSE_CACHE', {}))
+    return options
+
+
+def mark_changed(*resources: str):
+    """Bump the version of resources (call inside the writing transaction)"""
+    from ..sharding import current_shard
+
+    shard = current_shard()
+    if shard and shard != router.db_for_write(ResourceVersion):
+        # The versions live on the default database: bump them once the
+        # shard commits, so an ETag is never newer than the data it covers
+        transaction.on_commit(lambda: _bump(resources), using=shard)
+    else:
+        _bump(resources)
+
+
+def _bump(resources):
+    now = timezone.now()
+    for resource in resources:
+        updated = ResourceVersion.objects.filter(resource=resource).update(
+            version=F('version') + 1, changed_at=now
+        )
+        if not updated:
+            ResourceVersion.objects.get_or_create(resource=resource, defaults={'version': 1, 'changed_at': now})
+
+
+def get_version(resource: str) -> Tuple[int, Any]:
+    """(version, changed_at) of a resource"""
+    row = ResourceVersion.objects.filter(resource=resource).values_list('version', 'changed_at').first()
+    return row or (0, None)
+
+
+def compute_etag(resource: str, version: int, request, variant: str = '') -> str:
+    raw = f"{resource}:{version}:{request.get_full_path()}:{variant}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def not_modified(request, etag: str, changed_at) -> bool:
+    """True when the client's validators still match (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags or etag in [tag.removeprefix('W/') for tag in etags]
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and changed_at is not None:
+        since = parse_http_date_safe(if_modified_since)
+        return since is not None and int(changed_at.timestamp()) <= since
+    return False
+
+
+def validator_headers(etag: str, changed_at) -> Dict[str, str]:
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if changed_at is not None:
+        headers['Last-Modified'] = http_date(changed_at.timestamp())
+    return headers
+
+
+def _response_cache():
+    return caches[get_cache_settings()['ALIAS']]
+
+
+def cache_enabled(resource: str) -> bool:
+    return resource in get_cache_settings()['RESOURCES']
+
+
+def get_cached(resource: str, etag: str) -> Optional[Any]:
+    if not cache_enabled(resource):
+        return None
+    return _response_cache().get(f"lrs:response:{etag}")
+
+
+def set_cached(resource: str, etag: str, data: Any):
+    if cache_enabled(resource):
+        _response_cache().set(f"lrs:response:{etag}", data, get_cache_settings()['TIMEOUT'])
@@ -0,0 +1,565 @@
+"""
+Statement ingest with group commit.
+
+All statement writes from the xAPI and Moodle endpoints go through
+``ingest_statements``.  When ``LRS_INGEST['GROUP_COMMIT']`` is enabled, a
+per-process writer thread coalesces the statements submitted by concurrent
+requests within a few milliseconds into a single transaction, so SQLite
+deployments pay one fsync (and take the write lock once) per batch instead
+of per statement.  Each submission is stored in its own savepoint, so one
+invalid request does not fail the others in its batch.  Async views await
+``aingest_statements``, which waits on a future instead of a thread.
+
+With sharding enabled (``lrs.sharding``) a submission is split by shard and
+each shard has its own writer, so the sites of one shard commit together
+and a slow shard does not hold up the others.
+"""
+import asyncio
+import atexit
+import os
+import queue
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.utils import timezone
+
+from ..models import Activity, Statement, Verb
+from ..sharding import group_by_shard, sharding_enabled, use_shard
+from ..signals import statements_stored
+from .agents import actor_ids_for_agent, agent_identifiers, resolve_actor
+from .compact_storage import compacted, expand_statement
+from .voiding import voided_statement_id
+
+DEFAULTS = {
+    'GROUP_COMMIT': True,
+    'MAX_BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 2,
+    'SUBMIT_TIMEOUT': 30,
+}
+
+
+def get_ingest_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_INGEST', {}))
+    return options
+
+
+def _resolve_verb(verb_data: Dict[str, Any]) -> Verb:
+    verb, _ = Verb.objects.get_or_create(
+        verb_id=verb_data['id'],
+        defaults={'display': verb_data.get('display', {'en-US': verb_data['id'].split('/')[-1]})}
+    )
+    return verb
+
+
+def _resolve_activity(object_data: Optional[Dict[str, Any]]) -> Optional[Activity]:
+    if not object_data or object_data.get('objectType') != 'Activity':
+        return None
+    activity, _ = Activity.objects.get_or_create(
+        activity_id=object_data.get('id'),
+        defaults={
+            'definition': object_data.get('definition', {}),
+            'object_type': 'Activity'
+        }
+    )
+    return activity
+
+
+def _statement_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {
+        'object': data.get('object'),
+        'result': data.get('result'),
+        'context': data.get('context'),
+        'timestamp': data.get('timestamp') or timezone.now(),
+        'authority': data.get('authority'),
+        'version': '1.0.0',
+        'registration': (data.get('context') or {}).get('registration'),
+        'voids': voided_statement_id(data),
+    }
+    if data.get('id'):
+        fields['statement_id'] = data['id']
+    return fields
+
+
+class StatementConflict(Exception):
+    """A statement id that is already stored with different content"""
+
+
+def _same_json(stored: Any, received: Any) -> bool:
+    return (stored or None) == (received or None)
+
+
+def matches_stored(statement: Statement, data: Dict[str, Any]) -> bool:
+    """xAPI statement comparison of a stored statement and validated data
+    (authority, stored, timestamp and version are not compared)"""
+    expand_statement(statement)
+    return (
+        statement.verb.verb_id == data['verb']['id']
+        and _same_json(statement.object, data.get('object'))
+        and _same_json(statement.result, data.get('result'))
+        and _same_json(statement.context, data.get('context'))
+        and actor_ids_for_agent(data['actor']).filter(actor_id=statement.actor_id).exists()
+    )
+
+
+def _stored_duplicate(data: Dict[str, Any]) -> Optional[Statement]:
+    """The stored statement with the id of ``data`` (None if there is none);
+    raises StatementConflict if it differs"""
+    if not data.get('id'):
+        return None
+    statement = (
+        Statement.objects.select_related('verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob')
+        .filter(statement_id=data['id']).first()
+    )
+    if statement is None:
+        return None
+    if not matches_stored(statement, data):
+        raise StatementConflict(f"Statement {data['id']} is already stored with different content")
+    statement.duplicate = True
+    return statement
+
+
+def new_statements(statements: List[Statement]) -> List[Statement]:
+    """Statements of an ingest result that were stored by it (not duplicates)"""
+    return [statement for statement in statements if not getattr(statement, 'duplicate', False)]
+
+
+def create_statement(data: Dict[str, Any]) -> Statement:
+    """Create one Statement (and its actor/verb/activity) from validated data.
+
+    A statement whose ``id`` is already stored with the same content is
+    returned as stored (``duplicate`` set) instead of stored twice.
+    """
+    duplicate = _stored_duplicate(data)
+    if duplicate is not None:
+        return duplicate
+    actor, _ = resolve_actor(data['actor'])
+    statement = Statement(
+        actor=actor,
+        verb=_resolve_verb(data['verb']),
+        activity=_resolve_activity(data.get('object')),
+        **_statement_fields(data)
+    )
+    with compacted([statement]):
+        statement.save(force_insert=True)
+    return statement
+
+
+def _statement_db() -> str:
+    return router.db_for_write(Statement)
+
+
+def _split(statements_data: List[Dict[str, Any]]):
+    """(shard, indexes, statements) per shard of a submission"""
+    return [
+        (shard, indexes, [statements_data[index] for index in indexes])
+        for shard, indexes in group_by_shard(statements_data).items()
+    ]
+
+
+def _merge(size: int, parts) -> List[Statement]:
+    statements: List[Optional[Statement]] = [None] * size
+    for indexes, stored in parts:
+        for index, statement in zip(indexes, stored):
+            statements[index] = statement
+    return statements
+
+
+def store_statements(statements_data: List[Dict[str, Any]]) -> List[Statement]:
+    """Store a list of validated statements in one transaction per shard (no batching)"""
+    parts = []
+    for shard, indexes, data in _split(statements_data):
+        with use_shard(shard), transaction.atomic(using=_statement_db()):
+            stored = [create_statement(item) for item in data]
+            created = new_statements(stored)
+            if created:
+                statements_stored.send(sender=Statement, statements=created)
+        parts.append((indexes, stored))
+    return _merge(len(statements_data), parts)
+
+
+def bulk_store_statements(statements_data: List[Dict[str, Any]], batch_size: int = 500,
+                          action: str = 'stored') -> List[Statement]:
+    """Store many statements with bulk INSERTs (for backfills such as log pulls).
+
+    Actors, verbs and activities are resolved once per distinct value.
+    Statements whose ``id`` is already stored (or repeated in the list) are
+    skipped, so replaying a batch after a failure is harmless.  ``action``
+    is the change feed action of the new rows.  Returns the statements
+    created.
+    """
+    created = []
+    for shard, _, data in _split(statements_data):
+        with use_shard(shard):
+            created.extend(_bulk_store(data, batch_size, action))
+    return created
+
+
+def _bulk_store(statements_data: List[Dict[str, Any]], batch_size: int, action: str) -> List[Statement]:
+    ids = {uuid.UUID(str(data['id'])) for data in statements_data if data.get('id')}
+    seen = set(
+        Statement.objects.filter(statement_id__in=ids).values_list('statement_id', flat=True)
+    ) if ids else set()
+
+    actors, verbs, activities = {}, {}, {}
+    statements = []
+    with transaction.atomic(using=_statement_db()):
+        for data in statements_data:
+            if data.get('id'):
+                statement_id = uuid.UUID(str(data['id']))
+                if statement_id in seen:
+                    continue
+                seen.add(statement_id)
+
+            actor_key = tuple(agent_identifiers(data['actor']))
+            if actor_key not in actors:
+                actors[actor_key], _ = resolve_actor(data['actor'])
+            verb_id = data['verb']['id']
+            if verb_id not in verbs:
+                verbs[verb_id] = _resolve_verb(data['verb'])
+            object_data = data.get('object') or {}
+            activity_key = (object_data.get('objectType'), object_data.get('id'))
+            if activity_key not in activities:
+                activities[activity_key] = _resolve_activity(object_data)
+
+            statements.append(Statement(
+                actor=actors[actor_key],
+                verb=verbs[verb_id],
+                activity=activities[activity_key],
+                **_statement_fields(data)
+            ))
+
+        with compacted(statements):
+            statements = Statement.objects.bulk_create(statements, batch_size=batch_size)
+        if statements:
+            statements_stored.send(sender=Statement, statements=statements, action=action)
+    return statements
+
+
+class IngestStats:
+    """Rolling commit statistics of the group-commit writer"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.statements = 0
+        self.failed_submissions = 0
+        self._batch_sizes = deque(maxlen=window)
+        self._wait_ms = deque(maxlen=window)
+        self._commit_ms = deque(maxlen=window)
+        self._recent = deque(maxlen=window)  # (monotonic time, commit ms)
+
+    def record(self, batch_size: int, wait_ms: List[float], commit_ms: float, failed: int):
+        with self._lock:
+            self.batches += 1
+            self.statements += batch_size
+            self.failed_submissions += failed
+            self._batch_sizes.append(batch_size)
+            self._wait_ms.extend(wait_ms)
+            self._commit_ms.append(commit_ms)
+            self._recent.append((time.monotonic(), commit_ms))
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {'mean': 0, 'p50': 0, 'p95': 0, 'max': 0}
+        ordered = sorted(values)
+        return {
+            'mean': round(statistics.fmean(ordered), 2),
+            'p50': round(ordered[len(ordered) // 2], 2),
+            'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            'max': round(ordered[-1], 2),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'statements': self.statements,
+                'failed_submissions': self.failed_submissions,
+                'batch_size': self._summary(self._batch_sizes),
+                'wait_ms': self._summary(self._wait_ms),
+                'commit_ms': self._summary(self._commit_ms),
+            }
+
+    def recent_commit_ms(self, seconds: float) -> float:
+        """Mean commit time of the batches of the last ``seconds`` (0 if none)"""
+        since = time.monotonic() - seconds
+        with self._lock:
+            recent = [commit_ms for at, commit_ms in self._recent if at >= since]
+        return statistics.fmean(recent) if recent else 0.0
+
+
+class _Submission:
+    """Statements submitted by one request, waiting for their batch to commit"""
+
+    def __init__(self, statements_data, future=None):
+        self.data = statements_data
+        self.submitted = time.monotonic()
+        self.statements = None
+        self.error = None
+        self.done = threading.Event()
+        # Set for async submitters, resolved on their event loop
+        self.future = future
+        # 'queued', then 'committing' (taken by the writer) or 'cancelled' (by a timed out submitter)
+        self.state = 'queued'
+        self._lock = threading.Lock()
+
+    def _move(self, state: str) -> bool:
+        with self._lock:
+            if self.state != 'queued':
+                return False
+            self.state = state
+            return True
+
+    def start(self) -> bool:
+        """Taken by the writer; False if the submitter has given up"""
+        return self._move('committing')
+
+    def cancel(self) -> bool:
+        """Withdrawn by the submitter; False if the writer is already committing it"""
+        return self._move('cancelled')
+
+    def finish(self):
+        self.done.set()
+        if self.future is not None:
+            self.future.get_loop().call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Per-process writer thread that commits concurrent submissions together
+    (one per shard; ``shard`` None writes to the routed default)"""
+
+    def __init__(self, max_batch_size: int = 200, max_wait_ms: float = 2, submit_timeout: float = 30,
+                 shard: Optional[str] = None):
+        self.shard = shard
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.submit_timeout = submit_timeout
+        self.stats = IngestStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker (threads do not survive fork)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                name = f'lrs-group-commit-{self.shard}' if self.shard else 'lrs-group-commit'
+                self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+                self._thread.start()
+
+    def submit(self, statements_data: List[Dict[str, Any]]) -> List[Statement]:
+        """Queue statements for the next batch and wait until it is committed.
+
+        TimeoutError means the statements were not stored: a submission the
+        writer has started on is waited for to the end.
+        """
+        self._ensure_started()
+        submission = _Submission(statements_data)
+        self._queue.put(submission)
+        if not submission.done.wait(self.submit_timeout):
+            if submission.cancel():
+                raise TimeoutError('Timed out waiting for the ingest writer')
+            # Already in a transaction: a timeout now could hide a committed write
+            submission.done.wait()
+        if submission.error is not None:
+            raise submission.error
+        return submission.statements
+
+    async def asubmit(self, statements_data: List[Dict[str, Any]]) -> List[Statement]:
+        """Like ``submit``, but awaits the commit without holding a thread"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        submission = _Submission(statements_data, future)
+        self._queue.put(submission)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.submit_timeout)
+        except asyncio.TimeoutError:
+            if submission.cancel():
+                raise TimeoutError('Timed out waiting for the ingest writer')
+            await future
+        if submission.error is not None:
+            raise submission.error
+        return submission.statements
+
+    def stop(self, timeout: float = 5):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _collect(self, first):
+        """First submission plus whatever arrives within max_wait (up to max_batch_size)"""
+        batch = [first]
+        size = len(first.data)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                # Drain what is already queued without waiting, then wait briefly
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+            size += len(item.data)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            # Submissions whose submitter timed out are dropped, uncommitted
+            batch = [submission for submission in self._collect(first) if submission.start()]
+            if not batch:
+                continue
+            try:
+                with use_shard(self.shard):
+                    self._commit(batch)
+            finally:
+                for submission in batch:
+                    submission.finish()
+        close_old_connections()
+
+    def _commit(self, batch: List[_Submission]):
+        close_old_connections()
+        started = time.monotonic()
+        stored = []
+        db = _statement_db()
+        try:
+            with transaction.atomic(using=db):
+                for submission in batch:
+                    try:
+                        with transaction.atomic(using=db):
+                            submission.statements = [create_statement(data) for data in submission.data]
+                    except Exception as e:
+                        submission.error = e
+                    else:
+                        stored.extend(new_statements(submission.statements))
+                if stored:
+                    statements_stored.send(sender=Statement, statements=stored)
+        except Exception as e:
+            for submission in batch:
+                if submission.error is None:
+                    submission.error = e
+            stored = []
+        finished = time.monotonic()
+        self.stats.record(
+            batch_size=len(stored),
+            wait_ms=[(started - submission.submitted) * 1000 for submission in batch],
+            commit_ms=(finished - started) * 1000,
+            failed=sum(1 for submission in batch if submission.error is not None),
+        )
+
+
+_writers: Dict[Optional[str], GroupCommitWriter] = {}
+_writer_lock = threading.Lock()
+
+
+def get_writer(shard: Optional[str] = None) -> GroupCommitWriter:
+    writer = _writers.get(shard)
+    if writer is None:
+        with _writer_lock:
+            writer = _writers.get(shard)
+            if writer is None:
+                options = get_ingest_settings()
+                writer = _writers[shard] = GroupCommitWriter(
+                    max_batch_size=options['MAX_BATCH_SIZE'],
+                    max_wait_ms=options['MAX_WAIT_MS'],
+                    submit_timeout=options['SUBMIT_TIMEOUT'],
+                    shard=shard,
+                )
+                atexit.register(writer.stop)
+    return writer
+
+
+def _in_transaction(parts) -> bool:
+    """Whether the caller has a transaction open on the database of any shard of parts"""
+    for shard, _, _ in parts:
+        with use_shard(shard):
+            if transaction.get_connection(_statement_db()).in_atomic_block:
+                return True
+    return False
+
+
+def ingest_statements(statements_data: List[Dict[str, Any]]) -> List[Statement]:
+    """Store validated statements, through the group-commit writer when enabled.
+
+    Callers already inside a transaction on a target database write
+    directly: the writer thread could not see their uncommitted rows, and
+    its commit would escape their transaction.
+    """
+    if not statements_data:
+        return []
+    if get_ingest_settings()['GROUP_COMMIT']:
+        parts = _split(statements_data)
+        if not _in_transaction(parts):
+            return _merge(len(statements_data), [
+                (indexes, get_writer(shard).submit(data)) for shard, indexes, data in parts
+            ])
+    return store_statements(statements_data)
+
+
+async def aingest_statements(statements_data: List[Dict[str, Any]]) -> List[Statement]:
+    """Async ``ingest_statements`` for async views (no open transaction possible)"""
+    if not statements_data:
+        return []
+    if get_ingest_settings()['GROUP_COMMIT']:
+        # Mapping sites to shards may read the integrations table
+        parts = await sync_to_async(_split)(statements_data) if sharding_enabled() else _split(statements_data)
+        results = await asyncio.gather(*(get_writer(shard).asubmit(data) for shard, _, data in parts))
+        return _merge(len(statements_data), [(indexes, stored) for (_, indexes, _), stored in zip(parts, results)])
+    return await sync_to_async(store_statements, thread_sensitive=True)(statements_data)
+
+
+def ingest_load(seconds: float = 10.0) -> Dict[str, float]:
+    """Current load of this process's writers: submissions waiting in their
+    queues and the mean commit time of their last ``seconds`` (worst shard)"""
+    writers = list(_writers.values())
+    return {
+        'queue_depth': sum(writer.queue_depth for writer in writers),
+        'commit_ms': max((writer.stats.recent_commit_ms(seconds) for writer in writers), default=0.0),
+    }
+
+
+def ingest_stats() -> Dict[str, Any]:
+    writers = list(_writers.items())
+    snapshots = [writer.stats.snapshot() for _, writer in writers]
+    stats = snapshots[0] if len(snapshots) == 1 else IngestStats().snapshot()
+    if len(snapshots) > 1:
+        for key in ('batches', 'statements', 'failed_submissions'):
+            stats[key] = sum(snapshot[key] for snapshot in snapshots)
+    stats['group_commit'] = get_ingest_settings()['GROUP_COMMIT']
+    stats['queue_depth'] = sum(writer.queue_depth for _, writer in writers)
+    if len(writers) > 1:
+        stats['shards'] = {
+            shard or 'default': dict(snapshot, queue_depth=writer.queue_depth)
+            for (shard, writer), snapshot in zip(writers, snapshots)
+        }
+    return stats
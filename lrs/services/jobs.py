@@ -0,0 +1,324 @@
+"""
+Local background jobs.
+
+Long-running API operations (Moodle syncs, report generation) are stored as
+``Job`` rows by ``enqueue`` and executed by ``manage.py run_jobs`` workers.
+A worker claims the oldest queued job with a conditional UPDATE, so several
+workers can share the table without locking; handlers report progress
+through ``JobContext`` and return a JSON-serializable result.
+
+While a handler runs, a heartbeat thread refreshes ``heartbeat_at`` every
+``HEARTBEAT_INTERVAL``, so a handler blocked in one long call (a report
+build) is not requeued as stale.  Progress and the result are only written
+while the worker still owns the job (same worker and claim time, still
+running): a worker whose job was requeued stops at its next progress
+update and leaves the row to the new owner.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.db import DatabaseError, close_old_connections, connection
+from django.utils import timezone
+
+from ..models import Job
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress writes to the job row
+PROGRESS_INTERVAL = 1.0
+# Running jobs without a heartbeat for this long are requeued
+STALE_AFTER = timedelta(minutes=10)
+# Seconds between heartbeats of a running job (well below STALE_AFTER)
+HEARTBEAT_INTERVAL = 30.0
+
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+
+def job_handler(kind: str):
+    """Register ``func(ctx, **params)`` as the handler for jobs of ``kind``"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind: str, **params) -> Job:
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, params=params)
+
+
+def job_status(job: Job) -> Dict[str, Any]:
+    """Public view of a job (without its params)"""
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'items_total': job.items_total,
+        'items_done': job.items_done,
+        'message': job.message,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'result_url': f"/api/jobs/{job.pk}/result/",
+    }
+
+
+class JobLost(Exception):
+    """The job was requeued (and maybe claimed by another worker) while running"""
+
+
+def _owned(job: Job):
+    """The job's row, if this claim of it is still running"""
+    return Job.objects.filter(pk=job.pk, worker=job.worker, started_at=job.started_at, status='running')
+
+
+class JobContext:
+    """Progress reporting for a running job (writes are rate limited)"""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self._last_write = 0.0
+
+    def set_total(self, total: int, message: str = None):
+        self.job.items_total = total
+        self.update(message=message, force=True)
+
+    def advance(self, count: int = 1, message: str = None):
+        self.job.items_done += count
+        self.update(message=message)
+
+    def update(self, message: str = None, force: bool = False):
+        if message is not None:
+            self.job.message = message[:255]
+        now = time.monotonic()
+        if force or now - self._last_write >= PROGRESS_INTERVAL:
+            self._last_write = now
+            self.job.heartbeat_at = timezone.now()
+            updated = _owned(self.job).update(
+                items_total=self.job.items_total, items_done=self.job.items_done,
+                message=self.job.message, heartbeat_at=self.job.heartbeat_at,
+            )
+            if not updated:
+                raise JobLost(f"Job {self.job.pk} is no longer owned by {self.job.worker}")
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes heartbeat_at while a handler runs, between its progress updates"""
+
+    def __init__(self, job: Job, interval: float = HEARTBEAT_INTERVAL):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not _owned(self.job).update(heartbeat_at=timezone.now()):
+                        return
+                except DatabaseError as e:  # e.g. SQLite busy: try again next time
+                    logger.warning("Heartbeat of job %s failed: %s", self.job.pk, e)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale(stale_after: timedelta = STALE_AFTER) -> int:
+    """Requeue running jobs whose worker stopped sending heartbeats"""
+    cutoff = timezone.now() - stale_after
+    return Job.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+        status='queued', worker='', message='Requeued after worker timeout'
+    )
+
+
+def claim_next(worker: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    """Claim the oldest queued job, or None.
+
+    The conditional UPDATE only succeeds for one worker; losers try the next
+    candidate.
+    """
+    queued = Job.objects.filter(status='queued')
+    if kinds:
+        queued = queued.filter(kind__in=list(kinds))
+    for pk in queued.order_by('created_at', 'pk').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now,
+            items_total=None, items_done=0, error=''
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job: Job) -> Job:
+    """Execute a claimed job and record its result or error (if still owned)"""
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        job.result = handler(JobContext(job), **job.params)
+        job.status = 'succeeded'
+        if isinstance(job.result, dict) and job.result.get('message'):
+            job.message = str(job.result['message'])[:255]
+    except JobLost as e:
+        logger.warning("%s", e)
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        job.status = 'failed'
+        job.error = f"{e}\n\n{traceback.format_exc()}"
+        job.message = str(e)[:255]
+    finally:
+        heartbeat.stop()
+    job.finished_at = timezone.now()
+    job.heartbeat_at = job.finished_at
+    fields = ('status', 'result', 'error', 'message', 'items_total', 'items_done', 'finished_at', 'heartbeat_at')
+    if not _owned(job).update(**{field: getattr(job, field) for field in fields}):
+        logger.warning("Job %s was requeued while running on %s; its result is dropped", job.pk, job.worker)
+        job.refresh_from_db()
+    return job
+
+
+def run_next(worker: str, kinds: Optional[Iterable[str]] = None) -> Optional[Job]:
+    close_old_connections()
+    job = claim_next(worker, kinds)
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Handlers
+
+SYNC_CHUNK_SIZE = 50
+
+
+def _import_in_chunks(ctx: JobContext, items: List[Dict[str, Any]], import_func, moodle_url: str, label: str) -> list:
+    """import_func results, one per chunk"""
+    ctx.set_total(len(items), f"Importing {len(items)} {label}")
+    results = []
+    for chunk in _chunks(items, SYNC_CHUNK_SIZE):
+        results.append(import_func(moodle_url, chunk))
+        ctx.advance(len(chunk))
+    return results
+
+
+def _moodle_api(integration_id: int):
+    """(integration, API client): the token is read here, never stored in job params"""
+    from ..models import MoodleIntegration
+    from .moodle_api import MoodleAPIService
+
+    integration = MoodleIntegration.objects.get(pk=integration_id)
+    return integration, MoodleAPIService(integration.moodle_url, integration.moodle_token)
+
+
+@job_handler('sync_moodle_users')
+def sync_moodle_users(ctx: JobContext, integration_id: int):
+    from . import moodle_sync
+
+    integration, api = _moodle_api(integration_id)
+    ctx.update(message='Fetching users from Moodle', force=True)
+    users = api.get_users()
+    results = _import_in_chunks(ctx, users, moodle_sync.import_users, integration.moodle_url, 'users')
+    synced_count = sum(created for created, _ in results)
+    return {
+        'success': True,
+        'message': f'Successfully synced {synced_count} users to LRS',
+        'synced_count': synced_count,
+        'updated_count': sum(updated for _, updated in results),
+        'total_users': len(users)
+    }
+
+
+@job_handler('sync_moodle_courses')
+def sync_moodle_courses(ctx: JobContext, integration_id: int):
+    from . import moodle_sync
+
+    integration, api = _moodle_api(integration_id)
+    ctx.update(message='Fetching courses from Moodle', force=True)
+    courses = api.get_courses()
+    synced_count = sum(_import_in_chunks(ctx, courses, moodle_sync.import_courses, integration.moodle_url, 'courses'))
+    return {
+        'success': True,
+        'message': f'Successfully synced {synced_count} courses to LRS',
+        'synced_count': synced_count,
+        'total_courses': len(courses)
+    }
+
+
+@job_handler('sync_moodle_activities')
+def sync_moodle_activities(ctx: JobContext, integration_id: int):
+    from . import moodle_sync
+
+    integration, api = _moodle_api(integration_id)
+    ctx.update(message='Fetching courses from Moodle', force=True)
+    courses = api.get_courses()
+    synced_count = sum(_import_in_chunks(
+        ctx, courses, moodle_sync.import_course_activities, integration.moodle_url, 'course activities'
+    ))
+    return {
+        'success': True,
+        'message': f'successfully synced {synced_count} activities to LRS',
+        'synced_count': synced_count,
+        # One course activity per course (courses without an id are skipped)
+        'total_activities': sum(1 for course in courses if course.get('id')),
+        'total_courses': len(courses)
+    }
+
+
+@job_handler('generate_xapi_report')
+def generate_xapi_report(ctx: JobContext, days: int = 30, limit: int = 100, **params):
+    from .reports import build_statement_report, store_report
+
+    ctx.update(message='Generating report', force=True)
+    report_data = build_statement_report(days=days, limit=limit, **params)
+    # The payload goes to a report artifact; the job result only points at it
+    report = store_report('generate_xapi_report', report_data, {'days': days, 'limit': limit, **params})
+    return {
+        'success': True,
+        'message': f'Generated xAPI report with {len(report_data["statements"])} statements',
+        'reports_count': 1,
+        'report_id': str(report.report_id),
+        'period': report_data['period'],
+        'summary': report_data['summary'],
+        'expires_at': report.expires_at,
+        'download_url': f'/api/download-xapi-report/?report={report.report_id}'
+    }
+
+
+@job_handler('pull_moodle_logs')
+def pull_moodle_logs(ctx: JobContext, integration_id: int, course_id: int = 0):
+    from ..models import MoodleIntegration
+    from .moodle_logs import pull_logs
+
+    integration = MoodleIntegration.objects.get(pk=integration_id)
+    ctx.update(message=f'Pulling log from {integration.moodle_site_name}', force=True)
+    totals = pull_logs(integration, course_id=course_id, on_page=lambda rows, created: ctx.advance(rows))
+    return {
+        'success': True,
+        'message': f"Ingested {totals['statements_created']} statements from {totals['rows_read']} log rows",
+        **totals
+    }
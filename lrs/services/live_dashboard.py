@@ -0,0 +1,315 @@
+"""
+Live dashboard updates pushed to the open dashboards.
+
+Each process runs at most one reader of the statement change feed (a
+thread started by the first listener and stopped when the last one has
+been gone for ``IDLE_SECONDS``).  It keeps a snapshot of the dashboard
+figures (totals, the latest statements, statements stored in the last
+minute and hour) up to date from the feed and publishes an event per
+batch of new statements.  Listeners (SSE streams under ASGI, long-polls
+under WSGI) only read these in-memory events, so the database work no
+longer grows with the number of open dashboards: totals are recounted at
+most every ``TOTALS_SECONDS``, and only after changes.
+
+Event ids are ``<hub>-<n>``; a client resuming with an id of another
+process (or one older than the ``BACKLOG`` kept) gets a fresh snapshot.
+"""
+import asyncio
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from ..models import Statement, StatementChange
+from ..sharding import fan_out
+from . import change_feed
+
+DEFAULTS = {
+    'RECENT': 5,  # latest statements shown
+    'TOTALS_SECONDS': 10,
+    'BACKLOG': 200,  # events kept for reconnecting clients
+    'IDLE_SECONDS': 60,
+    'MAX_WAIT': 30,  # seconds a long-poll may wait
+    'STREAM_SECONDS': 300,  # an SSE response ends after this; the client reconnects
+    'HEARTBEAT_SECONDS': 15,
+}
+
+
+def get_live_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_LIVE_DASHBOARD', {}))
+    return options
+
+
+def statement_row(stmt: Statement) -> Dict[str, Any]:
+    """A statement as shown in the dashboard's recent activity table"""
+    definition = stmt.activity.definition if stmt.activity and stmt.activity.definition else None
+    return {
+        'id': stmt.id,
+        'actor_name': stmt.actor.name if stmt.actor else 'Unknown',
+        'actor_email': stmt.actor.mbox if stmt.actor else '',
+        'verb_display': stmt.verb.display.get('en-US', stmt.verb.verb_id.split('/')[-1]) if stmt.verb else 'Unknown',
+        'activity_name': definition.get('name', {}).get('en-US', 'Unknown Activity') if definition else 'Unknown Activity',
+        'activity_type': definition.get('type', 'Unknown') if definition else 'Unknown',
+        'timestamp': stmt.timestamp.isoformat() if stmt.timestamp else None,
+        'result_score': stmt.result.get('score', {}).get('raw') if stmt.result else None,
+        'result_completion': stmt.result.get('completion', False) if stmt.result else False,
+    }
+
+
+def _stats(totals: Dict[str, int]) -> Dict[str, int]:
+    return {
+        'total_statements': totals['statements'],
+        'total_actors': totals['actors'],
+        'total_activities': totals['activities'],
+        'total_verbs': totals['verbs'],
+    }
+
+
+def _shard_arrivals(since) -> List[Tuple[float, int]]:
+    rows = (
+        StatementChange.objects.filter(created_at__gte=since, action='stored')
+        .annotate(minute=TruncMinute('created_at')).values('minute').annotate(count=Count('seq'))
+    )
+    return [(row['minute'].timestamp(), row['count']) for row in rows]
+
+
+class _Hub:
+    """The process's feed reader and the events it published"""
+
+    def __init__(self):
+        self.id = secrets.token_hex(4)
+        self.changed = threading.Condition()
+        self.events: deque = deque()  # (n, kind, data)
+        self.last = 0
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.totals_at = 0.0
+        self.arrivals: deque = deque()  # (unix time, statements), the last hour
+        self.listeners = 0
+        self.idle_since = time.monotonic()
+        self.thread: Optional[threading.Thread] = None
+
+    # Snapshot
+
+    def _rates(self) -> Dict[str, int]:
+        now = time.time()
+        while self.arrivals and self.arrivals[0][0] < now - 3600:
+            self.arrivals.popleft()
+        return {
+            'last_minute': sum(count for at, count in self.arrivals if at >= now - 60),
+            'last_hour': sum(count for at, count in self.arrivals),
+        }
+
+    def _load(self) -> Dict[str, Any]:
+        from .reports import data_totals, recent_statements
+
+        since = timezone.now() - timedelta(hours=1)
+        self.arrivals = deque(sorted(arrival for rows in fan_out(_shard_arrivals, since).values() for arrival in rows))
+        self.totals_at = time.monotonic()
+        return {
+            'stats': _stats(data_totals()),
+            'recent': [statement_row(stmt) for stmt in recent_statements(get_live_settings()['RECENT'])],
+            'rates': self._rates(),
+        }
+
+    def current(self) -> Dict[str, Any]:
+        """The dashboard figures (loaded if there are none or, with no
+        reader keeping them current, they are older than TOTALS_SECONDS)"""
+        with self.changed:
+            snapshot = self.snapshot
+            stale = time.monotonic() - self.totals_at > get_live_settings()['TOTALS_SECONDS']
+            if snapshot is not None and (self.thread is not None or not stale):
+                return dict(snapshot, rates=self._rates())
+        snapshot = self._load()
+        with self.changed:
+            self.snapshot = snapshot
+        return snapshot
+
+    # Reader
+
+    def _apply(self, changes) -> Optional[Dict[str, Any]]:
+        options = get_live_settings()
+        rows = [statement_row(change.statement) for _, change in changes
+                if change.action == 'stored' and change.statement is not None]
+        if not rows:
+            return None
+        with self.changed:
+            snapshot = dict(self.snapshot)
+            stats = dict(snapshot['stats'], total_statements=snapshot['stats']['total_statements'] + len(rows))
+            snapshot['recent'] = sorted(rows + snapshot['recent'], key=lambda row: row['timestamp'] or '',
+                                        reverse=True)[:options['RECENT']]
+            self.arrivals.append((time.time(), len(rows)))
+        if time.monotonic() - self.totals_at > options['TOTALS_SECONDS']:
+            from .reports import data_totals
+
+            stats = _stats(data_totals())
+            self.totals_at = time.monotonic()
+        with self.changed:
+            snapshot.update(stats=stats, rates=self._rates())
+            self.snapshot = snapshot
+        return {'statements': rows, 'stats': stats, 'rates': snapshot['rates']}
+
+    def _publish(self, kind: str, data: Dict[str, Any]):
+        with self.changed:
+            self.last += 1
+            self.events.append((self.last, kind, data))
+            while len(self.events) > get_live_settings()['BACKLOG']:
+                self.events.popleft()
+            self.changed.notify_all()
+
+    def _stopping(self) -> bool:
+        with self.changed:
+            if self.listeners or time.monotonic() - self.idle_since < get_live_settings()['IDLE_SECONDS']:
+                return False
+            self.thread = None
+            return True
+
+    def _run(self):
+        positions = None
+        try:
+            while not self._stopping():
+                try:
+                    if positions is None:
+                        # Start at the head of the feed, from a fresh snapshot
+                        positions = change_feed.decode_cursor('now')
+                        snapshot = self._load()
+                        with self.changed:
+                            self.snapshot = snapshot
+                    changes, positions_after = change_feed.read_changes(positions, change_feed.parse_limit(None))
+                    if changes:
+                        positions = positions_after
+                        update = self._apply(changes)
+                        if update:
+                            self._publish('update', update)
+                        continue
+                    change_feed.wait_for_changes(positions, get_live_settings()['HEARTBEAT_SECONDS'])
+                except DatabaseError:
+                    # Retried after a pause (the database may be restarting)
+                    close_old_connections()
+                    time.sleep(change_feed.get_feed_settings()['POLL_SECONDS'])
+        finally:
+            close_old_connections()
+
+    # Listeners
+
+    def listen(self):
+        with self.changed:
+            self.listeners += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='lrs-live-dashboard', daemon=True)
+                self.thread.start()
+
+    def leave(self):
+        with self.changed:
+            self.listeners -= 1
+            self.idle_since = time.monotonic()
+
+    def parse_id(self, value: Optional[str]) -> Optional[int]:
+        """Event number of an id from this hub, if still in the backlog"""
+        hub, _, number = (value or '').partition('-')
+        if hub != self.id or not number.isdigit():
+            return None
+        number = int(number)
+        with self.changed:
+            first = self.events[0][0] if self.events else self.last + 1
+            return number if first - 1 <= number <= self.last else None
+
+    def events_after(self, number: Optional[int]) -> Tuple[List[Tuple[str, str, Dict[str, Any]]], int]:
+        """Events after ``number`` (a snapshot if None) and the number to resume from"""
+        if number is None:
+            with self.changed:
+                last = self.last
+            return [(f'{self.id}-{last}', 'snapshot', self.current())], last
+        with self.changed:
+            return [(f'{self.id}-{n}', kind, data) for n, kind, data in self.events if n > number], self.last
+
+    def wait(self, number: int, timeout: float) -> bool:
+        with self.changed:
+            return self.changed.wait_for(lambda: self.last > number, timeout)
+
+
+_hub = _Hub()
+
+
+def dashboard_snapshot() -> Dict[str, Any]:
+    """Totals, latest statements and rates for rendering the dashboard"""
+    return _hub.current()
+
+
+def dashboard_updates(last_id: Optional[str], wait: float) -> Dict[str, Any]:
+    """Long-poll: the events after ``last_id``, waiting up to ``wait`` seconds for one"""
+    _hub.listen()
+    try:
+        number = _hub.parse_id(last_id)
+        events, last = _hub.events_after(number)
+        if not events and wait > 0:
+            _hub.wait(last, min(wait, get_live_settings()['MAX_WAIT']))
+            events, last = _hub.events_after(last)
+    finally:
+        _hub.leave()
+    return {
+        'events': [{'id': event_id, 'event': kind, 'data': data} for event_id, kind, data in events],
+        'last_id': f'{_hub.id}-{last}',
+    }
+
+
+def _sse(events) -> str:
+    return ''.join(f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+                   for event_id, kind, data in events)
+
+
+def dashboard_events(last_id: Optional[str] = None) -> Iterator[str]:
+    """SSE stream of dashboard updates (for WSGI workers)"""
+    options = get_live_settings()
+    ends = time.monotonic() + options['STREAM_SECONDS']
+    _hub.listen()
+    try:
+        yield f"retry: {int(change_feed.get_feed_settings()['POLL_SECONDS'] * 1000)}\n\n"
+        events, number = _hub.events_after(_hub.parse_id(last_id))
+        if events:
+            yield _sse(events)
+        while time.monotonic() < ends:
+            if _hub.wait(number, min(options['HEARTBEAT_SECONDS'], ends - time.monotonic())):
+                events, number = _hub.events_after(number)
+                yield _sse(events)
+            else:
+                yield ': keepalive\n\n'
+    finally:
+        _hub.leave()
+
+
+async def adashboard_events(last_id: Optional[str] = None):
+    """``dashboard_events`` for ASGI: checks the in-memory events without holding a thread"""
+    options = get_live_settings()
+    poll = change_feed.get_feed_settings()['POLL_SECONDS']
+    ends = time.monotonic() + options['STREAM_SECONDS']
+    _hub.listen()
+    try:
+        yield f"retry: {int(poll * 1000)}\n\n"
+        number = _hub.parse_id(last_id)
+        if number is None:
+            from asgiref.sync import sync_to_async
+
+            events, number = await sync_to_async(_hub.events_after)(None)
+            yield _sse(events)
+        quiet_since = time.monotonic()
+        while time.monotonic() < ends:
+            events, number = _hub.events_after(number)
+            if events:
+                quiet_since = time.monotonic()
+                yield _sse(events)
+            elif time.monotonic() - quiet_since >= options['HEARTBEAT_SECONDS']:
+                quiet_since = time.monotonic()
+                yield ': keepalive\n\n'
+            await asyncio.sleep(poll)
+    finally:
+        _hub.leave()
@@ -1,56 +1,106 @@
 """
 Moodle API Service for remote management
+
+``MoodleAPIClientBase`` builds the web service requests and parses the
+responses; ``MoodleAPIService`` sends them with ``requests`` and
+``AsyncMoodleAPIService`` (``moodle_api_async``) with ``httpx``.
 """
-import requests
 import json
+import logging
+import requests
 from typing import Dict, List, Optional, Any
 from django.conf import settings
 from urllib.parse import urljoin
 
+logger = logging.getLogger(__name__)
 
-class MoodleAPIService:
-    """Service for interacting with Moodle Web Service API"""
+REQUEST_TIMEOUT = 30
+
+# core_course_get_courses_field has fewer restrictions; core_course_get_courses is the fallback
+COURSES_FUNCTION = ('core_course_get_courses_field', {'field': 'fullname'})
+COURSES_FALLBACK_FUNCTION = ('core_course_get_courses', {})
+
+
+class MoodleAPIClientBase:
+    """Request building and response parsing shared by the sync and async clients"""
     
     def __init__(self, moodle_url: str, token: str = None):
         self.moodle_url = moodle_url.rstrip('/')
         self.token = token
         self.webservice_url = f"{self.moodle_url}/webservice/rest/server.php"
     
-    def _make_request(self, function: str, **params) -> Dict[str, Any]:
-        """Make a request to Moodle Web Service API"""
+    def _request_params(self, function: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """POST data of a web service call"""
         request_params = {
             'wstoken': self.token,
             'wsfunction': function,
             'moodlewsrestformat': 'json'
         }
         request_params.update(params)
+        return request_params
+    
+    @staticmethod
+    def _parse_response(body: str) -> Any:
+        """Decoded response, raising on invalid JSON or a Moodle API error"""
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise Exception(f"Invalid JSON response: {str(e)}")
         
+        # Check for Moodle API errors
+        if isinstance(data, dict) and 'exception' in data:
+            raise Exception(f"Moodle API Error: {data.get('message', 'Unknown error')}")
+        
+        return data
+    
+    @staticmethod
+    def _users_params(criteria: List[Dict] = None) -> Dict[str, Any]:
+        """core_user_get_users criteria, flattened as Moodle expects them"""
+        if criteria is None:
+            # Get all users with empty criteria
+            return {
+                'criteria[0][key]': '',
+                'criteria[0][value]': ''
+            }
+        params = {}
+        for i, criterion in enumerate(criteria):
+            for key, value in criterion.items():
+                params[f'criteria[{i}][{key}]'] = value
+        return params
+    
+    @staticmethod
+    def _course_list(result) -> List[Dict[str, Any]]:
+        """Courses from either a plain list or a {'courses': [...]} response"""
+        if isinstance(result, list):
+            return result
+        elif isinstance(result, dict) and 'courses' in result:
+            return result['courses']
+        return []
+
+
+class MoodleAPIService(MoodleAPIClientBase):
+    """Service for interacting with Moodle Web Service API"""
+    
+    def _make_request(self, function: str, **params) -> Dict[str, Any]:
+        """Make a request to Moodle Web Service API"""
         try:
-            response = requests.post(self.webservice_url, data=request_params, timeout=30)
+            response = requests.post(
+                self.webservice_url, data=self._request_params(function, params), timeout=REQUEST_TIMEOUT
+            )
             response.raise_for_status()
-            
-            data = response.json()
-            
-            # Check for Moodle API errors
-            if isinstance(data, dict) and 'exception' in data:
-                raise Exception(f"Moodle API Error: {data.get('message', 'Unknown error')}")
-            
-            return data
-            
         except requests.exceptions.RequestException as e:
             raise Exception(f"Request failed: {str(e)}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"Invalid JSON response: {str(e)}")
+        
+        return self._parse_response(response.text)
     
     def test_connection(self) -> bool:
         """Test connection to Moodle"""
         try:
             # Try to get site info
-            result = self._make_request('core_webservice_get_site_info')
+            self._make_request('core_webservice_get_site_info')
             return True
         except Exception as e:
-            # Log the error for debugging
-            print(f"Connection test failed: {str(e)}")
+            logger.warning("Connection test failed: %s", e)
             return False
     
     def create_web_service(self, service_name: str, short_name: str = None) -> Dict[str, Any]:
@@ -77,7 +127,7 @@ class MoodleAPIService:
             result = self._make_request('core_external_get_services')
             return result.get('services', [])
         except Exception as e:
-            print(f"Error getting web services: {e}")
+            logger.warning("Error getting web services: %s", e)
             return []
     
     def add_function_to_service(self, service_shortname: str, function_name: str) -> Dict[str, Any]:
@@ -102,21 +152,7 @@ class MoodleAPIService:
     
     def get_users(self, criteria: List[Dict] = None) -> List[Dict[str, Any]]:
         """Get users from Moodle"""
-        # Moodle requires criteria to be sent as a specific structure
-        if criteria is None:
-            # Get all users with empty criteria
-            params = {
-                'criteria[0][key]': '',
-                'criteria[0][value]': ''
-            }
-        else:
-            # Use provided criteria
-            params = {}
-            for i, criterion in enumerate(criteria):
-                for key, value in criterion.items():
-                    params[f'criteria[{i}][{key}]'] = value
-        
-        result = self._make_request('core_user_get_users', **params)
+        result = self._make_request('core_user_get_users', **self._users_params(criteria))
         return result.get('users', [])
     
     def create_user(self, username: str, password: str, firstname: str, lastname: str, 
@@ -137,35 +173,31 @@ class MoodleAPIService:
     
     def get_courses(self) -> List[Dict[str, Any]]:
         """Get all courses from Moodle"""
-        # Try using core_course_get_courses_field which has fewer restrictions
-        params = {
-            'field': 'fullname'  # Get basic course info
-        }
-        
         try:
-            result = self._make_request('core_course_get_courses_field', **params)
-            # This returns a simple list of courses
-            if isinstance(result, list):
-                return result
-            elif isinstance(result, dict) and 'courses' in result:
-                return result['courses']
-            else:
-                return []
+            function, params = COURSES_FUNCTION
+            return self._course_list(self._make_request(function, **params))
         except Exception as e:
             # Fallback to try the original method
             try:
-                result = self._make_request('core_course_get_courses')
-                if isinstance(result, dict) and 'courses' in result:
-                    return result['courses']
-                elif isinstance(result, list):
-                    return result
-                else:
-                    return []
+                function, params = COURSES_FALLBACK_FUNCTION
+                return self._course_list(self._make_request(function, **params))
             except Exception as e2:
                 # If both fail, return empty list
-                print(f"Both course API methods failed: {str(e)}, {str(e2)}")
+                logger.warning("Both course API methods failed: %s, %s", e, e2)
                 return []
     
+    def get_log_events(self, after_id: int = 0, limit: int = 1000, course_id: int = None,
+                       function: str = 'local_xapibridge_get_log_events') -> List[Dict[str, Any]]:
+        """Standard log rows with id > after_id, in id order (local_xapibridge web service)"""
+        params = {'fromid': after_id, 'limit': limit}
+        if course_id:
+            params['courseid'] = course_id
+        
+        result = self._make_request(function, **params)
+        if isinstance(result, dict):
+            return result.get('events', [])
+        return result or []
+    
     def create_course(self, fullname: str, shortname: str, categoryid: int = 1) -> Dict[str, Any]:
         """Create a new course in Moodle"""
         params = {
@@ -243,7 +275,7 @@ class MoodleManager:
                 try:
                     self.api.add_function_to_service('xapi_bridge', function)
                 except Exception as e:
-                    print(f"Warning: Could not add function {function}: {e}")
+                    logger.warning("Could not add function %s: %s", function, e)
             
             return {
                 'success': True,
@@ -297,7 +329,7 @@ class MoodleManager:
                 return token_result[0].get('token')
             return None
         except Exception as e:
-            print(f"Error creating token: {e}")
+            logger.warning("Error creating token: %s", e)
             return None
     
     def get_moodle_status(self) -> Dict[str, Any]:
@@ -0,0 +1,83 @@
+"""
+Async Moodle API Service, used by the async views under ASGI
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, List
+
+import httpx
+
+from .moodle_api import COURSES_FALLBACK_FUNCTION, COURSES_FUNCTION, REQUEST_TIMEOUT, MoodleAPIClientBase
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per event loop (a client must not be shared across loops)
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=500, max_keepalive_connections=50),
+        )
+        _clients[loop] = client
+    return client
+
+
+class AsyncMoodleAPIService(MoodleAPIClientBase):
+    """Async counterpart of ``MoodleAPIService`` for the read-only calls"""
+
+    async def _make_request(self, function: str, **params) -> Dict[str, Any]:
+        """Make a request to Moodle Web Service API"""
+        try:
+            response = await get_client().post(self.webservice_url, data=self._request_params(function, params))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise Exception(f"Request failed: {str(e)}")
+
+        return self._parse_response(response.text)
+
+    async def test_connection(self) -> bool:
+        """Test connection to Moodle"""
+        try:
+            await self._make_request('core_webservice_get_site_info')
+            return True
+        except Exception as e:
+            logger.warning("Connection test failed: %s", e)
+            return False
+
+    async def get_site_info(self) -> Dict[str, Any]:
+        """Get Moodle site information"""
+        return await self._make_request('core_webservice_get_site_info')
+
+    async def get_web_services(self) -> List[Dict[str, Any]]:
+        """Get all external web services"""
+        try:
+            result = await self._make_request('core_external_get_services')
+            return result.get('services', [])
+        except Exception as e:
+            logger.warning("Error getting web services: %s", e)
+            return []
+
+    async def get_users(self, criteria: List[Dict] = None) -> List[Dict[str, Any]]:
+        """Get users from Moodle"""
+        result = await self._make_request('core_user_get_users', **self._users_params(criteria))
+        return result.get('users', [])
+
+    async def get_courses(self) -> List[Dict[str, Any]]:
+        """Get all courses from Moodle"""
+        try:
+            function, params = COURSES_FUNCTION
+            return self._course_list(await self._make_request(function, **params))
+        except Exception as e:
+            # Fallback to try the original method
+            try:
+                function, params = COURSES_FALLBACK_FUNCTION
+                return self._course_list(await self._make_request(function, **params))
+            except Exception as e2:
+                logger.warning("Both course API methods failed: %s, %s", e, e2)
+                return []
@@ -0,0 +1,148 @@
+"""
+Translation of Moodle events into xAPI statements.
+
+``build_statement_from_event`` handles the events pushed by local_xapibridge;
+``event_from_log_row`` turns a row of Moodle's standard log (as read by the
+pull connector) into the same event format.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Map Moodle event to xAPI verb
+VERB_MAP = {
+    'course_viewed': 'http://adlnet.gov/expapi/verbs/experienced',
+    'course_completed': 'http://adlnet.gov/expapi/verbs/completed',
+    'quiz_attempt_submitted': 'http://adlnet.gov/expapi/verbs/attempted',
+    'quiz_attempt_reviewed': 'http://adlnet.gov/expapi/verbs/reviewed',
+    'assignment_submitted': 'http://adlnet.gov/expapi/verbs/completed',
+    'forum_post_created': 'http://adlnet.gov/expapi/verbs/commented',
+    'scorm_launched': 'http://adlnet.gov/expapi/verbs/launched',
+    'scorm_completed': 'http://adlnet.gov/expapi/verbs/completed',
+}
+
+DEFAULT_VERB = 'http://adlnet.gov/expapi/verbs/experienced'
+
+# Standard log event names of the events in VERB_MAP
+LOG_EVENT_MAP = {
+    '\\core\\event\\course_viewed': 'course_viewed',
+    '\\core\\event\\course_completed': 'course_completed',
+    '\\mod_quiz\\event\\attempt_submitted': 'quiz_attempt_submitted',
+    '\\mod_quiz\\event\\attempt_reviewed': 'quiz_attempt_reviewed',
+    '\\mod_assign\\event\\assessable_submitted': 'assignment_submitted',
+    '\\mod_forum\\event\\post_created': 'forum_post_created',
+    '\\mod_scorm\\event\\sco_launched': 'scorm_launched',
+}
+
+# Only learner actions (edulevel "participating") become statements
+LOG_EDULEVEL_PARTICIPATING = 2
+CONTEXT_COURSE = 50
+
+
+def build_statement_from_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an xAPI statement from a Moodle event pushed by local_xapibridge"""
+    event_type = data.get('event_type')
+    user_id = data.get('user_id')
+    course_id = data.get('course_id')
+    activity_id = data.get('activity_id')
+    activity_type = data.get('activity_type')
+    grade = data.get('grade')
+    max_grade = data.get('max_grade')
+    site_url = data.get('site_url', 'http://moodle.local')
+
+    verb_id = VERB_MAP.get(event_type, DEFAULT_VERB)
+
+    statement = {
+        'actor': {
+            'objectType': 'Agent',
+            'account': {
+                'homePage': f"{site_url}",
+                'name': f"user_{user_id}"
+            },
+            'name': data.get('user_name', 'Unknown User')
+        },
+        'verb': {
+            'id': verb_id,
+            'display': {'en-US': verb_id.split('/')[-1]}
+        },
+        'object': {
+            'objectType': 'Activity',
+            'id': f"{site_url}/mod/{activity_type}/view.php?id={activity_id}",
+            'definition': {
+                'name': {'en-US': data.get('activity_name', 'Unknown Activity')},
+                'description': {'en-US': f"Course: {data.get('course_name', 'Unknown Course')}"},
+                'type': f"http://adlnet.gov/expapi/activities/{activity_type}"
+            }
+        },
+        'context': {
+            'contextActivities': {
+                'parent': [{
+                    'id': f"{site_url}/course/view.php?id={course_id}",
+                    'objectType': 'Activity',
+                    'definition': {
+                        'name': {'en-US': data.get('course_name', 'Unknown Course')}
+                    }
+                }]
+            }
+        }
+    }
+
+    # Add result if grade exists
+    if grade is not None:
+        statement['result'] = {
+            'score': {
+                'scaled': float(grade) / float(max_grade) if max_grade else 0,
+                'raw': float(grade),
+                'min': 0,
+                'max': float(max_grade) if max_grade else 100
+            },
+            'completion': (event_type or '').endswith('_completed'),
+            'success': float(grade) >= (float(max_grade) * 0.7 if max_grade else 70)
+        }
+
+    return statement
+
+
+def log_statement_id(site_url: str, log_id: int) -> uuid.UUID:
+    """Deterministic statement id of a log row, so re-pulled rows are skipped"""
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{site_url.rstrip('/')}/log/{log_id}")
+
+
+def event_from_log_row(row: Dict[str, Any], site_url: str) -> Optional[Dict[str, Any]]:
+    """Event dict for a standard log row, or None for rows that are not learner activity"""
+    # Web service values may arrive as strings
+    if (int(row.get('edulevel') or 0) != LOG_EDULEVEL_PARTICIPATING or int(row.get('anonymous') or 0)
+            or not int(row.get('userid') or 0) or not int(row.get('courseid') or 0)):
+        return None
+
+    event_name = row.get('eventname', '')
+    component = row.get('component', '')
+    event = {
+        'event_type': LOG_EVENT_MAP.get(event_name, f"{component}_{row.get('target')}_{row.get('action')}"),
+        'user_id': row['userid'],
+        'course_id': row['courseid'],
+        'site_url': site_url.rstrip('/'),
+    }
+    if int(row.get('contextlevel') or 0) == CONTEXT_COURSE:
+        event.update({
+            'activity_type': 'course',
+            'activity_id': row['courseid'],
+            'activity_url': f"{event['site_url']}/course/view.php?id={row['courseid']}",
+        })
+    else:
+        event.update({
+            'activity_type': component[len('mod_'):] if component.startswith('mod_') else component,
+            'activity_id': row.get('contextinstanceid'),
+        })
+    return event
+
+
+def build_statement_from_log_row(row: Dict[str, Any], site_url: str) -> Optional[Dict[str, Any]]:
+    """xAPI statement for a standard log row (with id and timestamp), or None"""
+    event = event_from_log_row(row, site_url)
+    if event is None:
+        return None
+    statement = build_statement_from_event(event)
+    statement['id'] = log_statement_id(site_url, row['id'])
+    statement['timestamp'] = datetime.fromtimestamp(int(row['timecreated']), tz=timezone.utc)
+    return statement
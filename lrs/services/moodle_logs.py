@@ -0,0 +1,120 @@
+"""
+Pull connector for Moodle's standard log.
+
+Reads log rows in id order, in pages, starting after the high-water mark
+stored in ``MoodleLogCursor`` for the integration (and optionally a single
+course).  Each page is translated into statements with deterministic ids
+and stored with bulk INSERTs in the same transaction that advances the
+cursor, so a failed run resumes at the last committed page and replayed
+rows are skipped.  Separate cursors per course let large backfills run as
+several parallel ``pull_moodle_logs --course`` processes.
+"""
+import time
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import MoodleIntegration, MoodleLogCursor
+from .ingest import bulk_store_statements
+from .moodle_api import MoodleAPIService
+from .moodle_events import build_statement_from_log_row
+
+DEFAULTS = {
+    'FUNCTION': 'local_xapibridge_get_log_events',
+    'PAGE_SIZE': 1000,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 2.0,  # seconds, doubled after each failed attempt
+}
+
+
+def get_pull_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_MOODLE_LOG_PULL', {}))
+    return options
+
+
+def get_cursor(integration: MoodleIntegration, course_id: int = 0) -> MoodleLogCursor:
+    cursor, _ = MoodleLogCursor.objects.get_or_create(integration=integration, course_id=course_id or 0)
+    return cursor
+
+
+def _fetch_page(api: MoodleAPIService, cursor: MoodleLogCursor, page_size: int, options: Dict[str, Any]):
+    """One page of log rows after the cursor, retried with exponential backoff"""
+    delay = options['RETRY_BACKOFF']
+    for attempt in range(options['MAX_RETRIES'] + 1):
+        try:
+            return api.get_log_events(
+                after_id=cursor.last_log_id, limit=page_size, course_id=cursor.course_id,
+                function=options['FUNCTION'],
+            )
+        except Exception:
+            if attempt == options['MAX_RETRIES']:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+def pull_page(integration: MoodleIntegration, cursor: MoodleLogCursor, rows) -> int:
+    """Store the statements of one page of rows and advance the cursor; returns statements created"""
+    rows = sorted(rows, key=lambda row: int(row['id']))
+    statements_data = [
+        statement for statement in (build_statement_from_log_row(row, integration.moodle_url) for row in rows)
+        if statement is not None
+    ]
+    last_log_id = int(rows[-1]['id'])
+    # When the integration's statements live on another shard they commit
+    # just before the cursor; a crash in between replays the page, whose
+    # statements are then skipped by id
+    with transaction.atomic():
+        created = bulk_store_statements(statements_data)
+        MoodleLogCursor.objects.filter(pk=cursor.pk).update(
+            last_log_id=last_log_id,
+            statements_ingested=F('statements_ingested') + len(created),
+            last_error='',
+            updated_at=timezone.now(),
+        )
+    # Only advance the in-memory cursor once the page is committed
+    cursor.last_log_id = last_log_id
+    cursor.statements_ingested += len(created)
+    return len(created)
+
+
+def pull_logs(integration: MoodleIntegration, course_id: int = 0, page_size: int = None,
+              max_pages: int = None, on_page: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """Pull log rows until the log is exhausted (or ``max_pages``).
+
+    ``on_page(rows, statements)`` is called after each committed page.
+    Returns totals for the run.
+    """
+    options = get_pull_settings()
+    page_size = page_size or options['PAGE_SIZE']
+    api = MoodleAPIService(integration.moodle_url, integration.moodle_token)
+    cursor = get_cursor(integration, course_id)
+
+    pages = rows_read = statements_created = 0
+    try:
+        while max_pages is None or pages < max_pages:
+            rows = _fetch_page(api, cursor, page_size, options)
+            if not rows:
+                break
+            created = pull_page(integration, cursor, rows)
+            pages += 1
+            rows_read += len(rows)
+            statements_created += created
+            if on_page:
+                on_page(len(rows), created)
+            if len(rows) < page_size:
+                break
+    except Exception as e:
+        MoodleLogCursor.objects.filter(pk=cursor.pk).update(last_error=str(e))
+        raise
+
+    return {
+        'pages': pages,
+        'rows_read': rows_read,
+        'statements_created': statements_created,
+        'last_log_id': cursor.last_log_id,
+    }
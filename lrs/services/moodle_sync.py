@@ -0,0 +1,110 @@
+"""
+Import of Moodle users and courses into the LRS.
+
+Shared by the sync API views (sync and async) and management commands; the
+Moodle data is fetched by the caller so these functions only touch the
+database.  Each runs on the shard of its Moodle site (``lrs.sharding``).
+"""
+import functools
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from django.utils import timezone
+
+from ..models import Activity, Statement, Verb
+from ..sharding import shard_for_url, use_shard
+from ..signals import statements_stored
+from .agents import moodle_user_agent, resolve_actor, sync_actors
+
+
+def course_activity_id(moodle_url: str, course_id) -> str:
+    return f"{moodle_url}/course/view.php?id={course_id}"
+
+
+def _on_site_shard(func):
+    @functools.wraps(func)
+    def wrapper(moodle_url: str, *args, **kwargs):
+        with use_shard(shard_for_url(moodle_url)):
+            return func(moodle_url, *args, **kwargs)
+    return wrapper
+
+
+@_on_site_shard
+def import_users(moodle_url: str, users: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Create/update actors for Moodle users (users without an id are
+    skipped); returns (created, updated)"""
+    return sync_actors([
+        (moodle_user_agent(moodle_url, user), {'moodle_user_id': user['id']})
+        for user in users if user.get('id')
+    ])
+
+
+def _course_activity(moodle_url: str, course: Dict[str, Any]):
+    return Activity.objects.get_or_create(
+        activity_id=course_activity_id(moodle_url, course['id']),
+        defaults={
+            'definition': {
+                'name': {'en-US': course.get('fullname', 'Unknown Course')},
+                'description': {'en-US': course.get('summary', '')},
+                'type': 'http://adlnet.gov/expapi/activities/course'
+            },
+            'object_type': 'Activity',
+            'moodle_course_id': course.get('id')
+        }
+    )
+
+
+@_on_site_shard
+def import_courses(moodle_url: str, courses: List[Dict[str, Any]]) -> int:
+    """Create activities for Moodle courses; returns the number created"""
+    synced_count = 0
+    for course in courses:
+        if course.get('id'):
+            activity, created = _course_activity(moodle_url, course)
+            if created:
+                synced_count += 1
+    return synced_count
+
+
+@_on_site_shard
+def import_course_activities(moodle_url: str, courses: List[Dict[str, Any]]) -> int:
+    """Create course activities plus an 'experienced' statement by the Moodle
+    system actor for each new one; returns the number created"""
+    verb, _ = Verb.objects.get_or_create(
+        verb_id='http://adlnet.gov/expapi/verbs/experienced',
+        defaults={'display': {'en-US': 'experienced'}}
+    )
+    actor, _ = resolve_actor({
+        'objectType': 'Agent',
+        'name': 'Moodle System',
+        'mbox': 'mailto:system@moodle.lrs'
+    })
+
+    synced_count = 0
+    for course in courses:
+        if not course.get('id'):
+            continue
+        activity, created = _course_activity(moodle_url, course)
+        # Create xAPI statement for course access
+        if created:
+            statement, _ = Statement.objects.get_or_create(
+                statement_id=uuid.uuid4(),
+                defaults={
+                    'actor': actor,
+                    'verb': verb,
+                    'activity': activity,
+                    'object': {
+                        'objectType': 'Activity',
+                        'id': activity.activity_id,
+                        'definition': activity.definition
+                    },
+                    'timestamp': timezone.now(),
+                    'stored': timezone.now(),
+                    'authority': {'objectType': 'Agent', 'name': 'Moodle System', 'mbox': 'system@moodle.lrs'},
+                    'version': '1.0.0',
+                    'is_valid': True
+                }
+            )
+            statements_stored.send(sender=Statement, statements=[statement])
+            synced_count += 1
+    return synced_count
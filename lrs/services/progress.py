@@ -0,0 +1,206 @@
+"""
+Learner progress materialized from statements on ingest.
+
+Every statement about an activity is folded into the ``LearnerProgress`` row
+of its actor and activity: statement and attempt counts, best and latest
+scaled score, completion and success, first/last seen.  The fold only uses
+min/max/latest-by-timestamp, so batches can arrive in any order and
+``rebuild_progress`` gives the same rows as incremental updates.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+
+from ..models import LearnerProgress, Statement
+from .compact_storage import expand_statement
+from .statement_links import resolve_activities
+from .statement_query import _parse_agent, _parse_bool, agent_filter
+
+ADL_VERBS = 'http://adlnet.gov/expapi/verbs/'
+COURSE_TYPE = 'http://adlnet.gov/expapi/activities/course'
+
+# Verbs that record an attempt at (an outcome of) the activity
+ATTEMPT_VERBS = {ADL_VERBS + verb for verb in ('attempted', 'completed', 'passed', 'failed', 'mastered', 'scored')}
+COMPLETION_VERBS = {ADL_VERBS + verb for verb in ('completed', 'passed', 'mastered')}
+SUCCESS_VERBS = {ADL_VERBS + 'passed': True, ADL_VERBS + 'mastered': True, ADL_VERBS + 'failed': False}
+
+PROGRESS_FIELDS = [
+    'course', 'statements', 'attempts', 'best_score', 'last_score', 'last_scored_at',
+    'completed', 'completed_at', 'success', 'first_seen', 'last_seen',
+]
+
+
+def scaled_score(result: Optional[Dict[str, Any]]) -> Optional[float]:
+    """result.score.scaled, or raw scaled into [min, max]; None without a score"""
+    score = (result or {}).get('score')
+    if not isinstance(score, dict):
+        return None
+    try:
+        if score.get('scaled') is not None:
+            return float(score['scaled'])
+        if score.get('raw') is not None and score.get('max') is not None:
+            low, high = float(score.get('min') or 0), float(score['max'])
+            if high > low:
+                return (float(score['raw']) - low) / (high - low)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _is_course(activity_id: str, definition: Optional[Dict[str, Any]]) -> bool:
+    return (definition or {}).get('type') == COURSE_TYPE or '/course/view.php?' in activity_id
+
+
+def course_ref(statement: Statement) -> Optional[str]:
+    """IRI of the course a statement belongs to.
+
+    The object itself for course statements, else a course-typed parent or
+    grouping context activity, else the first grouping activity.
+    """
+    expand_statement(statement)
+    activity = statement.activity
+    if _is_course(activity.activity_id, activity.definition):
+        return activity.activity_id
+    context_activities = (statement.context or {}).get('contextActivities') or {}
+    candidates = []
+    for role in ('parent', 'grouping'):
+        entries = context_activities.get(role) or []
+        if isinstance(entries, dict):
+            entries = [entries]
+        candidates.extend((role, entry) for entry in entries if isinstance(entry, dict) and entry.get('id'))
+    for _, entry in candidates:
+        if _is_course(entry['id'], entry.get('definition')):
+            return entry['id']
+    return next((entry['id'] for role, entry in candidates if role == 'grouping'), None)
+
+
+def _apply(progress: LearnerProgress, statement: Statement, course):
+    """Fold one statement into a progress row"""
+    timestamp = statement.timestamp
+    result = statement.result or {}
+    verb_id = statement.verb.verb_id
+
+    progress.statements += 1
+    if course is not None:
+        progress.course = course
+    progress.first_seen = min(progress.first_seen, timestamp)
+    progress.last_seen = max(progress.last_seen, timestamp)
+
+    score = scaled_score(result)
+    if verb_id in ATTEMPT_VERBS or score is not None:
+        progress.attempts += 1
+    if score is not None:
+        progress.best_score = score if progress.best_score is None else max(progress.best_score, score)
+        if progress.last_scored_at is None or timestamp >= progress.last_scored_at:
+            progress.last_score = score
+            progress.last_scored_at = timestamp
+
+    if result.get('completion') is True or verb_id in COMPLETION_VERBS:
+        progress.completed = True
+        progress.completed_at = timestamp if progress.completed_at is None else min(progress.completed_at, timestamp)
+
+    success = result.get('success') if isinstance(result.get('success'), bool) else SUCCESS_VERBS.get(verb_id)
+    if success is True or (success is False and progress.success is None):
+        progress.success = success
+
+
+def update_progress(statements: Iterable[Statement]):
+    """Fold a batch of newly stored statements into the progress rows"""
+    statements = [stmt for stmt in statements if stmt.activity_id and stmt.is_valid]
+    if statements:
+        with transaction.atomic(using=router.db_for_write(LearnerProgress)):
+            _fold(statements)
+
+
+def refresh_progress(keys: Iterable[Tuple[int, int]]):
+    """Recompute the rows of (actor id, activity id) pairs from their valid
+    statements (after some were voided)"""
+    keys = set(keys)
+    if not keys:
+        return
+    actor_ids = {actor_id for actor_id, _ in keys}
+    activity_ids = {activity_id for _, activity_id in keys}
+    with transaction.atomic(using=router.db_for_write(LearnerProgress)):
+        rows = LearnerProgress.objects.filter(actor_id__in=actor_ids, activity_id__in=activity_ids)
+        LearnerProgress.objects.filter(pk__in=[
+            pk for pk, actor_id, activity_id in rows.values_list('pk', 'actor_id', 'activity_id')
+            if (actor_id, activity_id) in keys
+        ]).delete()
+        statements = [
+            stmt for stmt in Statement.objects.filter(
+                actor_id__in=actor_ids, activity_id__in=activity_ids, is_valid=True,
+            ).select_related('verb', 'activity', 'definition_blob', 'context_blob').order_by('pk')
+            if (stmt.actor_id, stmt.activity_id) in keys
+        ]
+        if statements:
+            _fold(statements)
+
+
+def _fold(statements: List[Statement]):
+    course_refs = [course_ref(stmt) for stmt in statements]
+    courses = resolve_activities(('grouping', ref, {}) for ref in course_refs if ref)
+
+    keys = {(stmt.actor_id, stmt.activity_id) for stmt in statements}
+    rows = {
+        (row.actor_id, row.activity_id): row
+        for row in LearnerProgress.objects.select_for_update().filter(
+            actor_id__in={actor_id for actor_id, _ in keys},
+            activity_id__in={activity_id for _, activity_id in keys},
+        )
+        if (row.actor_id, row.activity_id) in keys
+    }
+    existing = set(rows)
+
+    for stmt, ref in zip(statements, course_refs):
+        key = (stmt.actor_id, stmt.activity_id)
+        if key not in rows:
+            rows[key] = LearnerProgress(
+                actor_id=stmt.actor_id, activity_id=stmt.activity_id,
+                first_seen=stmt.timestamp, last_seen=stmt.timestamp,
+            )
+        _apply(rows[key], stmt, courses.get(ref) if ref else None)
+
+    if existing:
+        now = timezone.now()
+        for key in existing:
+            rows[key].updated_at = now
+        LearnerProgress.objects.bulk_update([rows[key] for key in existing], PROGRESS_FIELDS + ['updated_at'])
+    created = [row for key, row in rows.items() if key not in existing]
+    if created:
+        try:
+            with transaction.atomic(using=router.db_for_write(LearnerProgress)):
+                LearnerProgress.objects.bulk_create(created)
+        except IntegrityError:
+            # A concurrent batch created some of these rows: fold those statements again
+            _fold([stmt for stmt in statements if (stmt.actor_id, stmt.activity_id) not in existing])
+
+
+def filter_progress(queryset, params):
+    """Apply the ?course=, ?activity=, ?agent= and ?completed= filters
+    (raises StatementQueryError for malformed values)"""
+    if params.get('course'):
+        queryset = queryset.filter(course__activity_id=params['course'])
+    if params.get('activity'):
+        queryset = queryset.filter(activity__activity_id=params['activity'])
+    if params.get('agent'):
+        queryset = queryset.filter(agent_filter(_parse_agent(params['agent'])))
+    if params.get('completed'):
+        queryset = queryset.filter(completed=_parse_bool(params['completed'], 'completed'))
+    return queryset
+
+
+def rebuild_progress(batch_size: int = 1000) -> int:
+    """Recompute all progress rows from the statement table"""
+    queryset = Statement.objects.select_related('verb', 'activity', 'definition_blob', 'context_blob').order_by('pk')
+    with transaction.atomic(using=router.db_for_write(LearnerProgress)):
+        LearnerProgress.objects.all().delete()
+        batch: List[Statement] = []
+        for statement in queryset.iterator(chunk_size=batch_size):
+            batch.append(statement)
+            if len(batch) >= batch_size:
+                update_progress(batch)
+                batch = []
+        if batch:
+            update_progress(batch)
+    return LearnerProgress.objects.count()
@@ -0,0 +1,244 @@
+"""
+Rate limiting and load shedding for the statement ingest endpoints.
+
+Each client has a token bucket holding up to ``BURST`` statements and
+refilled at ``RATE`` statements per second; a request takes one token per
+statement it submits.  Clients are keyed by bearer token, else by the Moodle
+site of the submitted statements, else by IP address, so one site's
+backfill cannot starve the others.  Backends:
+
+* ``cache`` (default): a counter per client and window of ``BURST / RATE``
+  seconds in the Django cache ``CACHE_ALIAS``, taken with atomic
+  ``add``/``incr`` (so a client may send up to two bursts around a window
+  boundary).  The cache must be shared by the worker processes (Redis,
+  Memcached): with a process-local cache each worker limits on its own,
+  which ``manage.py check`` warns about (``lrs.W001``).
+* ``memory``: per process, without the cache round trip.
+* ``database`` (opt-in): ``RateLimitBucket`` rows updated with a single
+  conditional UPDATE, exact across processes.  This is a write
+  transaction per ingest request: on SQLite it serializes on the write
+  lock next to the group-commit writer's batches, so use it only with a
+  database that has row-level locking.
+
+Independently of the buckets, requests are shed while the group-commit
+writer is overloaded: more than ``MAX_QUEUE_DEPTH`` submissions waiting or
+a mean commit time above ``MAX_COMMIT_MS`` over the last ``LOAD_WINDOW``
+seconds.  Rejected requests get 429 with Retry-After (``IngestThrottle``
+for DRF views, ``admit`` for the async views).
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, router
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+from rest_framework.throttling import BaseThrottle
+
+from ..models import RateLimitBucket
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKEND': 'cache',  # or 'memory' (per process), 'database' (a write per request)
+    'CACHE_ALIAS': 'default',
+    'RATE': 200,  # statements per second, per client
+    'BURST': 2000,
+    'MAX_QUEUE_DEPTH': 5000,  # 0 disables
+    'MAX_COMMIT_MS': 1000,  # 0 disables
+    'LOAD_WINDOW': 10,
+    'SHED_RETRY_AFTER': 5,
+}
+
+
+def get_rate_limit_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_RATE_LIMIT', {}))
+    return options
+
+
+class Rejection(NamedTuple):
+    retry_after: float
+    reason: str  # 'rate' or 'load'
+
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counts_lock:
+        _counts[name] += 1
+
+
+def rate_limit_stats() -> Dict[str, int]:
+    """Requests admitted, throttled and shed by this process"""
+    with _counts_lock:
+        return {name: _counts[name] for name in ('admitted', 'throttled', 'shed')}
+
+
+# Client keys
+
+def _statement_site(data) -> Optional[str]:
+    from ..sharding import statement_site
+
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if not isinstance(data, dict):
+        return None
+    # Moodle events carry the site URL; xAPI statements name it in the actor or object
+    return data.get('site_url') or statement_site(data)
+
+
+def client_key(request, data=None) -> str:
+    """Bucket key: the bearer token (hashed), else the Moodle site, else the IP"""
+    from ..sharding import site_for_url
+    from .credentials import bearer_token
+
+    token = bearer_token(request)
+    if token:
+        return 'token:' + hashlib.sha256(token.encode()).hexdigest()[:40]
+    site = site_for_url(_statement_site(data))
+    if site:
+        return 'site:' + hashlib.sha256(site.encode()).hexdigest()[:40]
+    return 'ip:' + request.META.get('REMOTE_ADDR', '')
+
+
+def statement_count(data) -> int:
+    return len(data) if isinstance(data, list) else 1
+
+
+# Buckets
+
+_memory: Dict[str, tuple] = {}
+_memory_lock = threading.Lock()
+
+
+def _take_memory(key: str, cost: float, rate: float, burst: float, now: float) -> float:
+    with _memory_lock:
+        tokens, updated = _memory.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            _memory[key] = (tokens - cost, now)
+            return 0.0
+        _memory[key] = (tokens, now)
+        return (cost - tokens) / rate
+
+
+def _take_cache(key: str, cost: float, rate: float, burst: float, now: float) -> float:
+    cache = caches[get_rate_limit_settings()['CACHE_ALIAS']]
+    # Fixed windows of burst / rate seconds (the time to refill a bucket),
+    # each allowing burst statements: add and incr are atomic on the shared
+    # caches, so concurrent processes cannot spend the same tokens
+    window = burst / rate
+    index = int(now // window)
+    cache_key = f'lrs-rate-limit:{key}:{index}'
+    cost = math.ceil(cost)
+    for _ in range(2):
+        cache.add(cache_key, 0, math.ceil(window) + 1)
+        try:
+            spent = cache.incr(cache_key, cost)
+            break
+        except ValueError:  # expired between add and incr
+            continue
+    else:
+        return 0.0  # a cache that keeps nothing (DummyCache) does not limit
+    if spent <= burst:
+        return 0.0
+    cache.decr(cache_key, cost)  # not taken
+    return (index + 1) * window - now
+
+
+def _take_database(key: str, cost: float, rate: float, burst: float, now: float) -> float:
+    buckets = RateLimitBucket.objects.using(router.db_for_write(RateLimitBucket))
+    available = Least(Value(burst), F('tokens') + (Value(now) - F('updated')) * Value(rate))
+    while True:
+        # Refill and take in one statement, so concurrent processes cannot both spend the same tokens
+        taken = buckets.filter(GreaterThanOrEqual(available, cost), key=key).update(
+            tokens=available - Value(cost), updated=now,
+        )
+        if taken:
+            return 0.0
+        bucket = buckets.filter(key=key).first()
+        if bucket is None:
+            try:
+                buckets.create(key=key, tokens=burst - cost, updated=now)
+                return 0.0
+            except IntegrityError:  # created concurrently
+                continue
+        tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+        if tokens < cost:
+            return (cost - tokens) / rate
+        # Refilled or created concurrently since the update: try again
+
+
+# Caches whose incr is atomic and shared by processes
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+
+
+_BACKENDS = {
+    'cache': _take_cache,
+    'memory': _take_memory,
+    'database': _take_database,
+}
+
+
+def take(key: str, cost: float) -> float:
+    """Take ``cost`` tokens from the key's bucket; returns 0, or the seconds
+    to wait until they are available (nothing is taken then).  Requests
+    larger than the burst take the whole bucket."""
+    options = get_rate_limit_settings()
+    rate, burst = float(options['RATE']), float(options['BURST'])
+    return _BACKENDS[options['BACKEND']](key, min(cost, burst), rate, burst, time.time())
+
+
+def overloaded() -> bool:
+    from .ingest import ingest_load
+
+    options = get_rate_limit_settings()
+    load = ingest_load(options['LOAD_WINDOW'])
+    return bool(
+        (options['MAX_QUEUE_DEPTH'] and load['queue_depth'] > options['MAX_QUEUE_DEPTH'])
+        or (options['MAX_COMMIT_MS'] and load['commit_ms'] > options['MAX_COMMIT_MS'])
+    )
+
+
+def admit(request, data=None) -> Optional[Rejection]:
+    """None if the ingest request may proceed, else why and for how long it is refused"""
+    options = get_rate_limit_settings()
+    if not options['ENABLED']:
+        return None
+    if overloaded():
+        _count('shed')
+        return Rejection(options['SHED_RETRY_AFTER'], 'load')
+    wait = take(client_key(request, data), statement_count(data))
+    if wait:
+        _count('throttled')
+        return Rejection(wait, 'rate')
+    _count('admitted')
+    return None
+
+
+def retry_after_header(rejection: Rejection) -> str:
+    return str(max(1, math.ceil(rejection.retry_after)))
+
+
+class IngestThrottle(BaseThrottle):
+    """DRF throttle for the ingest views (429 with Retry-After)"""
+
+    def allow_request(self, request, view):
+        self.rejection = admit(request, request.data)
+        return self.rejection is None
+
+    def wait(self):
+        return self.rejection.retry_after if self.rejection else None
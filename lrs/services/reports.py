@@ -0,0 +1,386 @@
+"""
+xAPI report generation (summary of recent statements).
+
+``ReportSpec`` describes a report: any time window, an optional grouping
+(day, verb, activity, course, actor) and filters.  ``build_report`` sums
+statement counts and scores per shard and time slice, and counts distinct
+actors and activities per shard over the whole window, all in SQL and in
+parallel, then adds up the per-group results.
+
+Reports and totals cover every shard (``lrs.sharding.fan_out``): counts are
+summed, verbs (shared across sites) are counted once per IRI, and the
+latest statements of the shards are merged.
+
+Generated reports are stored as ``ReportArtifact`` rows and downloaded by
+report id until they expire (``LRS_REPORTS['TTL_HOURS']``).
+"""
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import (
+    Case, CharField, Count, F, FloatField, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, TruncDate
+from django.utils import timezone
+
+from ..models import Activity, Actor, MoodleIntegration, ReportArtifact, Statement, StatementActivityLink, Verb
+from ..sharding import fan_out, run_tasks, shard_aliases, shard_for_params, site_key
+from .progress import COURSE_TYPE
+from .statement_query import StatementQueryError, _parse_agent, _parse_timestamp, agent_filter
+
+DEFAULTS = {
+    'TTL_HOURS': 24,
+    'SLICE_DAYS': 31,
+    'WORKERS': 4,
+}
+
+GROUPINGS = ('day', 'verb', 'activity', 'course', 'actor')
+REPORT_PARAMS = (
+    'start', 'end', 'days', 'group_by', 'verb', 'activity', 'course', 'agent', 'integration',
+    'limit', 'group_limit', 'slice_days',
+)
+MAX_LIMIT = 1000
+MAX_GROUPS = 5000
+
+# Link roles that can name a statement's course, in order of preference
+COURSE_ROLES = ('object', 'parent', 'grouping')
+
+SCALED_SCORE = Cast(KT('result__score__scaled'), FloatField())
+
+
+def get_report_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_REPORTS', {}))
+    return options
+
+
+def _shard_totals() -> Dict[str, Any]:
+    return {
+        'statements': Statement.objects.filter(is_valid=True).count(),
+        'actors': Actor.objects.count(),
+        'activities': Activity.objects.count(),
+        'verbs': set(Verb.objects.values_list('verb_id', flat=True)),
+    }
+
+
+def data_totals() -> Dict[str, int]:
+    """Row counts of the statement data over all shards"""
+    results = list(fan_out(_shard_totals).values())
+    totals = {key: sum(result[key] for result in results) for key in ('statements', 'actors', 'activities')}
+    totals['verbs'] = len(set().union(*(result['verbs'] for result in results)))
+    return totals
+
+
+def _latest(limit: int, queryset=None) -> List[Statement]:
+    if queryset is None:
+        queryset = Statement.objects.all()
+    return list(queryset.filter(is_valid=True).select_related('actor', 'verb', 'activity').order_by('-timestamp')[:limit])
+
+
+def recent_statements(limit: int, queryset=None, aliases=None) -> List[Statement]:
+    """The ``limit`` latest statements (by timestamp) of ``queryset`` over all shards"""
+    if not limit:
+        return []
+    statements = [stmt for page in fan_out(_latest, limit, queryset, aliases=aliases).values() for stmt in page]
+    return sorted(statements, key=lambda stmt: stmt.timestamp, reverse=True)[:limit]
+
+
+class ReportSpec:
+    """Parsed report parameters.
+
+    The window is ``start``/``end`` (ISO 8601; ``end`` defaults to now) or
+    the ``days`` before ``end``; ``group_by`` is one of GROUPINGS; ``verb``,
+    ``activity``, ``agent``, ``course`` and ``integration`` filter the
+    statements.  Windows longer than ``slice_days`` are aggregated in time
+    slices run in parallel.  Malformed values raise StatementQueryError.
+    """
+
+    def __init__(self, params):
+        get = params.get
+        options = get_report_settings()
+        self.end = _parse_timestamp(str(get('end')), 'end') if get('end') else timezone.now()
+        if get('start'):
+            self.start = _parse_timestamp(str(get('start')), 'start')
+        else:
+            self.start = self.end - timedelta(days=_positive_int(get('days'), 'days', 30))
+        if timezone.is_naive(self.start):
+            self.start = timezone.make_aware(self.start, dt_timezone.utc)
+        if timezone.is_naive(self.end):
+            self.end = timezone.make_aware(self.end, dt_timezone.utc)
+        if self.start >= self.end:
+            raise StatementQueryError("start must be before end")
+
+        self.group_by = get('group_by') or None
+        if self.group_by is not None and self.group_by not in GROUPINGS:
+            raise StatementQueryError(f"group_by must be one of {', '.join(GROUPINGS)}")
+        self.limit = min(_positive_int(get('limit'), 'limit', 100, allow_zero=True), MAX_LIMIT)
+        self.group_limit = min(_positive_int(get('group_limit'), 'group_limit', 100), MAX_GROUPS)
+        self.slice_days = _positive_int(get('slice_days'), 'slice_days', options['SLICE_DAYS'])
+
+        self.verb = get('verb') or None
+        self.activity = get('activity') or None
+        self.course = get('course') or None
+        self.agent = _parse_agent(get('agent')) if get('agent') else None
+        if self.agent is not None:
+            agent_filter(self.agent)  # validates the identifiers
+        self.integration = self.site = None
+        if get('integration'):
+            integration = MoodleIntegration.objects.filter(pk=_positive_int(get('integration'), 'integration', 0)).first()
+            if integration is None:
+                raise StatementQueryError("integration does not exist")
+            self.integration, self.site = integration.pk, site_key(integration.moodle_url)
+        shard = shard_for_params(params)
+        self.shards = [shard] if shard else shard_aliases()
+
+    @property
+    def filters(self) -> Dict[str, Any]:
+        return {
+            key: value for key, value in (
+                ('verb', self.verb), ('activity', self.activity), ('course', self.course),
+                ('agent', self.agent), ('integration', self.integration),
+            ) if value is not None
+        }
+
+    def queryset(self, start=None, end=None):
+        """Statements of the window (or of the slice start..end) matching the filters"""
+        queryset = Statement.objects.filter(
+            is_valid=True, timestamp__gte=start or self.start, timestamp__lt=end or self.end,
+        )
+        if self.verb:
+            queryset = queryset.filter(verb__verb_id=self.verb)
+        if self.activity:
+            queryset = queryset.filter(activity__activity_id=self.activity)
+        if self.course:
+            queryset = queryset.filter(pk__in=StatementActivityLink.objects.filter(
+                activity__activity_id=self.course, role__in=COURSE_ROLES,
+            ).values('statement_id'))
+        if self.agent is not None:
+            queryset = queryset.filter(agent_filter(self.agent))
+        if self.site:
+            queryset = queryset.filter(
+                Q(actor__account_homepage__startswith=self.site) | Q(activity__activity_id__startswith=self.site)
+            )
+        return queryset
+
+    def slices(self) -> List[Tuple[datetime, datetime]]:
+        """The window cut into consecutive slices of at most slice_days"""
+        step = timedelta(days=self.slice_days)
+        slices = []
+        start = self.start
+        while start < self.end:
+            slices.append((start, min(start + step, self.end)))
+            start += step
+        return slices
+
+
+def _positive_int(value, name: str, default: int, allow_zero: bool = False) -> int:
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = -1
+    if number < 0 or (number == 0 and not allow_zero):
+        raise StatementQueryError(f"{name} must be a positive integer")
+    return number
+
+
+def _days(delta: timedelta):
+    days = delta.total_seconds() / 86400
+    return int(days) if days.is_integer() else round(days, 2)
+
+
+def _course_expression():
+    """IRI of the statement's course: the course-typed object, parent or
+    grouping activity, else its first grouping (as in progress.course_ref)"""
+    links = StatementActivityLink.objects.filter(statement=OuterRef('pk'))
+    course = links.filter(
+        Q(activity__definition__type=COURSE_TYPE) | Q(activity__activity_id__contains='/course/view.php?'),
+        role__in=COURSE_ROLES,
+    ).order_by(Case(*(When(role=role, then=rank) for rank, role in enumerate(COURSE_ROLES))))
+    grouping = links.filter(role='grouping').order_by('pk')
+    return Coalesce(
+        Subquery(course.values('activity__activity_id')[:1]),
+        Subquery(grouping.values('activity__activity_id')[:1]),
+    )
+
+
+def _group_expression(group_by: Optional[str]):
+    if group_by == 'day':
+        return TruncDate('timestamp')
+    if group_by == 'verb':
+        return F('verb__verb_id')
+    if group_by == 'activity':
+        return F('activity__activity_id')
+    if group_by == 'course':
+        return _course_expression()
+    if group_by == 'actor':
+        # One identifier per actor, readable in the report
+        return Coalesce(
+            NullIf('actor__mbox', Value('')),
+            Case(When(
+                ~Q(actor__account_name=''), actor__account_name__isnull=False,
+                then=Concat('actor__account_homepage', Value('#'), 'actor__account_name'),
+            )),
+            NullIf('actor__openid', Value('')), 'actor__mbox_sha1sum', Cast('actor_id', CharField()),
+            output_field=CharField(),
+        )
+    return None
+
+
+def _totals(spec: ReportSpec, start, end) -> Dict[str, Any]:
+    """Additive figures of one time slice: the statement count, and the
+    statement count and score totals of each group"""
+    queryset = spec.queryset(start, end).order_by()
+    result = {'statements': queryset.count(), 'groups': []}
+    group = _group_expression(spec.group_by)
+    if group is not None:
+        aggregates = {'n': Count('id'), 'score_sum': Sum(SCALED_SCORE), 'scored': Count(SCALED_SCORE)}
+        if spec.group_by == 'actor':
+            aggregates['label'] = Max('actor__name')
+        result['groups'] = list(queryset.annotate(group=group).values('group').annotate(**aggregates))
+    return result
+
+
+def _distinct_counts(spec: ReportSpec) -> Dict[str, Any]:
+    """Distinct actors and activities (overall and per group) of one shard
+    over the whole window, which time slices cannot be summed into, and the
+    verb IRIs used (verbs are shared across shards)"""
+    queryset = spec.queryset().order_by()
+    result = queryset.aggregate(
+        actors=Count('actor_id', distinct=True), activities=Count('activity_id', distinct=True),
+    )
+    result['verbs'] = set(queryset.values_list('verb__verb_id', flat=True).distinct())
+    result['groups'] = {}
+    group = _group_expression(spec.group_by)
+    if group is not None:
+        rows = queryset.annotate(group=group).values('group').annotate(actors=Count('actor_id', distinct=True))
+        result['groups'] = {row['group']: row['actors'] for row in rows}
+    return result
+
+
+def _merge(spec: ReportSpec, totals: List[Dict[str, Any]], distinct: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Actors and activities belong to one site, so the distinct counts of
+    # the shards add up; verbs are shared across sites and counted once per IRI
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for unit in totals:
+        for row in unit['groups']:
+            group = groups.setdefault(row['group'], {
+                'statements': 0, 'actors': 0, 'score_sum': 0.0, 'scored': 0, 'label': row.get('label'),
+            })
+            group['statements'] += row['n']
+            group['score_sum'] += row['score_sum'] or 0.0
+            group['scored'] += row['scored']
+    for shard in distinct:
+        for key, actors in shard['groups'].items():
+            if key in groups:
+                groups[key]['actors'] += actors
+
+    ordered = sorted(groups.items(), key=lambda item: (item[0] is None, str(item[0])))
+    if spec.group_by != 'day':
+        ordered.sort(key=lambda item: item[1]['statements'], reverse=True)
+    return {
+        'summary': {
+            'total_statements': sum(unit['statements'] for unit in totals),
+            'unique_actors': sum(shard['actors'] for shard in distinct),
+            'unique_activities': sum(shard['activities'] for shard in distinct),
+            'unique_verbs': len(set().union(*(shard['verbs'] for shard in distinct))),
+        },
+        'groups': [
+            {
+                'key': key.isoformat() if hasattr(key, 'isoformat') else key,
+                **({'name': group['label']} if spec.group_by == 'actor' else {}),
+                'statements': group['statements'],
+                'actors': group['actors'],
+                'average_score': round(group['score_sum'] / group['scored'], 4) if group['scored'] else None,
+            }
+            for key, group in ordered[:spec.group_limit]
+        ],
+        'groups_total': len(groups),
+    }
+
+
+def build_report(spec: ReportSpec) -> Dict[str, Any]:
+    """Summary, groups and the most recent statements for a report spec.
+
+    The counts and score totals of each (shard, time slice) and the
+    distinct counts of each shard are computed in SQL by queries run in
+    parallel threads; only their scalar results (one row per group) are
+    merged here.
+    """
+    totals_tasks = [
+        (alias, _totals, (spec, start, end), {}) for alias in spec.shards for start, end in spec.slices()
+    ]
+    distinct_tasks = [(alias, _distinct_counts, (spec,), {}) for alias in spec.shards]
+    results = run_tasks(totals_tasks + distinct_tasks, workers=get_report_settings()['WORKERS'])
+    merged = _merge(spec, results[:len(totals_tasks)], results[len(totals_tasks):])
+    report_data = {
+        'period': {
+            'start': spec.start.isoformat(),
+            'end': spec.end.isoformat(),
+            'days': _days(spec.end - spec.start),
+        },
+        'filters': spec.filters,
+        'group_by': spec.group_by,
+        'summary': merged['summary'],
+        'statements': [],
+    }
+    if spec.group_by:
+        report_data['groups'] = merged['groups']
+        report_data['groups_total'] = merged['groups_total']
+
+    for stmt in recent_statements(spec.limit, spec.queryset(), aliases=spec.shards):
+        report_data['statements'].append({
+            'timestamp': stmt.timestamp.isoformat(),
+            'actor': {
+                'name': stmt.actor.name,
+                'mbox': stmt.actor.mbox
+            },
+            'verb': {
+                'id': stmt.verb.verb_id,
+                'display': stmt.verb.display
+            },
+            'activity': {
+                'id': stmt.activity.activity_id,
+                'definition': stmt.activity.definition
+            } if stmt.activity else None,
+            'result': stmt.result
+        })
+
+    return report_data
+
+
+def build_statement_report(days: int = 30, limit: int = 100, **params) -> Dict[str, Any]:
+    """Report of the last ``days`` days (or of the window/grouping/filters in ``params``)"""
+    return build_report(ReportSpec({'days': days, 'limit': limit, **params}))
+
+
+def store_report(kind: str, data: Dict[str, Any], params: Optional[Dict[str, Any]] = None) -> ReportArtifact:
+    """Save a generated report as an artifact (and drop the expired ones)"""
+    cleanup_reports()
+    return ReportArtifact.objects.create(
+        kind=kind,
+        params=params or {},
+        data=data,
+        size=len(json.dumps(data, cls=DjangoJSONEncoder)),
+        expires_at=timezone.now() + timedelta(hours=get_report_settings()['TTL_HOURS']),
+    )
+
+
+def get_report(report_id) -> Optional[ReportArtifact]:
+    """The artifact with this id, or None if it does not exist or has expired"""
+    try:
+        return ReportArtifact.objects.filter(report_id=report_id, expires_at__gt=timezone.now()).first()
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def cleanup_reports() -> int:
+    """Delete expired report artifacts; returns the number deleted"""
+    deleted, _ = ReportArtifact.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,197 @@
+"""
+Statement retention and chunked deletes.
+
+An integration with ``retention_days`` expires the statements of its site
+stored longer ago than that; ``retention_action = 'archive'`` first
+appends them (as xAPI JSON lines) to a gzip file under
+``LRS_RETENTION['ARCHIVE_DIR']``.  ``manage.py apply_retention`` walks the
+expired statements on the integration's shard in ``(stored, id)`` order
+(the ``lrs_stmt_stored_idx`` index) and deletes them in chunks of
+``BATCH_SIZE``, each in its own short transaction, pausing
+``SLEEP_SECONDS`` between chunks so ingest is never blocked for long.
+
+Every chunk takes its statements out of the daily counts, appends
+``deleted`` entries to the change feed and bumps the statements version.
+Deleting actors or activities (admin, API) goes through
+``delete_cascading``, which removes their statements the same way before
+the rows themselves, instead of one cascade over all their statements.
+Learner progress rows summarize history and are kept.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Activity, Actor, MoodleIntegration, Statement, StatementActivityLink
+from ..sharding import shard_for_url, site_for_url, site_key, use_shard
+from .change_feed import record_changes
+from .http_cache import mark_changed
+from .rollups import remove_statements
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'SLEEP_SECONDS': 0.1,  # pause between chunks
+    'ARCHIVE_DIR': os.path.join(settings.BASE_DIR, 'statement_archive'),
+    'PARENT_BATCH_SIZE': 500,  # actors or activities whose statements are deleted together
+}
+
+
+def get_retention_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_RETENTION', {}))
+    return options
+
+
+# Chunked deletes
+
+def delete_statement_chunk(statements: List[Statement]) -> int:
+    """Delete one chunk of statements (on the current shard) in its own transaction"""
+    if not statements:
+        return 0
+    with transaction.atomic(using=router.db_for_write(Statement)):
+        # Voided statements already left the daily counts
+        remove_statements([statement for statement in statements if statement.is_valid])
+        Statement.objects.filter(pk__in=[statement.pk for statement in statements]).delete()
+        record_changes(statements, action='deleted')
+        mark_changed('statements')
+    return len(statements)
+
+
+def delete_statements(queryset, batch_size: Optional[int] = None, sleep: Optional[float] = None,
+                      on_chunk: Optional[Callable[[int], None]] = None) -> int:
+    """Delete the statements of ``queryset`` in chunks; returns how many were deleted"""
+    options = get_retention_settings()
+    batch_size = batch_size or options['BATCH_SIZE']
+    sleep = options['SLEEP_SECONDS'] if sleep is None else sleep
+    deleted = 0
+    while True:
+        chunk = list(queryset.order_by('pk').only('pk', 'statement_id', 'timestamp', 'is_valid')[:batch_size])
+        deleted += delete_statement_chunk(chunk)
+        if on_chunk and chunk:
+            on_chunk(len(chunk))
+        if len(chunk) < batch_size:
+            return deleted
+        time.sleep(sleep)
+
+
+def _delete_rows(queryset, batch_size: int, sleep: float):
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if pks:
+            queryset.model.objects.filter(pk__in=pks).delete()
+        if len(pks) < batch_size:
+            return
+        time.sleep(sleep)
+
+
+def delete_cascading(queryset, batch_size: Optional[int] = None, sleep: Optional[float] = None) -> int:
+    """Delete actors or activities (on the current shard), removing their
+    statements and activity links in chunks first; returns the rows deleted"""
+    options = get_retention_settings()
+    batch_size = batch_size or options['BATCH_SIZE']
+    sleep = options['SLEEP_SECONDS'] if sleep is None else sleep
+    field = {Actor: 'actor', Activity: 'activity'}[queryset.model]
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    deleted = 0
+    for start in range(0, len(pks), options['PARENT_BATCH_SIZE']):
+        group = pks[start:start + options['PARENT_BATCH_SIZE']]
+        delete_statements(Statement.objects.filter(**{f'{field}__in': group}), batch_size, sleep)
+        if field == 'activity':
+            _delete_rows(StatementActivityLink.objects.filter(activity__in=group), batch_size, sleep)
+        with transaction.atomic(using=router.db_for_write(queryset.model)):
+            deleted += queryset.model.objects.filter(pk__in=group).delete()[1].get(queryset.model._meta.label, 0)
+    return deleted
+
+
+# Retention
+
+class _Archive:
+    """Gzip JSON-lines file of the statements expired by one run"""
+
+    def __init__(self, integration: MoodleIntegration):
+        directory = os.path.join(get_retention_settings()['ARCHIVE_DIR'], f'integration-{integration.pk}')
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz")
+        self.file = None
+
+    def write(self, statements: Iterable[Statement]):
+        from ..serializers import XAPIStatementSerializer
+
+        if self.file is None:
+            self.file = gzip.open(self.path, 'at', encoding='utf-8')
+        for statement in statements:
+            self.file.write(json.dumps(XAPIStatementSerializer(statement).data, default=str) + '\n')
+        # On disk before the chunk is deleted
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _statement_site(statement: Statement) -> Optional[str]:
+    if statement.actor.account_homepage:
+        return site_for_url(statement.actor.account_homepage)
+    return site_for_url(statement.activity.activity_id if statement.activity else (statement.object or {}).get('id'))
+
+
+def apply_retention(integration: MoodleIntegration, now=None, batch_size: Optional[int] = None,
+                    sleep: Optional[float] = None, dry_run: bool = False,
+                    on_chunk: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Expire the integration's statements stored before its retention period"""
+    options = get_retention_settings()
+    batch_size = batch_size or options['BATCH_SIZE']
+    sleep = options['SLEEP_SECONDS'] if sleep is None else sleep
+    if not integration.retention_days:
+        return {'cutoff': None, 'expired': 0, 'archive': None}
+    cutoff = (now or timezone.now()) - timedelta(days=integration.retention_days)
+    site = site_key(integration.moodle_url)
+    archive = _Archive(integration) if integration.retention_action == 'archive' and not dry_run else None
+    expired = 0
+    last = None
+    try:
+        with use_shard(shard_for_url(integration.moodle_url)):
+            while True:
+                # Keyset walk of the stored index; other sites' rows are skipped, not rescanned
+                candidates = Statement.objects.filter(stored__lt=cutoff).filter(
+                    Q(actor__account_homepage__startswith=site) | Q(activity__activity_id__startswith=site)
+                )
+                if last is not None:
+                    candidates = candidates.filter(Q(stored__gt=last[0]) | Q(stored=last[0], pk__gt=last[1]))
+                chunk = list(
+                    candidates.select_related(
+                        'actor', 'verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob'
+                    )
+                    .order_by('stored', 'pk')[:batch_size]
+                )
+                if not chunk:
+                    break
+                last = (chunk[-1].stored, chunk[-1].pk)
+                statements = [statement for statement in chunk if _statement_site(statement) == site]
+                if statements and not dry_run:
+                    if archive is not None:
+                        archive.write(statements)
+                    delete_statement_chunk(statements)
+                expired += len(statements)
+                if on_chunk and statements:
+                    on_chunk(len(statements))
+                if len(chunk) < batch_size:
+                    break
+                if statements and not dry_run:
+                    time.sleep(sleep)
+    finally:
+        if archive is not None:
+            archive.close()
+    return {
+        'cutoff': cutoff,
+        'expired': expired,
+        'archive': archive.path if archive is not None and archive.file is not None else None,
+    }
@@ -0,0 +1,60 @@
+"""
+Statement rollups maintained incrementally on ingest.
+
+``StatementDailyCount`` backs the admin date drill-down so it never has to
+scan the statement table.
+"""
+from collections import Counter
+from typing import Iterable
+
+from django.db import router, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Statement, StatementDailyCount
+
+
+def _statement_day(statement: Statement):
+    timestamp = statement.timestamp
+    if timezone.is_aware(timestamp):
+        timestamp = timezone.localtime(timestamp)
+    return timestamp.date()
+
+
+def record_statements(statements: Iterable[Statement]):
+    """Add a batch of newly stored statements to the daily counts"""
+    per_day = Counter(_statement_day(stmt) for stmt in statements if stmt.timestamp)
+    for day, count in per_day.items():
+        updated = StatementDailyCount.objects.filter(day=day).update(count=F('count') + count)
+        if not updated:
+            with transaction.atomic(using=router.db_for_write(StatementDailyCount)):
+                row, created = StatementDailyCount.objects.select_for_update().get_or_create(
+                    day=day, defaults={'count': count}
+                )
+                if not created:
+                    StatementDailyCount.objects.filter(pk=row.pk).update(count=F('count') + count)
+
+
+def remove_statements(statements: Iterable[Statement]):
+    """Take deleted or voided statements out of the daily counts"""
+    per_day = Counter(_statement_day(stmt) for stmt in statements if stmt.timestamp)
+    for day, count in per_day.items():
+        with transaction.atomic(using=router.db_for_write(StatementDailyCount)):
+            StatementDailyCount.objects.filter(day=day).update(count=F('count') - count)
+            StatementDailyCount.objects.filter(day=day, count__lte=0).delete()
+
+
+def rebuild_daily_counts():
+    """Recompute the daily counts from the statement table"""
+    rows = (
+        Statement.objects.filter(is_valid=True).order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('day').annotate(total=Count('id'))
+    )
+    with transaction.atomic(using=router.db_for_write(StatementDailyCount)):
+        StatementDailyCount.objects.all().delete()
+        StatementDailyCount.objects.bulk_create(
+            [StatementDailyCount(day=row['day'], count=row['total']) for row in rows if row['day']]
+        )
+    return StatementDailyCount.objects.count()
@@ -0,0 +1,227 @@
+"""
+Full-text search over statements and activities.
+
+Documents are flattened into ``SearchDocument.body`` when statements and
+activities are written.  On SQLite the body is mirrored into an FTS5 table
+(``lrs_searchdocument_fts``) by triggers; on PostgreSQL a GIN index over
+``to_tsvector('simple', body)`` is used.  Other backends fall back to
+``icontains`` matching on the flattened body.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from ..models import Activity, SearchDocument, Statement
+from .compact_storage import expand_statement
+
+FTS_TABLE = 'lrs_searchdocument_fts'
+
+# JSON paths (dotted, lists are traversed) copied into the search document
+DEFAULT_JSON_PATHS = [
+    'object.id',
+    'object.definition.name',
+    'object.definition.description',
+    'context.contextActivities.parent.definition.name',
+    'context.contextActivities.grouping.definition.name',
+    'context.platform',
+    'result.response',
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_json_paths() -> List[str]:
+    """JSON paths of ``object``/``context``/``result`` that are indexed"""
+    return getattr(settings, 'LRS_SEARCH_JSON_PATHS', DEFAULT_JSON_PATHS)
+
+
+def _collect_text(value: Any, out: List[str]):
+    """Append every string found in value (language maps, lists, scalars)"""
+    if value is None:
+        return
+    if isinstance(value, dict):
+        for item in value.values():
+            _collect_text(item, out)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_text(item, out)
+    elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        text = str(value).strip()
+        if text:
+            out.append(text)
+
+
+def _resolve_path(data: Any, parts: List[str]) -> List[Any]:
+    """Resolve a dotted path, fanning out over lists"""
+    if not parts:
+        return [data]
+    if isinstance(data, list):
+        values = []
+        for item in data:
+            values.extend(_resolve_path(item, parts))
+        return values
+    if isinstance(data, dict) and parts[0] in data:
+        return _resolve_path(data[parts[0]], parts[1:])
+    return []
+
+
+def extract_json_text(documents: Dict[str, Any], paths: Iterable[str]) -> List[str]:
+    """Extract text for the given dotted paths from a dict of root documents"""
+    out = []
+    for path in paths:
+        root, _, rest = path.partition('.')
+        data = documents.get(root)
+        if not data:
+            continue
+        for value in _resolve_path(data, rest.split('.') if rest else []):
+            _collect_text(value, out)
+    return out
+
+
+def build_statement_body(statement: Statement) -> str:
+    """Flatten a statement into a searchable text body"""
+    expand_statement(statement)
+    parts = []
+    actor = statement.actor
+    if actor:
+        _collect_text([actor.name, actor.mbox, actor.account_name], parts)
+    verb = statement.verb
+    if verb:
+        _collect_text([verb.display, verb.verb_id.split('/')[-1]], parts)
+    activity = statement.activity
+    if activity:
+        _collect_text([
+            activity.activity_id,
+            (activity.definition or {}).get('name'),
+            (activity.definition or {}).get('description'),
+        ], parts)
+    parts.extend(extract_json_text({
+        'object': statement.object,
+        'context': statement.context,
+        'result': statement.result,
+    }, get_json_paths()))
+    # Keep order but drop duplicates (activity name often repeats in object)
+    return '\n'.join(dict.fromkeys(parts))
+
+
+def build_activity_body(activity: Activity) -> str:
+    """Flatten an activity definition into a searchable text body"""
+    parts = []
+    definition = activity.definition or {}
+    _collect_text([
+        activity.activity_id,
+        definition.get('name'),
+        definition.get('description'),
+        definition.get('type'),
+    ], parts)
+    return '\n'.join(dict.fromkeys(parts))
+
+
+def index_statements(statements: Iterable[Statement]):
+    """Create or refresh the search documents of the given statements"""
+    documents = [
+        SearchDocument(statement=stmt, body=build_statement_body(stmt))
+        for stmt in statements
+    ]
+    if documents:
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['statement'],
+            update_fields=['body', 'updated_at'],
+        )
+
+
+def index_activity(activity: Activity):
+    """Create or refresh the search document of an activity"""
+    SearchDocument.objects.update_or_create(
+        activity=activity,
+        defaults={'body': build_activity_body(activity)},
+    )
+
+
+def _tokens(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query or '')
+
+
+def _matching_documents(query: str):
+    """Queryset of SearchDocuments matching every term of query (prefix match)"""
+    tokens = _tokens(query)
+    documents = SearchDocument.objects.all()
+    if not tokens:
+        return documents.none()
+
+    using = router.db_for_read(SearchDocument)
+    vendor = connections[using].vendor
+    if vendor == 'sqlite' and fts5_available(using):
+        fts_query = ' '.join('"%s"*' % token.replace('"', '""') for token in tokens)
+        return documents.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query]
+        ))
+    if vendor == 'postgresql':
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        return documents.alias(matched=RawSQL(
+            "to_tsvector('simple', body) @@ to_tsquery('simple', %s)", [ts_query],
+            output_field=BooleanField(),
+        )).filter(matched=True)
+
+    for token in tokens:
+        documents = documents.filter(body__icontains=token)
+    return documents
+
+
+def search_statements(query: str, queryset=None):
+    """Statements whose search document matches query"""
+    if queryset is None:
+        queryset = Statement.objects.all()
+    documents = _matching_documents(query).filter(statement__isnull=False)
+    return queryset.filter(pk__in=documents.values('statement_id'))
+
+
+def search_activities(query: str, queryset=None):
+    """Activities whose search document matches query"""
+    if queryset is None:
+        queryset = Activity.objects.all()
+    documents = _matching_documents(query).filter(activity__isnull=False)
+    return queryset.filter(pk__in=documents.values('activity_id'))
+
+
+# Per database (alias and name, so a test database is checked on its own)
+_fts5_available: Dict[Tuple[str, str], bool] = {}
+
+
+def fts5_available(using: Optional[str] = None) -> bool:
+    """Whether the FTS5 mirror table exists in the SQLite database"""
+    connection = connections[using or router.db_for_read(SearchDocument)]
+    key = (connection.alias, str(connection.settings_dict['NAME']))
+    if key not in _fts5_available:
+        with connection.cursor() as cursor:
+            _fts5_available[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts5_available[key]
+
+
+def rebuild_index(batch_size: int = 1000) -> Dict[str, int]:
+    """Rebuild all search documents from scratch"""
+    counts = {'statements': 0, 'activities': 0}
+    for activity in Activity.objects.iterator(chunk_size=batch_size):
+        index_activity(activity)
+        counts['activities'] += 1
+
+    queryset = Statement.objects.select_related(
+        'actor', 'verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob'
+    ).order_by('pk')
+    batch = []
+    for statement in queryset.iterator(chunk_size=batch_size):
+        batch.append(statement)
+        if len(batch) >= batch_size:
+            index_statements(batch)
+            counts['statements'] += len(batch)
+            batch = []
+    if batch:
+        index_statements(batch)
+        counts['statements'] += len(batch)
+    return counts
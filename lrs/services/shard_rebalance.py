@@ -0,0 +1,117 @@
+"""
+Moving a Moodle site's statement data to the shard named by its integration.
+
+Statements are copied in batches through the normal bulk ingest path on
+the target shard (which rebuilds their links, search documents, rollups
+and progress there), keeping their ``stored`` time and validity, and only
+then deleted from the source shard.  The change feed records the move as
+``moved_out`` on the source and ``moved_in`` on the target instead of new
+``stored`` statements, so feed consumers such as forwarding do not see
+them as new.  Copies skip statement ids already on the target, so an
+interrupted run can simply be repeated.  Afterwards the
+source's leftover actors and activities of the site are removed and its
+rollups and progress recomputed.
+"""
+from typing import Any, Dict, List
+
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from ..models import Activity, Actor, MoodleIntegration, Statement, StatementActivityLink
+from ..serializers import StatementCreateSerializer, XAPIStatementSerializer, actor_to_agent
+from ..sharding import (
+    clear_site_cache, get_sharding_settings, shard_aliases, site_for_url, site_key, statement_site, use_shard,
+)
+from .agents import resolve_actor
+from .change_feed import record_changes
+from .ingest import bulk_store_statements
+from .progress import rebuild_progress
+from .rollups import rebuild_daily_counts
+
+
+def target_shard(integration: MoodleIntegration) -> str:
+    return integration.shard or get_sharding_settings()['DEFAULT_SHARD']
+
+
+def _site_filter(site: str) -> Q:
+    """Candidate statements of a site (checked exactly with statement_site)"""
+    return Q(actor__account_homepage__startswith=site) | Q(activity__activity_id__startswith=site)
+
+
+def _ingest_data(statement: Statement) -> Dict[str, Any]:
+    """The statement as validated ingest data (as if posted again, with its id)"""
+    serializer = StatementCreateSerializer(data=XAPIStatementSerializer(statement).data)
+    serializer.is_valid(raise_exception=True)
+    return {**serializer.validated_data, 'id': str(statement.statement_id)}
+
+
+def _copy_batch(statements: List[Statement], target: str) -> int:
+    data = [_ingest_data(statement) for statement in statements]
+    with use_shard(target):
+        # Carry the Moodle user ids over (the xAPI agent does not hold them)
+        for actor in {statement.actor for statement in statements}:
+            resolve_actor(actor_to_agent(actor), moodle_user_id=actor.moodle_user_id)
+        created = bulk_store_statements(data, action='moved_in')
+        originals = {str(statement.statement_id): statement for statement in statements}
+        for statement in created:
+            original = originals[str(statement.statement_id)]
+            statement.stored, statement.is_valid = original.stored, original.is_valid
+        Statement.objects.bulk_update(created, ['stored', 'is_valid'])
+    return len(created)
+
+
+def _cleanup_source(site: str):
+    with transaction.atomic(using=router.db_for_write(Statement)):
+        Actor.objects.filter(account_homepage__startswith=site).exclude(
+            Exists(Statement.objects.filter(actor=OuterRef('pk')))
+        ).delete()
+        Activity.objects.filter(activity_id__startswith=site).exclude(
+            Exists(Statement.objects.filter(activity=OuterRef('pk')))
+        ).exclude(
+            Exists(StatementActivityLink.objects.filter(activity=OuterRef('pk')))
+        ).delete()
+    rebuild_daily_counts()
+    rebuild_progress()
+
+
+def rebalance_integration(integration: MoodleIntegration, batch_size: int = 500,
+                          dry_run: bool = False) -> Dict[str, int]:
+    """Move the integration's statements from the other shards to its own; returns {source: count}"""
+    from .http_cache import mark_changed
+
+    clear_site_cache()
+    target = target_shard(integration)
+    site = site_key(integration.moodle_url)
+    moved = {}
+    for source in shard_aliases():
+        if source == target:
+            continue
+        count = 0
+        last_pk = 0
+        while True:
+            with use_shard(source):
+                candidates = list(
+                    Statement.objects.filter(_site_filter(site), pk__gt=last_pk)
+                    .select_related('actor', 'verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob')
+                    .order_by('pk')[:batch_size]
+                )
+            if not candidates:
+                break
+            last_pk = candidates[-1].pk
+            batch = [
+                statement for statement in candidates
+                if site_for_url(statement_site(_ingest_data(statement))) == site
+            ]
+            count += len(batch)
+            if not batch or dry_run:
+                continue
+            _copy_batch(batch, target)
+            with use_shard(source), transaction.atomic(using=router.db_for_write(Statement)):
+                Statement.objects.filter(pk__in=[statement.pk for statement in batch]).delete()
+                record_changes(batch, action='moved_out')
+                mark_changed('statements')
+        if count and not dry_run:
+            with use_shard(source):
+                _cleanup_source(site)
+        moved[source] = count
+    return moved
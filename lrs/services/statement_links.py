@@ -0,0 +1,84 @@
+"""
+Extraction of the statement -> activity link table.
+
+Every activity a statement refers to (its object and each entry of
+``context.contextActivities``) is stored as a ``StatementActivityLink`` row
+so that ``related_activities`` queries use an index instead of JSON scans.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from ..models import Activity, Statement, StatementActivityLink
+from .compact_storage import expand_statement
+
+CONTEXT_ROLES = ('parent', 'grouping', 'category', 'other')
+
+
+def extract_activity_refs(statement: Statement) -> List[Tuple[str, str, dict]]:
+    """(role, activity id, definition) for every activity in the statement"""
+    expand_statement(statement)
+    refs = []
+    obj = statement.object or {}
+    if statement.activity_id:
+        refs.append(('object', statement.activity.activity_id, {}))
+    elif obj.get('objectType', 'Activity') == 'Activity' and obj.get('id'):
+        refs.append(('object', obj['id'], obj.get('definition') or {}))
+
+    context_activities = (statement.context or {}).get('contextActivities') or {}
+    for role in CONTEXT_ROLES:
+        entries = context_activities.get(role) or []
+        if isinstance(entries, dict):
+            # xAPI 0.95 allowed a single object instead of a list
+            entries = [entries]
+        for entry in entries:
+            if isinstance(entry, dict) and entry.get('id'):
+                refs.append((role, entry['id'], entry.get('definition') or {}))
+    return refs
+
+
+def resolve_activities(refs: Iterable[Tuple[str, str, dict]]) -> Dict[str, Activity]:
+    """Map activity ids to Activity rows, creating the missing ones"""
+    definitions = {}
+    for _, activity_id, definition in refs:
+        if definition or activity_id not in definitions:
+            definitions[activity_id] = definition
+    activities = {
+        activity.activity_id: activity
+        for activity in Activity.objects.filter(activity_id__in=definitions)
+    }
+    for activity_id, definition in definitions.items():
+        if activity_id not in activities:
+            activities[activity_id], _ = Activity.objects.get_or_create(
+                activity_id=activity_id,
+                defaults={'definition': definition, 'object_type': 'Activity'},
+            )
+    return activities
+
+
+def link_statements(statements: Iterable[Statement]):
+    """Write the activity links for a batch of statements"""
+    statement_refs = [(stmt, extract_activity_refs(stmt)) for stmt in statements]
+    activities = resolve_activities(ref for _, refs in statement_refs for ref in refs)
+    links = [
+        StatementActivityLink(statement=stmt, activity=activities[activity_id], role=role)
+        for stmt, refs in statement_refs
+        for role, activity_id, _ in refs
+    ]
+    if links:
+        StatementActivityLink.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def rebuild_links(batch_size: int = 1000) -> int:
+    """Re-extract links for all statements"""
+    count = 0
+    queryset = Statement.objects.select_related('activity', 'definition_blob', 'context_blob').order_by('pk')
+    batch = []
+    for statement in queryset.iterator(chunk_size=batch_size):
+        batch.append(statement)
+        if len(batch) >= batch_size:
+            link_statements(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        link_statements(batch)
+        count += len(batch)
+    return count
@@ -0,0 +1,246 @@
+"""
+xAPI GET /statements query engine.
+
+Implements the filter parameters of the xAPI statement resource (agent,
+verb, activity, registration, related_activities, related_agents, since,
+until, limit, ascending, format) on top of indexed columns and the
+``StatementActivityLink`` table.  Results are paged with a keyset cursor on
+(stored, id) so deep pages stay cheap.  Voided statements are left out
+(the partial index of valid statements serves the query) and only
+returned by ``voidedStatementId``.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from ..models import Statement, StatementActivityLink
+from .agents import actor_ids_for_agent, agent_identifiers
+from .compact_storage import json_filter
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+FORMATS = ('exact', 'ids', 'canonical')
+
+
+class StatementQueryError(ValueError):
+    """Raised for malformed query parameters (reported as HTTP 400)"""
+
+
+def _parse_bool(value: Optional[str], name: str) -> bool:
+    if value in (None, ''):
+        return False
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise StatementQueryError(f"{name} must be true or false")
+
+
+def _parse_timestamp(value: str, name: str) -> datetime:
+    parsed = parse_datetime(value.replace(' ', '+'))
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise StatementQueryError(f"{name} must be an ISO 8601 timestamp")
+    return parsed
+
+
+def _parse_agent(value: str) -> Dict[str, Any]:
+    try:
+        agent = json.loads(value)
+    except (TypeError, ValueError):
+        raise StatementQueryError("agent must be a JSON encoded Agent or Identified Group")
+    if not isinstance(agent, dict):
+        raise StatementQueryError("agent must be a JSON encoded Agent or Identified Group")
+    return agent
+
+
+def agent_filter(agent: Dict[str, Any]) -> Q:
+    """Q matching statements whose actor is identified by the agent"""
+    if not agent_identifiers(agent):
+        raise StatementQueryError("agent must have an inverse functional identifier")
+    return Q(actor_id__in=actor_ids_for_agent(agent))
+
+
+# Where related_agents looks for the agent besides the actor: JSON paths of
+# the object (an Agent/Group, or a SubStatement's actor, object and context)
+# and of the context/authority columns, which may be stored as blobs
+RELATED_OBJECT_PATHS = (
+    'object', 'object__actor', 'object__object', 'object__context__instructor', 'object__context__team',
+)
+RELATED_BLOB_PATHS = ('context__instructor', 'context__team', 'authority')
+
+
+def _identified_at(path: str, agent: Dict[str, Any], match) -> Q:
+    """Q matching the agent's identifiers at a JSON path (``match(path, value)``)"""
+    condition = Q()
+    for ifi_type, value in agent_identifiers(agent):
+        if ifi_type == 'mbox':
+            # Stored statements keep the mbox as sent: also match it unnormalized
+            condition |= match(f'{path}__mbox__in', sorted({value, agent['mbox'].strip()}))
+        elif ifi_type == 'account':
+            home_page, name = value.split('|', 1)
+            condition |= match(f'{path}__account__name', name) & match(
+                f'{path}__account__homePage__in', [home_page, f'{home_page}/'],
+            )
+        else:
+            condition |= match(f'{path}__{ifi_type}', value)
+    return condition
+
+
+def _related_agent_filter(agent: Dict[str, Any]) -> Q:
+    """Agent appearing as the object, context instructor or team, authority, or
+    actor/object/instructor/team of a SubStatement, by any of its identifiers.
+
+    An agent is found as a member of an anonymous Group only as the statement
+    actor (through its identifiers), not inside the JSON of these properties.
+    """
+    condition = Q()
+    for path in RELATED_OBJECT_PATHS:
+        condition |= _identified_at(path, agent, lambda lookup, value: Q(**{lookup: value}))
+    for path in RELATED_BLOB_PATHS:
+        condition |= _identified_at(path, agent, json_filter)
+    return condition
+
+
+def encode_cursor(statement: Statement) -> str:
+    raw = f"{statement.stored.isoformat()}|{statement.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(value: str):
+    try:
+        stored, pk = base64.urlsafe_b64decode(value.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(stored), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise StatementQueryError("Invalid cursor")
+
+
+class StatementQuery:
+    """Parsed xAPI statement query.
+
+    ``filter(queryset)`` applies the filters; ``page(queryset)`` additionally
+    orders, applies the cursor and limit and returns (statements, next_cursor).
+    """
+
+    def __init__(self, params):
+        get = params.get
+        self.statement_id = get('statementId')
+        if self.statement_id:
+            try:
+                self.statement_id = uuid.UUID(self.statement_id)
+            except ValueError:
+                raise StatementQueryError("statementId must be a UUID")
+        self.voided_statement_id = get('voidedStatementId')
+        if self.voided_statement_id:
+            try:
+                self.voided_statement_id = uuid.UUID(self.voided_statement_id)
+            except ValueError:
+                raise StatementQueryError("voidedStatementId must be a UUID")
+            if self.statement_id:
+                raise StatementQueryError("statementId and voidedStatementId cannot be combined")
+        self.agent = _parse_agent(get('agent')) if get('agent') else None
+        self.actor_id = get('actor')  # legacy: Actor.actor_id
+        self.verb = get('verb')
+        self.activity = get('activity')
+        self.related_activities = _parse_bool(get('related_activities'), 'related_activities')
+        self.related_agents = _parse_bool(get('related_agents'), 'related_agents')
+        self.ascending = _parse_bool(get('ascending'), 'ascending')
+        self.since = _parse_timestamp(get('since'), 'since') if get('since') else None
+        self.until = _parse_timestamp(get('until'), 'until') if get('until') else None
+        self.cursor = _decode_cursor(get('cursor')) if get('cursor') else None
+
+        self.registration = get('registration')
+        if self.registration:
+            try:
+                self.registration = uuid.UUID(self.registration)
+            except ValueError:
+                raise StatementQueryError("registration must be a UUID")
+
+        self.format = get('format') or 'exact'
+        if self.format not in FORMATS:
+            raise StatementQueryError(f"format must be one of {', '.join(FORMATS)}")
+
+        try:
+            limit = int(get('limit') or 0)
+        except ValueError:
+            raise StatementQueryError("limit must be a non-negative integer")
+        if limit < 0:
+            raise StatementQueryError("limit must be a non-negative integer")
+        self.limit = min(limit, MAX_LIMIT) if limit else DEFAULT_LIMIT
+
+    def filter(self, queryset=None):
+        if queryset is None:
+            queryset = Statement.objects.all()
+
+        # Voided statements are only returned by voidedStatementId
+        if self.statement_id:
+            return queryset.filter(statement_id=self.statement_id, is_valid=True)
+        if self.voided_statement_id:
+            return queryset.filter(statement_id=self.voided_statement_id, is_valid=False)
+        queryset = queryset.filter(is_valid=True)
+
+        if self.agent:
+            condition = agent_filter(self.agent)
+            if self.related_agents:
+                condition |= _related_agent_filter(self.agent)
+            queryset = queryset.filter(condition)
+        if self.actor_id:
+            queryset = queryset.filter(actor__actor_id=self.actor_id)
+        if self.verb:
+            queryset = queryset.filter(verb__verb_id=self.verb)
+        if self.activity:
+            if self.related_activities:
+                links = StatementActivityLink.objects.filter(activity__activity_id=self.activity)
+                queryset = queryset.filter(pk__in=links.values('statement_id'))
+            else:
+                queryset = queryset.filter(activity__activity_id=self.activity)
+        if self.registration:
+            queryset = queryset.filter(registration=self.registration)
+        # since/until refer to the stored time, per the xAPI specification
+        if self.since:
+            queryset = queryset.filter(stored__gt=self.since)
+        if self.until:
+            queryset = queryset.filter(stored__lte=self.until)
+        return queryset
+
+    def ordered(self, queryset=None):
+        queryset = self.filter(queryset)
+        if self.ascending:
+            return queryset.order_by('stored', 'id')
+        return queryset.order_by('-stored', '-id')
+
+    def page(self, queryset=None):
+        queryset = self.ordered(queryset)
+        if self.cursor:
+            stored, pk = self.cursor
+            if self.ascending:
+                queryset = queryset.filter(Q(stored__gt=stored) | Q(stored=stored, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(stored__lt=stored) | Q(stored=stored, id__lt=pk))
+
+        statements = list(queryset[:self.limit + 1])
+        next_cursor = None
+        if len(statements) > self.limit:
+            statements = statements[:self.limit]
+            next_cursor = encode_cursor(statements[-1])
+        return statements, next_cursor
+
+    def merge(self, pages):
+        """Combine the ``page`` results of several shards into one page (the
+        keyset cursor is global, so the next page is fetched the same way)"""
+        statements = sorted(
+            (statement for page, _ in pages for statement in page),
+            key=lambda statement: (statement.stored, statement.pk), reverse=not self.ascending,
+        )
+        next_cursor = None
+        if len(statements) > self.limit or any(cursor for _, cursor in pages):
+            statements = statements[:self.limit]
+            next_cursor = encode_cursor(statements[-1])
+        return statements, next_cursor
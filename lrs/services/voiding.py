@@ -0,0 +1,64 @@
+"""
+xAPI statement voiding.
+
+A statement with the ``voided`` verb and a ``StatementRef`` object voids
+the statement it references: ingest records the target id in
+``Statement.voids``, and the ``statements_stored`` receiver marks the
+target ``is_valid = False`` with one UPDATE by statement id (voiding
+statements themselves cannot be voided).  A target stored after its
+voiding statement is found through the partial ``voids`` index.  Voided
+statements leave the daily counts and learner progress, and get a
+``voided`` change feed entry.
+
+Read paths (xAPI queries, reports, exports, dashboard) filter on
+``is_valid``, which the partial indexes of valid statements cover, so
+honouring voids costs no extra work when reading.
+"""
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..models import Statement
+
+VOIDED_VERB = 'http://adlnet.gov/expapi/verbs/voided'
+
+
+def voided_statement_id(data: Dict[str, Any]) -> Optional[uuid.UUID]:
+    """The statement id voided by a statement (None unless it is a voiding statement)"""
+    obj = data.get('object') or {}
+    if (data.get('verb') or {}).get('id') != VOIDED_VERB or obj.get('objectType') != 'StatementRef':
+        return None
+    try:
+        return uuid.UUID(str(obj.get('id')))
+    except ValueError:
+        return None
+
+
+def apply_voids(statements: Iterable[Statement]) -> List[Statement]:
+    """Void the targets of newly stored voiding statements, and new statements
+    voided earlier (in the storing transaction); returns the statements voided"""
+    from .change_feed import record_changes
+    from .progress import refresh_progress
+    from .rollups import remove_statements
+
+    statements = list(statements)
+    targets = {str(stmt.voids) for stmt in statements if stmt.voids}
+    late = [stmt.statement_id for stmt in statements if not stmt.voids]
+    if late:
+        targets.update(str(target) for target in Statement.objects.filter(voids__in=late).values_list('voids', flat=True))
+    if not targets:
+        return []
+    voided = list(
+        Statement.objects.filter(statement_id__in=targets, is_valid=True, voids__isnull=True)
+        .only('pk', 'statement_id', 'timestamp', 'actor_id', 'activity_id')
+    )
+    if not voided:
+        return []
+    Statement.objects.filter(pk__in=[stmt.pk for stmt in voided]).update(is_valid=False)
+    voided_pks = {stmt.pk for stmt in voided}
+    for stmt in statements:
+        if stmt.pk in voided_pks:
+            stmt.is_valid = False
+    remove_statements(voided)
+    refresh_progress({(stmt.actor_id, stmt.activity_id) for stmt in voided if stmt.activity_id})
+    record_changes(voided, action='voided')
+    return voided
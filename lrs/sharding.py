@@ -0,0 +1,248 @@
+"""
+Optional sharding of the statement data by Moodle site.
+
+With ``LRS_SHARDING['ENABLED']``, the statement tables (``SHARDED_MODELS``)
+of each ``MoodleIntegration`` live in the database named by its ``shard``
+field (blank: ``DEFAULT_SHARD``).  Catalog tables (integrations, cursors,
+jobs, resource versions) stay on ``default``.
+
+The shard of a statement comes from its site: the actor's account
+homePage, else the object id, matched against the integration URLs.
+Code that touches statement data for one site runs inside
+``use_shard(alias)``, and ``ShardRouter`` sends the queries of that block
+to the shard.  Outside a shard block queries use the default shard;
+``fan_out`` runs a function on every shard for global counts and reports.
+Move a site's data after changing its shard with
+``manage.py rebalance_shards``.
+
+Each shard must be migrated: ``manage.py migrate --database=<alias>``.
+"""
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SHARDS': [DEFAULT_DB_ALIAS],
+    'DEFAULT_SHARD': DEFAULT_DB_ALIAS,
+    'FAN_OUT_WORKERS': 4,
+    'SITE_CACHE_SECONDS': 60,
+}
+
+# Models (lowercase names in the lrs app) stored per shard
+SHARDED_MODELS = {
+    'statement', 'actor', 'agentidentifier', 'verb', 'activity', 'statementactivitylink',
+    'statementdailycount', 'searchdocument', 'learnerprogress', 'statementblob',
+    'statementchange', 'changesequence',
+}
+
+_current_shard: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('lrs_shard', default=None)
+
+
+def get_sharding_settings() -> Dict[str, Any]:
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'LRS_SHARDING', {}))
+    return options
+
+
+def sharding_enabled() -> bool:
+    return get_sharding_settings()['ENABLED']
+
+
+def shard_aliases() -> List[str]:
+    options = get_sharding_settings()
+    if not options['ENABLED']:
+        return [DEFAULT_DB_ALIAS]
+    return list(dict.fromkeys([options['DEFAULT_SHARD'], *options['SHARDS']]))
+
+
+def is_sharded(model) -> bool:
+    return model._meta.app_label == 'lrs' and model._meta.model_name in SHARDED_MODELS
+
+
+def current_shard() -> Optional[str]:
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias: Optional[str]):
+    """Route the statement-data queries of the block to ``alias`` (None: no change)"""
+    if alias is None or not sharding_enabled():
+        yield
+        return
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+# Shard keys
+
+def site_key(url: Optional[str]) -> str:
+    """Normalized site URL (scheme://host[:port]/path without trailing slash)"""
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+_site_map: Tuple[float, List[Tuple[str, str]]] = (0.0, [])
+
+
+def clear_site_cache():
+    global _site_map
+    _site_map = (0.0, [])
+
+
+def _sites() -> List[Tuple[str, str]]:
+    """(site key, shard) of every integration, longest site first"""
+    global _site_map
+    options = get_sharding_settings()
+    loaded_at, sites = _site_map
+    if time.monotonic() - loaded_at > options['SITE_CACHE_SECONDS']:
+        from .models import MoodleIntegration
+
+        sites = sorted(
+            ((site_key(url), shard or options['DEFAULT_SHARD'])
+             for url, shard in MoodleIntegration.objects.values_list('moodle_url', 'shard')),
+            key=lambda item: len(item[0]), reverse=True,
+        )
+        _site_map = (time.monotonic(), sites)
+    return sites
+
+
+def _match_site(url: Optional[str]) -> Optional[Tuple[str, str]]:
+    key = site_key(url)
+    for site, shard in _sites():
+        if site and (key == site or key.startswith(site + '/')):
+            return site, shard
+    return None
+
+
+def site_for_url(url: Optional[str]) -> Optional[str]:
+    """Site key of the integration whose site URL is a prefix of ``url``"""
+    match = _match_site(url)
+    return match[0] if match else None
+
+
+def shard_for_url(url: Optional[str]) -> str:
+    """Shard of the integration whose site URL is a prefix of ``url``"""
+    options = get_sharding_settings()
+    if not options['ENABLED']:
+        return DEFAULT_DB_ALIAS
+    match = _match_site(url)
+    return match[1] if match else options['DEFAULT_SHARD']
+
+
+def statement_site(data: Dict[str, Any]) -> Optional[str]:
+    """Site URL of a statement: actor account homePage, else the object id"""
+    account = (data.get('actor') or {}).get('account')
+    if isinstance(account, dict) and account.get('homePage'):
+        return account['homePage']
+    return (data.get('object') or {}).get('id')
+
+
+def shard_for_statement(data: Dict[str, Any]) -> str:
+    return shard_for_url(statement_site(data))
+
+
+def shard_for_params(params) -> Optional[str]:
+    """Shard selected by request parameters: ``integration=<id>``, else the
+    site of an ``agent`` with an account; None if they select none"""
+    if not sharding_enabled():
+        return None
+    integration = params.get('integration')
+    if integration and str(integration).isdigit():
+        from .models import MoodleIntegration
+
+        shard = MoodleIntegration.objects.filter(pk=integration).values_list('shard', flat=True).first()
+        return shard or get_sharding_settings()['DEFAULT_SHARD']
+    try:
+        agent = json.loads(params.get('agent') or 'null')
+    except ValueError:
+        return None
+    account = agent.get('account') if isinstance(agent, dict) else None
+    if isinstance(account, dict) and account.get('homePage'):
+        return shard_for_url(account['homePage'])
+    return None
+
+
+def group_by_shard(statements_data: List[Dict[str, Any]]) -> Dict[Optional[str], List[int]]:
+    """Indexes of statements_data per shard ({None: all} when sharding is off)"""
+    if not sharding_enabled():
+        return {None: list(range(len(statements_data)))}
+    groups: Dict[Optional[str], List[int]] = {}
+    for index, data in enumerate(statements_data):
+        groups.setdefault(shard_for_statement(data), []).append(index)
+    return groups
+
+
+# Fan-out
+
+def _run_on_shard(alias: Optional[str], func: Callable, args, kwargs):
+    try:
+        with use_shard(alias):
+            return func(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+def run_tasks(tasks: List[Tuple[Optional[str], Callable, tuple, dict]], workers: Optional[int] = None) -> List[Any]:
+    """Run (shard, func, args, kwargs) tasks in parallel threads, each on its
+    shard; returns their results in order.  A single task runs inline."""
+    if len(tasks) == 1:
+        alias, func, args, kwargs = tasks[0]
+        with use_shard(alias):
+            return [func(*args, **kwargs)]
+    workers = min(len(tasks), workers or get_sharding_settings()['FAN_OUT_WORKERS']) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_on_shard, alias, func, args, kwargs) for alias, func, args, kwargs in tasks]
+        return [future.result() for future in futures]
+
+
+def fan_out(func: Callable, *args, aliases: Optional[Iterable[str]] = None, **kwargs) -> Dict[str, Any]:
+    """Run ``func`` on every shard (in parallel); returns {alias: result}"""
+    aliases = list(aliases or shard_aliases())
+    if not sharding_enabled():
+        return {alias: func(*args, **kwargs) for alias in aliases}
+    results = run_tasks([(alias, func, args, kwargs) for alias in aliases])
+    return dict(zip(aliases, results))
+
+
+class ShardRouter:
+    """Database router for the statement data (put it before PrimaryReplicaRouter)"""
+
+    def _db(self, model, hints) -> Optional[str]:
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in shard_aliases():
+            return instance._state.db
+        return current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled() and is_sharded(type(obj1)) and is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        options = get_sharding_settings()
+        if not options['ENABLED'] or db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        # Shards only hold the statement tables (data migrations that name
+        # no model run on the default database only)
+        return app_label == 'lrs' and model_name in SHARDED_MODELS
@@ -0,0 +1,131 @@
+# lrs/signals.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Activity, Actor, LRSCredential, MoodleIntegration, Statement, Verb
+
+# Sent by every ingest path after a batch of statements has been written,
+# inside the ingest transaction.  ``statements`` is a list of Statement
+# instances with actor/verb/activity already attached; ``action`` (default
+# 'stored') is their change feed action ('moved_in' for shard moves).
+statements_stored = Signal()
+
+
+@receiver(statements_stored)
+def index_stored_statements(sender, statements, **kwargs):
+    """Keep the full-text search index in step with ingest"""
+    from .services.search import index_statements
+    index_statements(statements)
+
+
+@receiver(statements_stored)
+def link_stored_statements(sender, statements, **kwargs):
+    """Extract object/contextActivities links for related_activities queries"""
+    from .services.statement_links import link_statements
+    link_statements(statements)
+
+
+@receiver(statements_stored)
+def update_statement_rollups(sender, statements, **kwargs):
+    """Keep the per-day statement counts used by the admin current"""
+    from .services.rollups import record_statements
+    record_statements(statements)
+
+
+@receiver(statements_stored)
+def update_learner_progress(sender, statements, **kwargs):
+    """Fold scores and completion into the materialized learner progress"""
+    from .services.progress import update_progress
+    update_progress(statements)
+
+
+@receiver(statements_stored)
+def append_statement_changes(sender, statements, action='stored', **kwargs):
+    """Append the statements to the change feed, in ingest order"""
+    from .services.change_feed import record_changes
+    record_changes(statements, action=action)
+
+
+@receiver(statements_stored)
+def void_statements(sender, statements, **kwargs):
+    """Mark the statements voided by (or before) this batch invalid"""
+    from .services.voiding import apply_voids
+    apply_voids(statements)
+
+
+@receiver(statements_stored)
+def bump_statements_version(sender, statements, **kwargs):
+    """Invalidate ETags and cached responses of the statement APIs"""
+    from .services.http_cache import mark_changed
+    mark_changed('statements')
+
+
+# Statement inserts are covered by statements_stored, and a post_delete
+# receiver on Statement would disable Django's fast (bulk) cascade deletes,
+# so statement deletes call mark_changed explicitly.
+@receiver(post_save, sender=Statement)
+def bump_updated_statement_version(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        from .services.http_cache import mark_changed
+        mark_changed('statements')
+
+
+RESOURCE_NAMES = {Actor: 'actors', Verb: 'verbs', Activity: 'activities'}
+
+
+@receiver(post_save, sender=Actor)
+@receiver(post_save, sender=Verb)
+@receiver(post_save, sender=Activity)
+def bump_saved_resource_version(sender, created=False, raw=False, **kwargs):
+    if not raw:
+        from .services.http_cache import mark_changed
+        # Statement (and progress) responses embed actors, verbs and activities
+        mark_changed(RESOURCE_NAMES[sender], *([] if created else ['statements']))
+
+
+@receiver(post_delete, sender=Actor)
+@receiver(post_delete, sender=Verb)
+@receiver(post_delete, sender=Activity)
+def bump_deleted_resource_version(sender, **kwargs):
+    # Deleting these cascades to their statements
+    from .services.http_cache import mark_changed
+    mark_changed(RESOURCE_NAMES[sender], 'statements')
+
+
+@receiver(post_save, sender=Activity)
+def index_saved_activity(sender, instance, raw=False, **kwargs):
+    """Re-index an activity whenever its definition is saved"""
+    if raw:
+        return
+    from .services.search import index_activity
+    index_activity(instance)
+
+
+@receiver(post_save, sender=MoodleIntegration)
+@receiver(post_delete, sender=MoodleIntegration)
+def clear_shard_sites(sender, **kwargs):
+    """A changed site URL or shard takes effect without waiting for the site cache"""
+    from .sharding import clear_site_cache
+    clear_site_cache()
+
+
+@receiver(post_save, sender=LRSCredential)
+@receiver(post_delete, sender=LRSCredential)
+@receiver(post_save, sender=MoodleIntegration)
+def clear_cached_credentials(sender, **kwargs):
+    """Revoked credentials (or deactivated sites) stop authenticating at once in this process"""
+    from .services.credentials import clear_credential_cache
+    clear_credential_cache()
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply LRS_SQLITE_PRAGMAS (WAL journal etc.) to new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'LRS_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -1,50 +1,88 @@
 # lrs/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from .views import ingest, moodle, query, reports, ui
 
 # Create a router for the ViewSets
 router = DefaultRouter()
-router.register(r'statements', views.StatementViewSet)
-router.register(r'actors', views.ActorViewSet)
-router.register(r'verbs', views.VerbViewSet)
-router.register(r'activities', views.ActivityViewSet)
-# router.register(r'moodle-integrations', views.MoodleIntegrationViewSet)  # Commented out to avoid conflicts
+router.register(r'statements', query.StatementViewSet)
+router.register(r'actors', query.ActorViewSet)
+router.register(r'verbs', query.VerbViewSet)
+router.register(r'activities', query.ActivityViewSet)
+router.register(r'progress', query.LearnerProgressViewSet)
+# router.register(r'moodle-integrations', moodle.MoodleIntegrationViewSet)  # Commented out to avoid conflicts
+
+# Moodle event and Moodle-proxy endpoints: async implementations under ASGI
+# (the sync endpoints only queue background jobs)
+if settings.LRS_ASYNC_VIEWS:
+    from . import async_views
+    event_views = proxy_views = async_views
+else:
+    event_views, proxy_views = ingest, moodle
+
+xapi_statements_view = query.StatementViewSet.as_view(
+    {'get': 'xapi_query', 'post': 'xapi_statements'},
+    content_negotiation_class=query.XAPIContentNegotiation,
+)
 
 urlpatterns = [
     # API endpoints
-    path('', views.StatementViewSet.as_view({'get': 'list', 'post': 'create'}), name='statement-list'),
-    path('statements/', views.StatementViewSet.as_view({'get': 'list', 'post': 'create'}), name='statement-list'),
-    path('statements/<int:pk>/', views.StatementViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='statement-detail'),
+    path('', query.StatementViewSet.as_view({'get': 'list', 'post': 'create'}), name='statement-list'),
+    path('statements/', query.StatementViewSet.as_view({'get': 'list', 'post': 'create'}), name='statement-list'),
+    path('statements/<int:pk>/', query.StatementViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='statement-detail'),
+    
+    # xAPI statement resource (GET query engine / POST ingest)
+    path('xapi/statements', xapi_statements_view, name='xapi-statements'),
+    path('xapi/statements/', xapi_statements_view, name='xapi-statements-slash'),
+    
+    # Change feed of ingested statements (long-poll pages / server-sent events)
+    path('xapi/changes', query.statement_changes_api, name='statement-changes'),
+    path('xapi/changes/stream', query.statement_changes_stream, name='statement-changes-stream'),
+    
+    # Live dashboard updates (long-poll under WSGI / server-sent events under ASGI)
+    path('dashboard/updates', ui.dashboard_updates_api, name='dashboard-updates'),
+    path('dashboard/stream', ui.dashboard_stream, name='dashboard-stream'),
+    
+    # Forwarding to secondary LRSs (manage.py forward_statements)
+    path('forwarding/', reports.forwarding_status_api, name='forwarding-status'),
     
     # Moodle event endpoint
-    path('moodle/event/', views.MoodleXAPIView.as_view(), name='moodle-xapi'),
-    path('moodle/event', views.MoodleXAPIView.as_view(), name='moodle-xapi-no-slash'),
+    path('moodle/event/', event_views.MoodleXAPIView.as_view(), name='moodle-xapi'),
+    path('moodle/event', event_views.MoodleXAPIView.as_view(), name='moodle-xapi-no-slash'),
     
     # ViewSets
     path('', include(router.urls)),
     
     # Direct API endpoints for Moodle Manager
-    path('moodle-integrations/', views.moodle_integrations_api, name='moodle-integrations'),
-    path('moodle-integrations/create/', views.create_moodle_integration_api, name='create-moodle-integration'),
-    path('moodle-integrations/<int:pk>/update/', views.update_moodle_integration_api, name='update-moodle-integration'),
-    path('moodle-integrations/<int:pk>/delete/', views.delete_moodle_integration_api, name='delete-moodle-integration'),
-    path('test-moodle-connection/', views.test_moodle_connection_api, name='test-moodle-connection'),
-    path('moodle-data/', views.get_moodle_data_api, name='get-moodle-data'),
-    path('create-moodle-web-service/', views.create_moodle_web_service_api, name='create-moodle-web-service'),
-    path('create-moodle-user/', views.create_moodle_user_api, name='create-moodle-user'),
+    path('moodle-integrations/', moodle.moodle_integrations_api, name='moodle-integrations'),
+    path('moodle-integrations/create/', moodle.create_moodle_integration_api, name='create-moodle-integration'),
+    path('moodle-integrations/<int:pk>/update/', moodle.update_moodle_integration_api, name='update-moodle-integration'),
+    path('moodle-integrations/<int:pk>/delete/', moodle.delete_moodle_integration_api, name='delete-moodle-integration'),
+    path('moodle-integrations/<int:pk>/pull-logs/', moodle.pull_moodle_logs_api, name='pull-moodle-logs'),
+    path('moodle-integrations/<int:pk>/credentials/', moodle.integration_credentials_api, name='integration-credentials'),
+    path('moodle-integrations/<int:pk>/credentials/<int:credential_pk>/', moodle.revoke_credential_api, name='revoke-credential'),
+    path('test-moodle-connection/', proxy_views.test_moodle_connection_api, name='test-moodle-connection'),
+    path('moodle-data/', proxy_views.get_moodle_data_api, name='get-moodle-data'),
+    path('create-moodle-web-service/', moodle.create_moodle_web_service_api, name='create-moodle-web-service'),
+    path('create-moodle-user/', moodle.create_moodle_user_api, name='create-moodle-user'),
     
     # LRS Integration endpoints
-    path('debug-moodle-api/', views.debug_moodle_api_request, name='debug-moodle-api'),
-    path('simple-test/', views.simple_test_api, name='simple-test'),
-    path('test-sync/', views.test_sync_api, name='test-sync'),
-    path('sync-moodle-users/', views.sync_moodle_users_api, name='sync-moodle-users'),
-    path('sync-moodle-courses/', views.sync_moodle_courses_api, name='sync-moodle-courses'),
-    path('sync-moodle-activities/', views.sync_moodle_activities_api, name='sync-moodle-activities'),
-    path('generate-xapi-reports/', views.generate_xapi_reports_api, name='generate-xapi-reports'),
-    path('download-xapi-report/', views.download_xapi_report, name='download-xapi-report'),
-    path('statements/get', views.StatementViewSet.as_view({'get': 'get_statements'}), name='get-statements'),
+    path('debug-moodle-api/', moodle.debug_moodle_api_request, name='debug-moodle-api'),
+    path('simple-test/', moodle.simple_test_api, name='simple-test'),
+    path('test-sync/', moodle.test_sync_api, name='test-sync'),
+    path('sync-moodle-users/', moodle.sync_moodle_users_api, name='sync-moodle-users'),
+    path('sync-moodle-courses/', moodle.sync_moodle_courses_api, name='sync-moodle-courses'),
+    path('sync-moodle-activities/', moodle.sync_moodle_activities_api, name='sync-moodle-activities'),
+    path('generate-xapi-reports/', reports.generate_xapi_reports_api, name='generate-xapi-reports'),
+    path('download-xapi-report/', reports.download_xapi_report, name='download-xapi-report'),
+    path('export/statements.csv', reports.export_statements_csv, name='export-statements-csv'),
+    path('export/progress.csv', reports.export_progress_csv, name='export-progress-csv'),
+    path('statements/get', query.StatementViewSet.as_view({'get': 'get_statements'}), name='get-statements'),
+    path('ingest/stats/', ingest.ingest_stats_api, name='ingest-stats'),
+    path('jobs/<int:pk>/', reports.job_status_api, name='job-status'),
+    path('jobs/<int:pk>/result/', reports.job_result_api, name='job-result'),
     
     # v1 API endpoints for external compatibility
-    path('v1/models/', views.v1_models_api, name='v1-models'),
+    path('v1/models/', reports.v1_models_api, name='v1-models'),
 ]
\ No newline at end of file
@@ -0,0 +1,59 @@
+# lrs/views/__init__.py
+"""
+Views, split by area so a process only imports what it serves:
+
+- ``query``: the statement, actor, verb, activity and progress resources and
+  the change feed
+- ``ingest``: statement POSTs and the Moodle event endpoint
+- ``moodle``: Moodle integrations and the Moodle-proxy endpoints
+- ``reports``: reports, CSV exports, jobs, forwarding status
+- ``ui``: the HTML pages and the live dashboard updates
+
+Services are imported inside the views that use them.  Names are still
+importable from ``lrs.views`` (``from lrs.views import dashboard``); the
+module defining one is imported on first access.  ``manage.py import_time``
+measures the cold-start import cost.
+"""
+import importlib
+
+_EXPORTS = {
+    'query': (
+        'XAPIContentNegotiation', 'ConditionalGetMixin', 'ShardScopedMixin', 'StatementViewSet',
+        'ActorViewSet', 'VerbViewSet', 'ActivityViewSet', 'LearnerProgressViewSet',
+        'statement_changes_api', 'statement_changes_stream',
+    ),
+    'ingest': ('StatementIngestMixin', 'MoodleXAPIView', 'ingest_stats_api'),
+    'moodle': (
+        'MoodleIntegrationViewSet', 'moodle_integrations_api', 'create_moodle_integration_api',
+        'update_moodle_integration_api', 'delete_moodle_integration_api', 'test_moodle_connection_api',
+        'get_moodle_data_api', 'create_moodle_web_service_api', 'create_moodle_user_api',
+        'debug_moodle_api_request', 'simple_test_api', 'test_sync_api', 'sync_moodle_users_api',
+        'sync_moodle_courses_api', 'sync_moodle_activities_api', 'pull_moodle_logs_api',
+        'integration_credentials_api', 'revoke_credential_api',
+    ),
+    'reports': (
+        'generate_xapi_reports_api', 'download_xapi_report', 'export_statements_csv', 'export_progress_csv',
+        'job_status_api', 'job_result_api', 'forwarding_status_api', 'v1_models_api',
+    ),
+    'ui': (
+        'dashboard', 'statements_view', 'test_api_view', 'config_view', 'web_services_view',
+        'moodle_manager_view', 'dashboard_updates_api', 'dashboard_stream',
+    ),
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'{__name__}.{module}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))
@@ -0,0 +1,137 @@
+# lrs/views/ingest.py
+"""Statement ingest: xAPI statement POSTs and the Moodle event endpoint"""
+from rest_framework import status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ..authentication import IngestPermission
+
+
+class StatementIngestMixin:
+    """The writing actions of the statement resource (authenticated and
+    rate-limited as ingest)"""
+    ingest_actions = ('create', 'xapi_statements')
+
+    def get_permissions(self):
+        if self.action in self.ingest_actions:
+            return [IngestPermission()]
+        return super().get_permissions()
+
+    def get_throttles(self):
+        from ..services.rate_limit import IngestThrottle
+        if self.action in self.ingest_actions:
+            return [IngestThrottle()]
+        return super().get_throttles()
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            from ..serializers import StatementCreateSerializer
+            return StatementCreateSerializer
+        return super().get_serializer_class()
+
+    def create(self, request, *args, **kwargs):
+        """Store one statement through the ingest writer, as ``xapi_statements`` does"""
+        from ..serializers import StatementSerializer
+        from ..services.ingest import StatementConflict, new_statements
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            statement = serializer.save()
+        except StatementConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        data = StatementSerializer(statement, context=self.get_serializer_context()).data
+        # A statement already stored with the same content is not stored again
+        created = bool(new_statements([statement]))
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def xapi_statements(self, request):
+        """Handle xAPI statements POST endpoint"""
+        from ..serializers import StatementCreateSerializer
+        from ..services.ingest import StatementConflict, ingest_statements, new_statements
+
+        if request.method == 'POST':
+            # Check if it's a single statement or multiple
+            statements_data = request.data
+
+            # Handle single statement
+            if isinstance(statements_data, dict):
+                statements_data = [statements_data]
+
+            # Validate the whole batch first: xAPI batches are all-or-nothing
+            validated = []
+            for stmt_data in statements_data:
+                serializer = StatementCreateSerializer(data=stmt_data)
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                validated.append(serializer.validated_data)
+            ids = [data['id'] for data in validated if data.get('id')]
+            if len(ids) != len(set(ids)):
+                return Response({'error': 'Statement ids must be unique within a batch'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                statements = ingest_statements(validated)
+            except StatementConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            except Exception as e:
+                return Response(
+                    {'error': f'Failed to create statement: {str(e)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            created_statements = [statement.statement_id for statement in statements]
+            created = len(new_statements(statements))
+
+            # Statements already stored with the same content are not stored again
+            return Response({
+                'message': f'Successfully created {created} statement(s)',
+                'statement_ids': created_statements
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+class MoodleXAPIView(APIView):
+    """Handle Moodle-specific xAPI integration"""
+    permission_classes = [IngestPermission]
+
+    def get_throttles(self):
+        from ..services.rate_limit import IngestThrottle
+        return [IngestThrottle()]
+
+    def post(self, request):
+        """Receive events from Moodle"""
+        from ..serializers import StatementCreateSerializer
+        from ..services.moodle_events import build_statement_from_event
+
+        data = request.data
+
+        event_type = data.get('event_type')
+
+        # Create xAPI statement from Moodle data
+        statement = build_statement_from_event(data)
+
+        # Use StatementCreateSerializer to save the statement
+        serializer = StatementCreateSerializer(data=statement)
+        if serializer.is_valid():
+            statement_obj = serializer.save()
+            response_data = {'id': statement_obj.id, 'status': 'created'}
+        else:
+            response_data = serializer.errors
+
+        return Response({
+            'status': 'success',
+            'moodle_event': event_type,
+            'xapi_statement': statement,
+            'lrs_response': response_data
+        })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def ingest_stats_api(request):
+    """Group-commit writer statistics (batch sizes, wait and commit times) and
+    the requests admitted/throttled/shed by the rate limiter"""
+    from ..services.ingest import ingest_stats
+    from ..services.rate_limit import rate_limit_stats
+    return Response({**ingest_stats(), 'admission': rate_limit_stats()})
@@ -0,0 +1,507 @@
+# lrs/views/moodle.py
+"""Moodle integrations, their LRS credentials and the Moodle-proxy endpoints
+(``async_views`` has the async versions used under ASGI)"""
+from datetime import timedelta
+
+from django.utils import timezone
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status, viewsets
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+
+from ..models import LRSCredential, MoodleIntegration
+from ..serializers import MoodleIntegrationSerializer
+
+
+class MoodleIntegrationViewSet(viewsets.ModelViewSet):
+    """Handle Moodle integration settings"""
+    queryset = MoodleIntegration.objects.all()
+    serializer_class = MoodleIntegrationSerializer
+    permission_classes = [AllowAny]
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def moodle_integrations_api(request):
+    """API endpoint to get all Moodle integrations"""
+    try:
+        integrations = MoodleIntegration.objects.all()
+        serializer = MoodleIntegrationSerializer(integrations, many=True)
+        return Response(serializer.data)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def create_moodle_integration_api(request):
+    """API endpoint to create a new Moodle integration"""
+    try:
+        serializer = MoodleIntegrationSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        else:
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['PUT'])
+@permission_classes([AllowAny])
+def update_moodle_integration_api(request, pk):
+    """API endpoint to update a Moodle integration"""
+    try:
+        integration = MoodleIntegration.objects.get(pk=pk)
+        serializer = MoodleIntegrationSerializer(integration, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except MoodleIntegration.DoesNotExist:
+        return Response({'error': 'Integration not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['DELETE'])
+@permission_classes([AllowAny])
+def delete_moodle_integration_api(request, pk):
+    """API endpoint to delete a Moodle integration"""
+    try:
+        integration = MoodleIntegration.objects.get(pk=pk)
+        integration.delete()
+        return Response({'message': 'Integration deleted successfully'})
+    except MoodleIntegration.DoesNotExist:
+        return Response({'error': 'Integration not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def test_moodle_connection_api(request):
+    """API endpoint to test Moodle connection"""
+    try:
+        moodle_url = request.data.get('moodle_url')
+        token = request.data.get('token')
+        
+        if not moodle_url:
+            return Response({
+                'connected': False,
+                'message': 'Moodle URL is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Use MoodleAPIService to test connection
+        from ..services.moodle_api import MoodleAPIService
+        api = MoodleAPIService(moodle_url, token)
+        
+        if api.test_connection():
+            try:
+                site_info = api.get_site_info()
+                return Response({
+                    'connected': True,
+                    'message': 'Successfully connected to Moodle',
+                    'site_info': site_info
+                })
+            except Exception as e:
+                return Response({
+                    'connected': True,
+                    'message': 'Connected to Moodle but failed to get site info',
+                    'error': str(e)
+                })
+        else:
+            return Response({
+                'connected': False,
+                'message': 'Failed to connect to Moodle. Please check URL and token.',
+                'debug_info': {
+                    'moodle_url': moodle_url,
+                    'token_provided': bool(token),
+                    'webservice_url': f"{moodle_url.rstrip('/')}/webservice/rest/server.php"
+                }
+            })
+            
+    except Exception as e:
+        return Response({
+            'connected': False,
+            'message': f'Connection test failed: {str(e)}',
+            'debug_info': {
+                'moodle_url': request.data.get('moodle_url'),
+                'token_provided': bool(request.data.get('token'))
+            }
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def get_moodle_data_api(request):
+    """API endpoint to get Moodle data (services, users, courses)"""
+    try:
+        moodle_url = request.data.get('moodle_url')
+        token = request.data.get('token')
+        
+        if not moodle_url:
+            return Response({'error': 'Moodle URL is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Use MoodleAPIService to get real data
+        from ..services.moodle_api import MoodleAPIService, MoodleManager
+        api = MoodleAPIService(moodle_url, token)
+        
+        # Get real Moodle data with individual error handling
+        services = []
+        users = []
+        courses = []
+        errors = []
+        
+        try:
+            services = api.get_web_services()
+        except Exception as e:
+            errors.append(f"Failed to get web services: {str(e)}")
+        
+        try:
+            users = api.get_users()
+        except Exception as e:
+            errors.append(f"Failed to get users: {str(e)}")
+        
+        try:
+            courses = api.get_courses()
+        except Exception as e:
+            errors.append(f"Failed to get courses: {str(e)}")
+        
+        # Return partial data with errors if some calls failed
+        response_data = {
+            'services': services,
+            'users': users,
+            'courses': courses,
+            'stats': {
+                'users_count': len(users),
+                'courses_count': len(courses),
+                'services_count': len(services)
+            }
+        }
+        
+        if errors:
+            response_data['errors'] = errors
+            response_data['message'] = 'Some data could not be retrieved'
+        
+        return Response(response_data)
+        
+    except Exception as e:
+        return Response({
+            'error': f'Failed to load Moodle data: {str(e)}',
+            'debug_info': {
+                'moodle_url': request.data.get('moodle_url'),
+                'token_provided': bool(request.data.get('token'))
+            }
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def create_moodle_web_service_api(request):
+    """API endpoint to create a web service in Moodle"""
+    try:
+        moodle_url = request.data.get('moodle_url')
+        token = request.data.get('token')
+        service_name = request.data.get('service_name')
+        short_name = request.data.get('short_name')
+        
+        if not all([moodle_url, service_name, short_name]):
+            return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Use MoodleAPIService to create web service
+        from ..services.moodle_api import MoodleAPIService
+        api = MoodleAPIService(moodle_url, token)
+        
+        result = api.create_web_service(service_name, short_name)
+        
+        if 'error' in result:
+            return Response({'error': result['message']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'message': 'Web service created successfully',
+            'service': result
+        })
+        
+    except Exception as e:
+        return Response({
+            'error': f'Failed to create web service: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def create_moodle_user_api(request):
+    """API endpoint to create a user in Moodle"""
+    try:
+        moodle_url = request.data.get('moodle_url')
+        token = request.data.get('token')
+        username = request.data.get('username')
+        password = request.data.get('password')
+        email = request.data.get('email')
+        firstname = request.data.get('firstname', 'API')
+        lastname = request.data.get('lastname', 'User')
+        
+        if not all([moodle_url, username, password, email]):
+            return Response({'error': 'Missing required fields'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Use MoodleAPIService to create user
+        from ..services.moodle_api import MoodleAPIService
+        api = MoodleAPIService(moodle_url, token)
+        
+        result = api.create_user(username, password, firstname, lastname, email)
+        
+        if 'error' in result:
+            return Response({'error': result['message']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'message': 'User created successfully',
+            'user': result
+        })
+        
+    except Exception as e:
+        return Response({
+            'error': f'Failed to create user: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def debug_moodle_api_request(request):
+    """Debug endpoint to see what's being sent to Moodle"""
+    try:
+        # Disable session middleware for this request
+        request._dont_enforce_csrf_checks = True
+            
+        moodle_url = request.data.get('moodle_url')
+        token = request.data.get('token')
+        
+        if not moodle_url:
+            return Response({'error': 'Moodle URL is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        from ..services.moodle_api import MoodleAPIService
+        api = MoodleAPIService(moodle_url, token)
+        
+        # Debug the exact request being made
+        debug_info = {
+            'moodle_url': moodle_url,
+            'webservice_url': api.webservice_url,
+            'token_provided': bool(token),
+            'token_length': len(token) if token else 0,
+            'request_params': {
+                'wstoken': token[:10] + '...' if token else None,
+                'wsfunction': 'core_user_get_users',
+                'moodlewsrestformat': 'json'
+            }
+        }
+        
+        # Try to make the actual request to see the full error
+        try:
+            # Manually construct the request to see what's happening
+            import requests
+            request_params = {
+                'wstoken': token,
+                'wsfunction': 'core_user_get_users',
+                'moodlewsrestformat': 'json'
+            }
+            
+            response = requests.post(api.webservice_url, data=request_params, timeout=30)
+            debug_info['http_status'] = response.status_code
+            debug_info['response_text'] = response.text[:500]  # First 500 chars
+            
+            try:
+                response_json = response.json()
+                debug_info['response_json'] = response_json
+            except:
+                debug_info['json_parse_error'] = 'Failed to parse JSON'
+                
+        except Exception as e:
+            debug_info['request_error'] = str(e)
+        
+        return Response({
+            'success': True,
+            'message': 'Debug information collected',
+            'debug_info': debug_info
+        })
+        
+    except Exception as e:
+        return Response({
+            'error': f'Debug endpoint failed: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def simple_test_api(request):
+    """Simple test endpoint to verify server is working"""
+    try:
+        # Disable session middleware for this request
+        request._dont_enforce_csrf_checks = True
+        
+        return Response({
+            'success': True,
+            'message': 'Simple test works',
+            'method': request.method,
+            'data': dict(request.data)
+        })
+    except Exception as e:
+        return Response({
+            'error': f'Simple test failed: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def test_sync_api(request):
+    """Test endpoint to debug sync issues"""
+    try:
+        # Disable session middleware for this request
+        request._dont_enforce_csrf_checks = True
+            
+        return Response({
+            'success': True,
+            'message': 'Test endpoint works',
+            'data_received': {
+                'moodle_url': request.data.get('moodle_url'),
+                'token_provided': bool(request.data.get('token')),
+                'method': request.method,
+                'content_type': request.content_type
+            }
+        })
+    except Exception as e:
+        return Response({
+            'error': f'Test endpoint error: {str(e)}',
+            'traceback': str(e.__traceback__) if hasattr(e, '__traceback__') else None
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _request_integration(data):
+    """The integration named by integration_id, or else by moodle_url (and token)"""
+    if data.get('integration_id'):
+        try:
+            return MoodleIntegration.objects.filter(pk=int(data['integration_id'])).first()
+        except (TypeError, ValueError):
+            return None
+    integrations = MoodleIntegration.objects.filter(moodle_url=data.get('moodle_url')).order_by('pk')
+    if data.get('token'):
+        return integrations.filter(moodle_token=data['token']).first() or integrations.first()
+    return integrations.first()
+
+def _enqueue_moodle_job(request, kind, label):
+    """Queue a Moodle sync job; the UI polls /api/jobs/<id>/ for progress.
+    The job gets the integration id: the handler reads its token"""
+    from ..services import jobs
+    
+    if not request.data.get('integration_id') and not request.data.get('moodle_url'):
+        return Response({'error': 'integration_id or Moodle URL is required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    integration = _request_integration(request.data)
+    if integration is None:
+        return Response({'error': 'Integration not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        job = jobs.enqueue(kind, integration_id=integration.pk)
+    except Exception as e:
+        return Response({
+            'error': f'Failed to queue {label}: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'success': True,
+        'message': f'Queued {label}',
+        'job_id': job.pk,
+        'status_url': f'/api/jobs/{job.pk}/'
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def sync_moodle_users_api(request):
+    """Sync Moodle users to LRS (background job)"""
+    return _enqueue_moodle_job(request, 'sync_moodle_users', 'user sync')
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def sync_moodle_courses_api(request):
+    """Sync Moodle courses to LRS (background job)"""
+    return _enqueue_moodle_job(request, 'sync_moodle_courses', 'course sync')
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@csrf_exempt
+@require_http_methods(["POST"])
+@never_cache
+def sync_moodle_activities_api(request):
+    """Sync Moodle activities to LRS (background job)"""
+    return _enqueue_moodle_job(request, 'sync_moodle_activities', 'activity sync')
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def pull_moodle_logs_api(request, pk):
+    """Queue an incremental pull of the integration's Moodle log (optional course_id)"""
+    from ..services import jobs
+    
+    if not MoodleIntegration.objects.filter(pk=pk).exists():
+        return Response({'error': 'Integration not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        course_id = int(request.data.get('course_id') or 0)
+    except (TypeError, ValueError):
+        return Response({'error': 'course_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    job = jobs.enqueue('pull_moodle_logs', integration_id=pk, course_id=course_id)
+    return Response({
+        'success': True,
+        'message': 'Queued Moodle log pull',
+        'job_id': job.pk,
+        'status_url': f'/api/jobs/{job.pk}/'
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def integration_credentials_api(request, pk):
+    """List the integration's LRS credentials, or create one (POST: optional
+    name, expires_in_days); the token is returned only on creation.
+    Staff only: LRS tokens cannot manage credentials"""
+    from ..serializers import LRSCredentialSerializer
+    from ..services.credentials import create_credential
+    
+    integration = MoodleIntegration.objects.filter(pk=pk).first()
+    if integration is None:
+        return Response({'error': 'Integration not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return Response(LRSCredentialSerializer(integration.credentials.all(), many=True).data)
+    
+    try:
+        expires_in_days = int(request.data.get('expires_in_days') or 0)
+    except (TypeError, ValueError):
+        expires_in_days = -1
+    if expires_in_days < 0:
+        return Response({'error': 'expires_in_days must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+    credential, token = create_credential(integration, name=str(request.data.get('name') or '')[:100])
+    if expires_in_days:
+        credential.expires_at = timezone.now() + timedelta(days=expires_in_days)
+        credential.save(update_fields=['expires_at'])
+    return Response({
+        **LRSCredentialSerializer(credential).data,
+        'token': token,
+        'authorization': f'Bearer {token}'
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['DELETE'])
+@permission_classes([IsAdminUser])
+def revoke_credential_api(request, pk, credential_pk):
+    """Revoke an LRS credential (it stays listed as inactive)"""
+    credential = LRSCredential.objects.filter(pk=credential_pk, integration_id=pk).first()
+    if credential is None:
+        return Response({'error': 'Credential not found'}, status=status.HTTP_404_NOT_FOUND)
+    credential.is_active = False
+    credential.save(update_fields=['is_active'])
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
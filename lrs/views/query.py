@@ -0,0 +1,263 @@
+# lrs/views/query.py
+"""The statement, actor, verb, activity and progress resources, and the change feed"""
+from django.db import router, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from ..models import Activity, Actor, LearnerProgress, Statement, Verb
+from ..serializers import ActivitySerializer, ActorSerializer, LearnerProgressSerializer, StatementSerializer, VerbSerializer
+from .ingest import StatementIngestMixin
+
+
+class XAPIContentNegotiation(DefaultContentNegotiation):
+    """xAPI uses ?format= to pick the statement format (exact/ids/canonical),
+    so it must not be treated as a renderer override"""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = next((r for r in renderers if r.format == 'json'), renderers[0])
+        return renderer, renderer.media_type
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified validation (304 without serializing) for list and
+    retrieve, plus the opt-in response cache for JSON responses.
+    ``cache_resource`` names the ResourceVersion to validate against."""
+    cache_resource = None
+
+    def conditional_response(self, request, build, *args, **kwargs):
+        from rest_framework.renderers import JSONRenderer
+        from ..services import http_cache
+
+        # Read the version before the data: a concurrent write can only make
+        # the response newer than its ETag, never older
+        version, changed_at = http_cache.get_version(self.cache_resource)
+        renderer_format = request.accepted_renderer.format
+        etag = http_cache.compute_etag(self.cache_resource, version, request, renderer_format)
+        headers = http_cache.validator_headers(etag, changed_at)
+
+        if http_cache.not_modified(request, etag, changed_at):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cacheable = renderer_format == 'json'
+        content = http_cache.get_cached(self.cache_resource, etag) if cacheable else None
+        if content is not None:
+            response = HttpResponse(content, content_type='application/json')
+        else:
+            response = build(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            if cacheable:
+                http_cache.set_cached(self.cache_resource, etag, JSONRenderer().render(response.data))
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+class ShardScopedMixin:
+    """Serve the request from one shard: ``?integration=<id>`` or the site of
+    an ``?agent=`` account, else the default shard (see lrs.sharding)"""
+
+    def dispatch(self, request, *args, **kwargs):
+        from ..sharding import shard_for_params, use_shard
+
+        with use_shard(shard_for_params(request.GET)):
+            return super().dispatch(request, *args, **kwargs)
+
+class StatementViewSet(ShardScopedMixin, ConditionalGetMixin, StatementIngestMixin, viewsets.ModelViewSet):
+    """Handle xAPI statements"""
+    queryset = Statement.objects.select_related('activity', 'definition_blob', 'context_blob', 'authority_blob')
+    serializer_class = StatementSerializer
+    permission_classes = [AllowAny]  # For testing; secure in production
+    cache_resource = 'statements'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            return queryset
+        # Voided statements are only returned by xAPI voidedStatementId queries
+        return queryset.filter(is_valid=True)
+
+    def perform_destroy(self, instance):
+        from ..services.http_cache import mark_changed
+        with transaction.atomic(using=router.db_for_write(Statement, instance=instance)):
+            instance.delete()
+            mark_changed('statements')
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over statements (?q=terms)"""
+        from ..services.search import search_statements
+
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = search_statements(query, self.get_queryset().select_related('actor', 'verb', 'activity'))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def get_statements(self, request):
+        """Get statements with filters (paginated, for the statements UI)"""
+        return self.conditional_response(request, self._get_statements)
+
+    def _get_statements(self, request):
+        from ..services.statement_query import StatementQuery, StatementQueryError
+
+        try:
+            queryset = StatementQuery(request.query_params).filter(self.get_queryset())
+        except StatementQueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def xapi_query(self, request):
+        """xAPI GET /statements: returns a StatementResult ({statements, more})"""
+        from ..services.statement_query import StatementQuery, StatementQueryError
+        from ..serializers import XAPIStatementSerializer
+        from ..sharding import current_shard, fan_out, sharding_enabled
+
+        try:
+            query = StatementQuery(request.query_params)
+            queryset = Statement.objects.select_related(
+                'actor', 'verb', 'activity', 'definition_blob', 'context_blob', 'authority_blob'
+            )
+            if sharding_enabled() and current_shard() is None:
+                # No shard selected: query every shard and merge the pages
+                statements, next_cursor = query.merge(list(fan_out(query.page, queryset).values()))
+            else:
+                statements, next_cursor = query.page(queryset)
+        except StatementQueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if query.statement_id or query.voided_statement_id:
+            if not statements:
+                return Response({'error': 'Statement not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(XAPIStatementSerializer(statements[0], context={'format': query.format}).data)
+
+        more = ''
+        if next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = next_cursor
+            more = f"{request.path}?{params.urlencode()}"
+
+        response = Response({
+            'statements': XAPIStatementSerializer(statements, many=True, context={'format': query.format}).data,
+            'more': more,
+        })
+        response['X-Experience-API-Consistent-Through'] = timezone.now().isoformat()
+        return response
+
+class ActorViewSet(ShardScopedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Handle xAPI actors"""
+    queryset = Actor.objects.all()
+    serializer_class = ActorSerializer
+    permission_classes = [AllowAny]
+    cache_resource = 'actors'
+
+    def perform_destroy(self, instance):
+        # Statements are deleted in chunks first, not in one cascade
+        from ..services.retention import delete_cascading
+        delete_cascading(type(instance).objects.filter(pk=instance.pk))
+
+class VerbViewSet(ShardScopedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Handle xAPI verbs"""
+    queryset = Verb.objects.all()
+    serializer_class = VerbSerializer
+    permission_classes = [AllowAny]
+    cache_resource = 'verbs'
+
+class ActivityViewSet(ShardScopedMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """Handle xAPI activities"""
+    queryset = Activity.objects.all()
+    serializer_class = ActivitySerializer
+    permission_classes = [AllowAny]
+    cache_resource = 'activities'
+
+    def perform_destroy(self, instance):
+        # Statements are deleted in chunks first, not in one cascade
+        from ..services.retention import delete_cascading
+        delete_cascading(type(instance).objects.filter(pk=instance.pk))
+
+class LearnerProgressViewSet(ShardScopedMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Materialized learner progress (?course=, ?activity=, ?agent=, ?completed=)"""
+    queryset = LearnerProgress.objects.select_related('actor', 'activity', 'course').order_by('actor_id', 'activity_id')
+    serializer_class = LearnerProgressSerializer
+    permission_classes = [AllowAny]
+    # Progress rows only change with statements
+    cache_resource = 'statements'
+
+    def get_queryset(self):
+        from rest_framework.exceptions import ValidationError
+        from ..services.progress import filter_progress
+        from ..services.statement_query import StatementQueryError
+
+        try:
+            return filter_progress(super().get_queryset(), self.request.query_params)
+        except StatementQueryError as e:
+            raise ValidationError({'error': str(e)})
+
+# Change feed
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def statement_changes_api(request):
+    """Change feed page: ?cursor= (from a previous page; none = from the
+    start, ``now`` = from the head), ?limit=, ?wait=<seconds> to long-poll"""
+    from ..services import change_feed
+
+    try:
+        positions = change_feed.decode_cursor(request.query_params.get('cursor'))
+        limit = change_feed.parse_limit(request.query_params.get('limit'))
+        wait = float(request.query_params.get('wait') or 0)
+    except (ValueError, change_feed.ChangeFeedError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes, next_positions = change_feed.read_changes(positions, limit)
+    if not changes and wait > 0:
+        wait = min(wait, change_feed.get_feed_settings()['MAX_WAIT'])
+        if change_feed.wait_for_changes(positions, wait):
+            changes, next_positions = change_feed.read_changes(positions, limit)
+    return Response({
+        'changes': [change_feed.serialize_change(alias, change) for alias, change in changes],
+        'cursor': change_feed.encode_cursor(next_positions),
+        'more': len(changes) == limit,
+    })
+
+def statement_changes_stream(request):
+    """Change feed as server-sent events (resumes from Last-Event-ID or ?cursor=)"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from ..services import change_feed
+
+    try:
+        positions = change_feed.decode_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+        limit = change_feed.parse_limit(request.GET.get('limit'))
+    except change_feed.ChangeFeedError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # Under ASGI the stream waits on the event loop instead of a worker thread
+    events = change_feed.achange_events if isinstance(request, ASGIRequest) else change_feed.change_events
+    response = StreamingHttpResponse(events(positions, limit), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
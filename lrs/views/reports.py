@@ -0,0 +1,204 @@
+# lrs/views/reports.py
+"""Reports, CSV exports, background jobs and forwarding status"""
+import json
+
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from ..models import Job, MoodleIntegration
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def generate_xapi_reports_api(request):
+    """Generate xAPI reports from LRS data (background job).
+
+    Optional: start/end or days (default 30), group_by (day, verb, activity,
+    course, actor), verb, activity, course, agent, integration filters, limit.
+    """
+    from ..services import jobs
+    from ..services.reports import REPORT_PARAMS, ReportSpec
+    from ..services.statement_query import StatementQueryError
+    
+    if not request.data.get('moodle_url'):
+        return Response({'error': 'Moodle URL is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = {key: request.data[key] for key in REPORT_PARAMS if request.data.get(key) not in (None, '')}
+    params.setdefault('days', 30)
+    params.setdefault('limit', 100)
+    try:
+        ReportSpec(params)
+    except StatementQueryError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        job = jobs.enqueue('generate_xapi_report', **params)
+    except Exception as e:
+        return Response({
+            'error': f'Failed to generate reports: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'success': True,
+        'message': 'Queued xAPI report generation',
+        'job_id': job.pk,
+        'status_url': f'/api/jobs/{job.pk}/'
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def download_xapi_report(request):
+    """Download xAPI report as JSON file (?report=<id> for a generated report,
+    ?job=<id> for the report of a job)"""
+    try:
+        from ..services.reports import REPORT_PARAMS, ReportSpec, build_report, get_report
+        from ..services.statement_query import StatementQueryError
+        
+        report_id = request.query_params.get('report')
+        job_id = request.query_params.get('job')
+        if job_id and not report_id:
+            job = Job.objects.filter(pk=job_id, kind='generate_xapi_report', status='succeeded').first()
+            report_id = (job.result or {}).get('report_id') if job is not None else None
+            if report_id is None:
+                return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+        if report_id:
+            report = get_report(report_id)
+            if report is None:
+                return Response({'error': 'Report not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+            report_data = report.data
+        else:
+            # Generate fresh report (window, grouping and filters from the query)
+            params = {key: value for key, value in request.query_params.items() if key in REPORT_PARAMS}
+            try:
+                report_data = build_report(ReportSpec(params))
+            except StatementQueryError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Create JSON response
+        report_json = json.dumps(report_data, indent=2, default=str).encode()
+        
+        # Create HTTP response with file download headers
+        response = HttpResponse(report_json, content_type='application/json')
+        response['Content-Disposition'] = f'attachment; filename="xapi_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.json"'
+        response['Content-Length'] = len(report_json)
+        
+        return response
+        
+    except Exception as e:
+        return Response({
+            'error': f'Failed to download report: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _csv_export(request, kind):
+    from django.http import StreamingHttpResponse
+    from ..services.csv_export import csv_lines
+    from ..services.statement_query import StatementQueryError
+    
+    try:
+        lines = csv_lines(kind, request.query_params)
+    except StatementQueryError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{kind}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_statements_csv(request):
+    """Stream statements as CSV (xAPI query filters: ?verb=, ?activity=, ?agent=, ?since=, ?until=, ...)"""
+    return _csv_export(request, 'statements')
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def export_progress_csv(request):
+    """Stream learner progress as CSV (?course=, ?activity=, ?agent=, ?completed=)"""
+    return _csv_export(request, 'progress')
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def job_status_api(request, pk):
+    """Status and progress of a background job"""
+    from ..services.jobs import job_status
+    
+    try:
+        job = Job.objects.get(pk=pk)
+    except Job.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job_status(job))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def job_result_api(request, pk):
+    """Result of a finished background job (409 while it is still running)"""
+    try:
+        job = Job.objects.get(pk=pk)
+    except Job.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status == 'failed':
+        return Response({'error': job.message or 'Job failed', 'status': job.status},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if job.status != 'succeeded':
+        return Response({'error': 'Job has not finished', 'status': job.status},
+                        status=status.HTTP_409_CONFLICT)
+    return Response(job.result)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def forwarding_status_api(request):
+    """Statement forwarding to the integrations' LRS endpoints: lag, totals and errors per endpoint"""
+    from ..services.forwarding import forwarding_status
+    return Response({'targets': forwarding_status()})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def v1_models_api(request):
+    """v1 API models endpoint for external compatibility"""
+    try:
+        from ..services.reports import data_totals
+        
+        totals = data_totals()
+        # Return model information in v1 API format
+        models_data = {
+            'models': [
+                {
+                    'name': 'Statement',
+                    'count': totals['statements'],
+                    'description': 'xAPI Learning Statements'
+                },
+                {
+                    'name': 'Actor', 
+                    'count': totals['actors'],
+                    'description': 'xAPI Actors (Learners/Instructors)'
+                },
+                {
+                    'name': 'Verb',
+                    'count': totals['verbs'],
+                    'description': 'xAPI Verbs (Actions)'
+                },
+                {
+                    'name': 'Activity',
+                    'count': totals['activities'],
+                    'description': 'xAPI Activities (Courses/Resources)'
+                },
+                {
+                    'name': 'MoodleIntegration',
+                    'count': MoodleIntegration.objects.filter(is_active=True).count(),
+                    'description': 'Active Moodle Integrations'
+                }
+            ],
+            'version': 'v1',
+            'api_version': '1.0.0',
+            'lrs_type': 'xAPI Learning Record Store'
+        }
+        
+        return Response(models_data, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'error': f'Failed to get models: {str(e)}',
+            'version': 'v1'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
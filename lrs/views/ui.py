@@ -0,0 +1,178 @@
+# lrs/views/ui.py
+"""The HTML pages and the live dashboard updates"""
+import json
+
+from django.shortcuts import render
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from ..models import LRSCredential, MoodleIntegration
+
+
+def dashboard(request):
+    """Dashboard view"""
+    # Get LRS endpoint info
+    lrs_endpoint = request.build_absolute_uri('/api/moodle/event/')
+    
+    # Figures shared by every dashboard of this process and kept current from
+    # the change feed while dashboards are open (lrs.services.live_dashboard)
+    from django.core.handlers.asgi import ASGIRequest
+    from ..services.live_dashboard import dashboard_snapshot, get_live_settings
+    
+    snapshot = dashboard_snapshot()
+    moodle_integrations = MoodleIntegration.objects.filter(is_active=True)
+    
+    # Get auth token info (for development - show how to configure)
+    auth_info = {
+        'endpoint': lrs_endpoint,
+        'note': 'Configure in Moodle plugin settings',
+        'moodle_settings': {
+            'lrs_endpoint': lrs_endpoint,
+            'lrs_auth_token': 'Bearer token (or leave empty for AllowAny)'
+        },
+        'moodle_integrations': [
+            {
+                'name': integration.moodle_site_name,
+                'url': integration.moodle_url,
+                'last_sync': integration.last_sync.isoformat() if integration.last_sync else None
+            } for integration in moodle_integrations
+        ]
+    }
+    
+    # Tokens are only shown when created (Moodle Manager, admin or
+    # manage.py create_lrs_credential); show the prefixes of the active ones
+    credentials = LRSCredential.objects.filter(is_active=True, integration__is_active=True)
+    prefixes = [credential.token_prefix for credential in credentials[:3]]
+    if prefixes:
+        auth_token = 'Bearer ' + ' / '.join(f'{prefix}…' for prefix in prefixes)
+    else:
+        auth_token = 'Bearer <token> (create one with manage.py create_lrs_credential <integration id>)'
+    
+    # Moodle plugin configuration details
+    moodle_config = {
+        'lrs_endpoint': {
+            'name': 'local_xapibridge | lrs_endpoint',
+            'value': lrs_endpoint,
+            'description': 'The endpoint URL for your Learning Record Store (LRS)',
+            'default': 'Empty'
+        },
+        'lrs_auth_token': {
+            'name': 'local_xapibridge | lrs_auth_token',
+            'value': auth_token,
+            'description': 'The Bearer token for authenticating with the LRS',
+            'placeholder': 'Generated token below'
+        },
+        'enabled': {
+            'name': 'local_xapibridge | enabled',
+            'value': 'Yes',
+            'description': 'Enable sending Moodle events to the LRS',
+            'default': 'No'
+        }
+    }
+    
+    context = {
+        'lrs_info': json.dumps(auth_info),
+        'lrs_endpoint': lrs_endpoint,
+        'auth_token': auth_token,
+        'lrs_status': "Configured" if bool(lrs_endpoint) else "Not configured",
+        'auth_status': "Configured" if credentials.exists() else "Not configured",
+        'moodle_config': moodle_config,
+        'stats': snapshot['stats'],
+        'rates': snapshot['rates'],
+        'recent_statements': snapshot['recent'],
+        'recent_limit': get_live_settings()['RECENT'],
+        # Pushed over SSE under ASGI; WSGI workers are not held by streams, so long-poll
+        'live_mode': 'sse' if isinstance(request, ASGIRequest) else 'poll',
+    }
+    
+    return render(request, 'dashboard.html', context)
+
+def statements_view(request):
+    return render(request, 'statements.html')
+
+def test_api_view(request):
+    """API testing view"""
+    return render(request, 'test_api.html')
+
+def config_view(request):
+    """LRS configuration view for Moodle setup"""
+    lrs_endpoint = request.build_absolute_uri('/api/moodle/event/')
+    
+    # Check configuration status
+    lrs_configured = bool(lrs_endpoint)
+    
+    # Check if there are any Moodle integrations configured
+    integrations = MoodleIntegration.objects.filter(is_active=True)
+    auth_configured = LRSCredential.objects.filter(is_active=True, integration__in=integrations).exists()
+    
+    # Determine status
+    lrs_status = "Configured" if lrs_configured else "Not configured"
+    auth_status = "Configured" if auth_configured else "Not configured"
+    
+    # Moodle plugin configuration details
+    moodle_config = {
+        'lrs_endpoint': {
+            'name': 'local_xapibridge | lrs_endpoint',
+            'value': lrs_endpoint,
+            'description': 'The endpoint URL for your Learning Record Store (LRS)',
+            'default': 'Empty'
+        },
+        'lrs_auth_token': {
+            'name': 'local_xapibridge | lrs_auth_token',
+            'value': 'Bearer your-token-here' if not auth_configured else 'Configured',
+            'description': 'The Bearer token for authenticating with the LRS',
+            'placeholder': 'Click to enter text'
+        },
+        'enabled': {
+            'name': 'local_xapibridge | enabled',
+            'value': 'Yes',
+            'description': 'Enable sending Moodle events to the LRS',
+            'default': 'No'
+        }
+    }
+    
+    context = {
+        'lrs_endpoint': lrs_endpoint,
+        'lrs_status': lrs_status,
+        'auth_status': auth_status,
+        'integrations': integrations,
+        'moodle_config': moodle_config
+    }
+    
+    return render(request, 'config.html', context)
+
+def web_services_view(request):
+    """Web services management view"""
+    return render(request, 'web_services.html')
+
+def moodle_manager_view(request):
+    """Moodle management view"""
+    return render(request, 'moodle_manager.html')
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def dashboard_updates_api(request):
+    """Live dashboard long-poll: events after ?last_id= (none: a snapshot),
+    waiting up to ?wait=<seconds> for one"""
+    from ..services.live_dashboard import dashboard_updates
+    
+    try:
+        wait = float(request.query_params.get('wait') or 0)
+    except ValueError:
+        return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(dashboard_updates(request.query_params.get('last_id'), wait))
+
+def dashboard_stream(request):
+    """Live dashboard updates as server-sent events (resumes from Last-Event-ID)"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from ..services import live_dashboard
+    
+    events = live_dashboard.adashboard_events if isinstance(request, ASGIRequest) else live_dashboard.dashboard_events
+    response = StreamingHttpResponse(events(request.headers.get('Last-Event-ID')), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
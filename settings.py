@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lrs.middleware.read_replica_middleware',
 ]
 
 ROOT_URLCONF = 'urls'
@@ -71,6 +73,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'wsgi.application'
+ASGI_APPLICATION = 'asgi.application'
+
+# Route the Moodle event and Moodle-proxy endpoints to their async views
+# (lrs.async_views); asgi.py turns this on
+LRS_ASYNC_VIEWS = os.environ.get('LRS_ASYNC_VIEWS', '') == '1'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -79,9 +86,84 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds to wait for the write lock before "database is locked"
+            'timeout': 20,
+        },
     }
 }
 
+# Read replicas for the statement data (see lrs.routers).  Ingest writes go
+# to 'default'; statement/report reads go to a replica unless the client
+# wrote in the last STICKY_SECONDS.  For a local test, point
+# LRS_REPLICA_DB at a copy of (or a replica fed from) the primary database.
+# In multi-process deployments CACHE_ALIAS should name a shared cache.
+LRS_DATABASE_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+if os.environ.get('LRS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LRS_REPLICA_DB'],
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+    LRS_DATABASE_ROUTING['REPLICAS'] = ['replica']
+
+# Sharding of the statement data by Moodle site (see lrs.sharding).  Each
+# MoodleIntegration.shard names one of SHARDS (a DATABASES alias, migrated
+# with manage.py migrate --database=<alias>); blank uses DEFAULT_SHARD.
+# Statements of sites without an integration also go to DEFAULT_SHARD.
+LRS_SHARDING = {
+    'ENABLED': False,
+    'SHARDS': ['default'],
+    'DEFAULT_SHARD': 'default',
+    'FAN_OUT_WORKERS': 4,
+}
+
+DATABASE_ROUTERS = ['lrs.sharding.ShardRouter', 'lrs.routers.PrimaryReplicaRouter']
+
+# Applied to every new SQLite connection (see lrs.signals)
+LRS_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',     # readers no longer block the writer
+    'synchronous': 'NORMAL',   # fsync at checkpoints only (safe with WAL)
+    'busy_timeout': 20000,
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,      # 20 MB page cache
+}
+
+# Caches; 'lrs_responses' holds API responses (size-bounded, culled when full)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'lrs_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lrs-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 1000, 'CULL_FREQUENCY': 4},
+    },
+}
+
+# Conditional GET / response cache for the read APIs (see
+# lrs.services.http_cache).  RESOURCES opts resources into the response
+# cache; ETag/Last-Modified validation applies to all of them.
+LRS_RESPONSE_CACHE = {
+    'ALIAS': 'lrs_responses',
+    'RESOURCES': ['verbs', 'activities'],
+    'TIMEOUT': 300,
+}
+
+# Store statements compactly: object definitions, context and authority as
+# shared content-addressed blobs (see
+# lrs.services.compact_storage; convert existing rows with
+# manage.py compact_statements)
+LRS_COMPACT_STATEMENTS = True
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -134,6 +216,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # Change for production
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'lrs.authentication.LRSTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -164,4 +247,108 @@ else:
     CSRF_COOKIE_SECURE = True
     SECURE_CONTENT_TYPE_NOSNIFF = True
     SECURE_BROWSER_XSS_FILTER = True
-    X_FRAME_OPTIONS = 'DENY'
\ No newline at end of file
+    X_FRAME_OPTIONS = 'DENY'
+
+# Full-text search: JSON paths of statement object/context/result copied into
+# the search index (see lrs.services.search)
+LRS_SEARCH_JSON_PATHS = [
+    'object.id',
+    'object.definition.name',
+    'object.definition.description',
+    'context.contextActivities.parent.definition.name',
+    'context.contextActivities.grouping.definition.name',
+    'context.platform',
+    'result.response',
+]
+
+# Statement ingest: group commit coalesces concurrent writes into one
+# transaction per process (see lrs.services.ingest)
+LRS_INGEST = {
+    'GROUP_COMMIT': True,
+    'MAX_BATCH_SIZE': 200,
+    'MAX_WAIT_MS': 2,
+    'SUBMIT_TIMEOUT': 30,
+}
+
+# Generated reports are kept as downloadable artifacts for TTL_HOURS (see
+# lrs.services.reports; manage.py cleanup_reports deletes expired ones).
+# Report windows are aggregated in SLICE_DAYS slices on up to WORKERS threads
+LRS_REPORTS = {
+    'TTL_HOURS': 24,
+    'SLICE_DAYS': 31,
+    'WORKERS': 4,
+}
+
+# LRS bearer tokens (see lrs.services.credentials): lookups are cached per
+# process for CACHE_SECONDS; REQUIRE_TOKEN rejects anonymous ingest requests
+LRS_AUTH = {
+    'CACHE_SECONDS': 60,
+    'REQUIRE_TOKEN': False,
+}
+
+# Statement change feed (see lrs.services.change_feed): long-polls wait up
+# to MAX_WAIT seconds; SSE responses end after STREAM_SECONDS and resume
+LRS_CHANGE_FEED = {
+    'MAX_LIMIT': 1000,
+    'MAX_WAIT': 30,
+    'POLL_SECONDS': 1.0,
+    'STREAM_SECONDS': 300,
+}
+
+# Live dashboard (see lrs.services.live_dashboard): one change-feed reader per
+# process pushes updates to the open dashboards; totals are recounted at most
+# every TOTALS_SECONDS
+LRS_LIVE_DASHBOARD = {
+    'RECENT': 5,
+    'TOTALS_SECONDS': 10,
+    'MAX_WAIT': 30,
+    'STREAM_SECONDS': 300,
+}
+
+# Ingest rate limiting and load shedding (see lrs.services.rate_limit): token
+# buckets of BURST statements refilled at RATE/s per bearer token or Moodle
+# site; 429 while the writer queue or commit time exceeds the thresholds.
+# BACKEND 'cache' counts in CACHE_ALIAS with atomic add/incr, which must be a
+# cache shared by the workers (Redis or Memcached; the local-memory default
+# limits per process, see `manage.py check`); 'database' is exact across
+# processes but costs a write transaction per ingest request, which
+# serializes with ingest on SQLite
+LRS_RATE_LIMIT = {
+    'ENABLED': True,
+    'BACKEND': 'cache',
+    'CACHE_ALIAS': 'default',
+    'RATE': 200,
+    'BURST': 2000,
+    'MAX_QUEUE_DEPTH': 5000,
+    'MAX_COMMIT_MS': 1000,
+}
+
+# Moodle log pull connector (see lrs.services.moodle_logs); FUNCTION is the
+# web service function returning standard log rows after a given id
+LRS_MOODLE_LOG_PULL = {
+    'FUNCTION': 'local_xapibridge_get_log_events',
+    'PAGE_SIZE': 1000,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 2.0,
+}
+
+# Statement forwarding to the integrations' LRS endpoints (see
+# lrs.services.forwarding; run manage.py forward_statements): batches are
+# retried MAX_RETRIES times, then the endpoint backs off up to MAX_BACKOFF s
+LRS_FORWARDING = {
+    'BATCH_SIZE': 100,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 1.0,
+    'MAX_BACKOFF': 300,
+    'TIMEOUT': 10,
+    'START_AT': 'now',
+}
+
+# Statement retention (see lrs.services.retention; run manage.py
+# apply_retention): expired statements are deleted in chunks of BATCH_SIZE
+# with SLEEP_SECONDS between them; archives are written under ARCHIVE_DIR
+LRS_RETENTION = {
+    'BATCH_SIZE': 1000,
+    'SLEEP_SECONDS': 0.1,
+    'ARCHIVE_DIR': BASE_DIR / 'statement_archive',
+}
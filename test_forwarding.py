@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Statement forwarding against the stub LRS: retries, cursor advance and
+batches rejected with 409
+"""
+import os
+import threading
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from lrs.management.commands.run_stub_lrs import StubLRSServer
+from lrs.models import ForwardingTarget, MoodleIntegration
+from lrs.services import change_feed
+from lrs.services.forwarding import forward_all, forwarding_status
+from lrs.services.ingest import store_statements
+
+SITE = 'https://moodle.example'
+
+
+def statement(n):
+    return {
+        'actor': {'objectType': 'Agent', 'name': f'User {n}', 'account': {'homePage': SITE, 'name': f'user_{n}'}},
+        'verb': {'id': 'http://adlnet.gov/expapi/verbs/completed'},
+        'object': {'objectType': 'Activity', 'id': f'{SITE}/mod/quiz/view.php?id={n}'},
+    }
+
+
+@override_settings(LRS_FORWARDING={'START_AT': 'start', 'BATCH_SIZE': 10, 'RETRY_BACKOFF': 0.01, 'WORKERS': 1})
+class ForwardingTest(TransactionTestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls._databases = setup_databases(verbosity=0, interactive=False)
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        teardown_databases(cls._databases, verbosity=0)
+    
+    def setUp(self):
+        self.lrs = StubLRSServer(('127.0.0.1', 0))
+        threading.Thread(target=self.lrs.serve_forever, daemon=True).start()
+        MoodleIntegration.objects.create(
+            moodle_site_name='Moodle', moodle_url=SITE, moodle_token='token', lrs_endpoint=self.lrs.url,
+        )
+    
+    def tearDown(self):
+        self.lrs.shutdown()
+        self.lrs.server_close()
+    
+    def forward(self):
+        [result] = forward_all()
+        return result
+    
+    def test_retries_and_advances_cursor(self):
+        self.lrs.fail_every = 2
+        stored = store_statements([statement(n) for n in range(25)])
+        
+        result = self.forward()
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['forwarded'], 25)
+        self.assertEqual(set(self.lrs.statements), {str(stmt.statement_id) for stmt in stored})
+        # Every second request fails: the last two of the three batches were retried once
+        self.assertEqual(result['batches'], 3)
+        self.assertEqual(self.lrs.requests, 5)
+        target = ForwardingTarget.objects.get()
+        self.assertEqual(change_feed.decode_cursor(target.cursor), change_feed.decode_cursor('now'))
+        self.assertEqual(forwarding_status()[0]['pending_changes'], 0)
+        
+        # The next run resumes from the cursor
+        self.lrs.fail_every = 0
+        self.assertEqual(self.forward()['forwarded'], 0)
+        store_statements([statement(n) for n in range(25, 28)])
+        self.assertEqual(self.forward()['forwarded'], 3)
+        self.assertEqual(len(self.lrs.statements), 28)
+    
+    def test_failed_run_keeps_cursor(self):
+        self.lrs.fail_every = 1
+        store_statements([statement(n) for n in range(5)])
+        result = self.forward()
+        self.assertIsNotNone(result['error'])
+        target = ForwardingTarget.objects.get()
+        self.assertEqual(target.failures, 1)
+        self.assertEqual(change_feed.decode_cursor(target.cursor), change_feed.decode_cursor(None))
+        
+        self.lrs.fail_every = 0
+        [result] = forward_all(force=True)
+        self.assertEqual(result['forwarded'], 5)
+        self.assertEqual(ForwardingTarget.objects.get().failures, 0)
+    
+    def test_conflict_skips_only_conflicting_statements(self):
+        stored = store_statements([statement(n) for n in range(10)])
+        conflicting = str(stored[3].statement_id)
+        self.lrs.statements[conflicting] = {**statement(99), 'id': conflicting}
+        
+        result = self.forward()
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['conflicts'], 1)
+        self.assertEqual(result['forwarded'], 9)
+        self.assertEqual(set(self.lrs.statements), {str(stmt.statement_id) for stmt in stored})
+        self.assertEqual(self.lrs.statements[conflicting]['verb'], statement(99)['verb'])
+        self.assertEqual(self.lrs.statements[conflicting]['object'], statement(99)['object'])
+        self.assertEqual(forwarding_status()[0]['pending_changes'], 0)
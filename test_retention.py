@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Daily counts, change feed and deletes around voiding and retention
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from lrs.models import Actor, MoodleIntegration, ResourceVersion, Statement, StatementChange, StatementDailyCount
+from lrs.services.ingest import store_statements
+from lrs.services.retention import apply_retention, delete_cascading
+from lrs.services.voiding import VOIDED_VERB
+from lrs.sharding import clear_site_cache, use_shard
+
+SITE = 'https://moodle.example'
+OTHER_SITE = 'https://other.example'
+DAY = date(2026, 3, 2)
+
+
+def statement(n, timestamp=datetime(2026, 3, 2, 10, tzinfo=timezone.utc), site=SITE):
+    return {
+        'actor': {'objectType': 'Agent', 'name': f'User {n}', 'account': {'homePage': site, 'name': f'user_{n}'}},
+        'verb': {'id': 'http://adlnet.gov/expapi/verbs/completed'},
+        'object': {'objectType': 'Activity', 'id': f'{site}/mod/quiz/view.php?id={n}'},
+        'timestamp': timestamp,
+    }
+
+
+def voiding(target):
+    return {
+        'actor': {'objectType': 'Agent', 'account': {'homePage': SITE, 'name': 'admin'}},
+        'verb': {'id': VOIDED_VERB},
+        'object': {'objectType': 'StatementRef', 'id': str(target.statement_id)},
+    }
+
+
+class DatabaseTestCase(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._databases = setup_databases(verbosity=0, interactive=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        teardown_databases(cls._databases, verbosity=0)
+
+    def day_count(self, day=DAY):
+        row = StatementDailyCount.objects.filter(day=day).first()
+        return row.count if row else 0
+
+
+class VoidingRollupTest(DatabaseTestCase):
+
+    def test_voiding_one_of_two_statements_keeps_the_day(self):
+        first, second = store_statements([statement(1), statement(2)])
+        self.assertEqual(self.day_count(), 2)
+
+        store_statements([voiding(first)])
+        self.assertEqual(self.day_count(), 1)
+
+        store_statements([voiding(second)])
+        self.assertFalse(StatementDailyCount.objects.filter(day=DAY).exists())
+
+
+def expire(statements, days=60):
+    """Make statements look stored ``days`` ago"""
+    Statement.objects.filter(pk__in=[stmt.pk for stmt in statements]).update(
+        stored=datetime.now(timezone.utc) - timedelta(days=days)
+    )
+
+
+def statements_version():
+    row = ResourceVersion.objects.filter(resource='statements').first()
+    return row.version if row else 0
+
+
+class RetentionTest(DatabaseTestCase):
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(LRS_RETENTION={
+            'ARCHIVE_DIR': self.archive_dir.name, 'BATCH_SIZE': 3, 'SLEEP_SECONDS': 0,
+        })
+        self.settings.enable()
+        clear_site_cache()
+        self.integration = MoodleIntegration.objects.create(
+            moodle_site_name='Moodle', moodle_url=SITE, moodle_token='token', retention_days=30,
+        )
+        MoodleIntegration.objects.create(moodle_site_name='Other', moodle_url=OTHER_SITE, moodle_token='token')
+
+    def tearDown(self):
+        self.settings.disable()
+        self.archive_dir.cleanup()
+
+    def test_delete_expires_only_old_statements_of_the_site(self):
+        old = store_statements([statement(n) for n in range(7)])
+        other = store_statements([statement(n, site=OTHER_SITE) for n in range(2)])
+        recent = store_statements([statement(n) for n in range(7, 9)])
+        expire(old + other)
+        self.assertEqual(self.day_count(), 11)
+        version = statements_version()
+
+        result = apply_retention(self.integration)
+        self.assertEqual(result['expired'], 7)
+        self.assertIsNone(result['archive'])
+        self.assertEqual(
+            set(Statement.objects.values_list('pk', flat=True)), {stmt.pk for stmt in other + recent},
+        )
+        # Chunks of 3: the counts, the feed and the version follow every chunk
+        self.assertEqual(self.day_count(), 4)
+        self.assertEqual(
+            set(StatementChange.objects.filter(action='deleted').values_list('statement_uuid', flat=True)),
+            {stmt.statement_id for stmt in old},
+        )
+        self.assertGreaterEqual(statements_version(), version + 3)
+
+        self.assertEqual(apply_retention(self.integration)['expired'], 0)
+
+    def test_archive_writes_statements_before_deleting(self):
+        self.integration.retention_action = 'archive'
+        self.integration.save()
+        old = store_statements([statement(n) for n in range(4)])
+        expire(old)
+
+        result = apply_retention(self.integration)
+        self.assertEqual(result['expired'], 4)
+        with gzip.open(result['archive'], 'rt', encoding='utf-8') as archive:
+            archived = [json.loads(line) for line in archive]
+        self.assertEqual({row['id'] for row in archived}, {str(stmt.statement_id) for stmt in old})
+        self.assertFalse(Statement.objects.exists())
+
+    def test_dry_run_counts_without_deleting(self):
+        expire(store_statements([statement(n) for n in range(4)]))
+        result = apply_retention(self.integration, dry_run=True)
+        self.assertEqual(result['expired'], 4)
+        self.assertEqual(Statement.objects.count(), 4)
+        self.assertEqual(self.day_count(), 4)
+
+    def test_voided_statements_leave_the_counts_once(self):
+        old = store_statements([statement(n) for n in range(3)])
+        store_statements([voiding(old[0])])
+        expire(old)
+        self.assertEqual(self.day_count(), 2)
+
+        self.assertEqual(apply_retention(self.integration)['expired'], 3)
+        self.assertFalse(StatementDailyCount.objects.filter(day=DAY).exists())
+
+    def test_delete_cascading_removes_statements_in_chunks(self):
+        stored = store_statements([statement(1) for _ in range(5)] + [statement(2)])
+        actor = Actor.objects.get(account_name='user_1')
+
+        self.assertEqual(delete_cascading(Actor.objects.filter(pk=actor.pk), batch_size=2, sleep=0), 1)
+        self.assertFalse(Actor.objects.filter(pk=actor.pk).exists())
+        self.assertEqual(list(Statement.objects.values_list('pk', flat=True)), [stored[-1].pk])
+        self.assertEqual(self.day_count(), 1)
+        self.assertEqual(StatementChange.objects.filter(action='deleted').count(), 5)
+
+
+SHARD = 'shard1'
+
+
+class ShardedRetentionTest(DatabaseTestCase):
+    """Retention runs on the integration's shard and only expires its site"""
+    databases = {'default', SHARD}
+
+    @classmethod
+    def setUpClass(cls):
+        shard = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+        settings.DATABASES[SHARD] = shard
+        connections.settings[SHARD] = connections.configure_settings(
+            {'default': dict(settings.DATABASES['default']), SHARD: dict(shard)}
+        )[SHARD]
+        cls.sharding = override_settings(
+            LRS_SHARDING={'ENABLED': True, 'SHARDS': ['default', SHARD], 'DEFAULT_SHARD': 'default'},
+            LRS_RETENTION={'BATCH_SIZE': 2, 'SLEEP_SECONDS': 0},
+        )
+        cls.sharding.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.sharding.disable()
+        connections[SHARD].close()
+        del connections[SHARD]
+        connections.settings.pop(SHARD, None)
+        settings.DATABASES.pop(SHARD, None)
+
+    def setUp(self):
+        clear_site_cache()
+        self.integration = MoodleIntegration.objects.create(
+            moodle_site_name='Moodle', moodle_url=SITE, moodle_token='token', retention_days=30, shard=SHARD,
+        )
+        # Same shard, other site; and the same site name on the default shard
+        MoodleIntegration.objects.create(
+            moodle_site_name='Neighbour', moodle_url=OTHER_SITE, moodle_token='token', shard=SHARD,
+        )
+
+    def test_retention_expires_the_site_on_its_shard(self):
+        mine = store_statements([statement(n) for n in range(5)])
+        neighbour = store_statements([statement(n, site=OTHER_SITE) for n in range(3)])
+        unknown = store_statements([statement(n, site='https://unknown.example') for n in range(2)])
+        with use_shard(SHARD):
+            expire(mine + neighbour)
+        with use_shard('default'):
+            expire(unknown)
+
+        result = apply_retention(self.integration)
+        self.assertEqual(result['expired'], 5)
+        with use_shard(SHARD):
+            self.assertEqual(
+                set(Statement.objects.values_list('pk', flat=True)), {stmt.pk for stmt in neighbour},
+            )
+            self.assertEqual(self.day_count(), 3)
+            self.assertEqual(StatementChange.objects.filter(action='deleted').count(), 5)
+        with use_shard('default'):
+            self.assertEqual(Statement.objects.count(), 2)
+            self.assertEqual(self.day_count(), 2)
+            self.assertFalse(StatementChange.objects.filter(action='deleted').exists())
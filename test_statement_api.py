@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Statement resource: creation goes through ingest, and read paths leave
+voided statements out
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from django.test import TransactionTestCase
+from django.test.utils import setup_databases, teardown_databases
+from rest_framework.test import APIClient
+
+from lrs.models import Statement, StatementChange
+from lrs.services.voiding import VOIDED_VERB
+
+SITE = 'https://moodle.example'
+
+
+def statement(n):
+    return {
+        'actor': {'objectType': 'Agent', 'name': f'User {n}', 'account': {'homePage': SITE, 'name': f'user_{n}'}},
+        'verb': {'id': 'http://adlnet.gov/expapi/verbs/completed'},
+        'object': {
+            'objectType': 'Activity', 'id': f'{SITE}/mod/quiz/view.php?id={n}',
+            'definition': {'name': {'en-US': f'Quiz {n}'}},
+        },
+    }
+
+
+class StatementAPITest(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._databases = setup_databases(verbosity=0, interactive=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        teardown_databases(cls._databases, verbosity=0)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, data):
+        response = self.client.post('/api/xapi/statements', data, format='json')
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return [str(statement_id) for statement_id in response.json()['statement_ids']]
+
+    def test_voided_statements_are_left_out_of_reads(self):
+        kept_id, voided_id = self.post([statement(1), statement(2)])
+        self.post({
+            'actor': {'objectType': 'Agent', 'account': {'homePage': SITE, 'name': 'admin'}},
+            'verb': {'id': VOIDED_VERB},
+            'object': {'objectType': 'StatementRef', 'id': voided_id},
+        })
+        voided = Statement.objects.get(statement_id=voided_id)
+        self.assertFalse(voided.is_valid)
+
+        def ids(response):
+            self.assertEqual(response.status_code, 200, response.content)
+            return {row['statement_id'] for row in response.json()['results']}
+
+        self.assertNotIn(voided_id, ids(self.client.get('/api/statements/')))
+        self.assertEqual(ids(self.client.get('/api/statements/search/', {'q': 'Quiz'})), {kept_id})
+        self.assertNotIn(voided_id, ids(self.client.get('/api/statements/get')))
+        self.assertEqual(self.client.get(f'/api/statements/{voided.pk}/').status_code, 404)
+
+        # Still reachable the xAPI way, and can be deleted
+        response = self.client.get('/api/xapi/statements', {'voidedStatementId': voided_id})
+        self.assertEqual(response.json()['id'], voided_id)
+        self.assertEqual(self.client.delete(f'/api/statements/{voided.pk}/').status_code, 204)
+
+    def test_create_goes_through_ingest(self):
+        statement_id = '6f1b7a5e-3c2d-4e8f-9a0b-1c2d3e4f5a6b'
+        response = self.client.post('/api/statements/', {**statement(1), 'id': statement_id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['statement_id'], statement_id)
+        self.assertEqual(StatementChange.objects.filter(statement_uuid=statement_id, action='stored').count(), 1)
+
+        # The same statement again is not stored twice; different content is a conflict
+        response = self.client.post('/api/statements/', {**statement(1), 'id': statement_id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/statements/', {**statement(2), 'id': statement_id}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Statement.objects.filter(statement_id=statement_id).count(), 1)
+
+        # Voiding statements are honoured
+        response = self.client.post('/api/statements/', {
+            'actor': {'objectType': 'Agent', 'account': {'homePage': SITE, 'name': 'admin'}},
+            'verb': {'id': VOIDED_VERB},
+            'object': {'objectType': 'StatementRef', 'id': statement_id},
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(Statement.objects.get(statement_id=statement_id).is_valid)
+
+        response = self.client.post('/api/statements/', {'actor': {'name': 'No identifier'}}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,7 @@
 # django_xapi/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from lrs.views import dashboard, statements_view, test_api_view, config_view, web_services_view, moodle_manager_view
+from lrs.views.ui import dashboard, statements_view, test_api_view, config_view, web_services_view, moodle_manager_view
 
 urlpatterns = [
     path('', dashboard, name='dashboard'),